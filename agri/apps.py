@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AgriConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'agri'
+
+    def ready(self):
+        from . import authentication
+        from .rollups import build_missing
+        from .search import install_search_indexes
+        from .signals import connect_signals
+        post_migrate.connect(install_search_indexes, sender=self)
+        post_migrate.connect(build_missing, sender=self)
+        connect_signals()
+        authentication.connect_signals()
@@ -0,0 +1,111 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import rollups, snapshots
+from .cache import traceability_cache
+from .serializers import BatchNumberSearchSerializer
+
+
+class AsyncAPIView(View):
+    """
+    Async counterpart of APIView for read endpoints served under ASGI. Runs
+    the DRF authentication and permission classes, then awaits the handler
+    without tying up a worker thread while the database answers.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Like APIView, rely on authentication classes for CSRF protection
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def check_access(self, request):
+        drf_request = Request(request, authenticators=[auth() for auth in self.authentication_classes])
+        try:
+            # Authenticates, so an invalid token is answered like in APIView
+            request.user = drf_request.user
+            for permission in [permission() for permission in self.permission_classes]:
+                if not permission.has_permission(drf_request, self):
+                    if drf_request.authenticators and not drf_request.successful_authenticator:
+                        raise exceptions.NotAuthenticated()
+                    raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+        except exceptions.APIException as exc:
+            data = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+            response = JsonResponse(data, status=exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                header = drf_request.authenticators and drf_request.authenticators[0].authenticate_header(drf_request)
+                if header:
+                    response['WWW-Authenticate'] = header
+                else:
+                    response.status_code = 403
+            return response
+        return None
+
+    async def dispatch(self, request, *args, **kwargs):
+        denied = await sync_to_async(self.check_access)(request)
+        if denied is not None:
+            return denied
+        return await super().dispatch(request, *args, **kwargs)
+
+    def respond(self, data, status=200):
+        return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, safe=False)
+
+
+class AsyncBatchDetailView(AsyncAPIView):
+    """
+    Async API view to retrieve a batch, served from the traceability cache or
+    the batch's snapshot
+    """
+
+    async def get(self, request, batch_number):
+        data = await traceability_cache.aget_or_render(
+            batch_number, lambda: snapshots.asnapshot_for(batch_number)
+        )
+        if data is None:
+            return self.respond({"detail": "No Batch matches the given query."}, status=404)
+        return self.respond(data)
+
+
+class AsyncBatchDetailsSearchView(AsyncAPIView):
+    """
+    Async API view to look up a batch by number, served like the detail view
+    """
+
+    async def post(self, request):
+        if request.content_type == 'application/json':
+            try:
+                payload = json.loads(request.body or b'{}')
+            except ValueError:
+                return self.respond({"detail": "JSON parse error"}, status=400)
+        else:
+            payload = request.POST
+        search_serializer = BatchNumberSearchSerializer(data=payload)
+        if not search_serializer.is_valid():
+            return self.respond(search_serializer.errors, status=400)
+        batch_number = search_serializer.validated_data.get('batch_number')
+
+        data = await traceability_cache.aget_or_render(
+            batch_number, lambda: snapshots.asnapshot_for(batch_number)
+        )
+        if data is None:
+            return self.respond({"error": f"Batch with number '{batch_number}' not found"}, status=404)
+        return self.respond(data)
+
+
+class AsyncDashboardSummaryView(AsyncAPIView):
+    """
+    Async API view to get the dashboard summary from the rollups
+    """
+
+    async def get(self, request):
+        return self.respond(await rollups.asummary())
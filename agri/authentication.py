@@ -0,0 +1,72 @@
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+DEFAULT_SETTINGS = {
+    'BACKEND': 'agri.cache.LocalLRUCache',
+    'OPTIONS': {'max_entries': 10000, 'timeout': 5},
+}
+
+
+def build_user_cache():
+    config = {**DEFAULT_SETTINGS, **getattr(settings, 'AUTH_USER_CACHE', {})}
+    backend_class = import_string(config['BACKEND'])
+    return backend_class(**config.get('OPTIONS', {}))
+
+
+user_cache = build_user_cache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user through `user_cache`
+    instead of reading the user row on every request. Tokens are still fully
+    verified, and the active and password-change checks run on every request
+    against the cached user. Entries are evicted when the user is saved or
+    deleted (deactivation, password change), and expire after the timeout.
+    Eviction reaches every worker only with a shared backend; see
+    AUTH_USER_CACHE in the settings.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        key = str(user_id)
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        else:
+            self.check_user(user, validated_token)
+        # Requests must not share (and mutate) the cached instance
+        return copy.copy(user)
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+
+def evict_user(sender, instance, **kwargs):
+    key = str(getattr(instance, api_settings.USER_ID_FIELD))
+    user_cache.delete_many([key])
+    # Again after commit, in case a concurrent request re-cached the old row
+    transaction.on_commit(lambda: user_cache.delete_many([key]))
+
+
+def connect_signals():
+    user_model = get_user_model()
+    post_save.connect(evict_user, sender=user_model, dispatch_uid='agri_auth_user_saved')
+    post_delete.connect(evict_user, sender=user_model, dispatch_uid='agri_auth_user_deleted')
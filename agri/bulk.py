@@ -0,0 +1,221 @@
+import csv
+import io
+from datetime import date
+
+from django.db import connection, transaction
+from rest_framework import serializers, status
+from rest_framework.generics import GenericAPIView
+from rest_framework.parsers import BaseParser, JSONParser, MultiPartParser
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from rest_framework.validators import UniqueValidator
+
+from . import rollups
+from .models import Located
+from .sequences import allocate_identifiers
+
+
+MAX_BULK_ROWS = 10000
+BULK_INSERT_BATCH_SIZE = 1000
+CSV_LIST_SEPARATOR = ';'
+
+
+def read_csv(stream):
+    content = stream.read()
+    try:
+        if isinstance(content, bytes):
+            content = content.decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(content, newline='')))
+    except (csv.Error, UnicodeDecodeError) as exc:
+        raise ParseError(f"CSV parse error - {exc}")
+
+
+class CSVParser(BaseParser):
+    """
+    Parse a text/csv request body into a list of row dicts keyed by the header
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return read_csv(stream)
+
+
+def copy_insert(model, objs):
+    """
+    Insert `objs` with PostgreSQL COPY ... FROM STDIN (CSV). Returns False when
+    COPY is not available so the caller can fall back to bulk_create.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write(','.join(copy_value(field.pre_save(obj, add=True)) for field in fields))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    sql = f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    with connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):
+            raw_cursor.copy_expert(sql, buffer)
+        else:
+            with raw_cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    return True
+
+
+def copy_value(value):
+    """
+    Format a Python value as a COPY CSV cell. NULL is the unquoted empty cell,
+    every other value is quoted so empty strings survive
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    elif isinstance(value, date):
+        value = value.isoformat()
+    elif isinstance(value, (list, tuple)):
+        escaped = (str(item).replace('\\', '\\\\').replace('"', '\\"') for item in value)
+        value = '{' + ','.join(f'"{item}"' for item in escaped) + '}'
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def clean_csv_row(row, list_fields):
+    """
+    Empty CSV cells mean "not provided"; list cells are ';'-separated
+    """
+    row = {key: value for key, value in row.items() if key and value not in ('', None)}
+    for name in list_fields:
+        if name in row:
+            row[name] = [item.strip() for item in row[name].split(CSV_LIST_SEPARATOR) if item.strip()]
+    return row
+
+
+def list_fields(serializer):
+    return [name for name, field in serializer.fields.items() if isinstance(field, serializers.ListField)]
+
+
+class BulkUploadView(GenericAPIView):
+    """
+    Base for endpoints taking many rows as a JSON array or a CSV upload
+    (text/csv body or multipart 'file')
+    """
+    parser_classes = [JSONParser, CSVParser, MultiPartParser]
+    max_rows = MAX_BULK_ROWS
+
+    def get_rows(self, request):
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                raise ParseError("Upload the CSV file in the 'file' field")
+            return read_csv(upload.file)
+        return request.data
+
+    def read_rows(self, request, serializer):
+        """
+        Return the uploaded rows, or an error Response for a malformed upload
+        """
+        rows = self.get_rows(request)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return Response(
+                {"error": "Expected a JSON array of objects or a CSV upload"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > self.max_rows:
+            return Response(
+                {"error": f"A bulk request may contain at most {self.max_rows} rows"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if request.content_type.startswith(('text/csv', 'multipart/')):
+            fields = list_fields(serializer)
+            rows = [clean_csv_row(row, fields) for row in rows]
+        return rows
+
+
+class BulkCreateView(BulkUploadView):
+    """
+    Register many rows in one request from a JSON array or a CSV upload.
+
+    Every row is validated in a single pass and supplied identifiers are
+    checked for uniqueness with one set-based query. Identifiers for the rows
+    that did not supply one are reserved as one block from the sequence, and
+    valid rows are inserted together (COPY on PostgreSQL). Invalid rows are
+    reported by index and do not prevent the valid rows from being created.
+    """
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        rows = self.read_rows(request, serializer)
+        if isinstance(rows, Response):
+            return rows
+
+        identifier_field = serializer.identifier_field
+        field = serializer.fields[identifier_field]
+        field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+
+        errors = {}
+        valid = {}
+        for index, row in enumerate(rows):
+            try:
+                valid[index] = serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                errors[index] = exc.detail
+
+        model = serializer.Meta.model
+        with transaction.atomic():
+            self.check_identifiers(model, valid, errors, identifier_field)
+            supplied = {data[identifier_field] for data in valid.values() if data.get(identifier_field)}
+            missing = [index for index, data in valid.items() if not data.get(identifier_field)]
+            if missing:
+                identifiers = allocate_identifiers(
+                    model, identifier_field, serializer.identifier_prefix, len(missing), taken=supplied
+                )
+                for index, identifier in zip(missing, identifiers):
+                    valid[index][identifier_field] = identifier
+            objs = [model(**valid[index]) for index in sorted(valid)]
+            for obj in objs:
+                if isinstance(obj, Located):
+                    obj.locate()
+            if objs and not copy_insert(model, objs):
+                model.objects.bulk_create(objs, batch_size=BULK_INSERT_BATCH_SIZE)
+            rollups.record_created(objs)
+
+        return Response(
+            {
+                "created": [
+                    {"row": index, identifier_field: valid[index][identifier_field]}
+                    for index in sorted(valid)
+                ],
+                "errors": [
+                    {"row": index, "errors": errors[index]}
+                    for index in sorted(errors)
+                ],
+            },
+            status=status.HTTP_201_CREATED if valid else status.HTTP_400_BAD_REQUEST
+        )
+
+    def check_identifiers(self, model, valid, errors, identifier_field):
+        """
+        Reject identifiers that repeat within the payload or already exist
+        """
+        supplied = {}
+        for index, data in valid.items():
+            identifier = data.get(identifier_field)
+            if identifier:
+                supplied.setdefault(identifier, []).append(index)
+        existing = set(
+            model.objects.filter(**{f'{identifier_field}__in': supplied})
+            .values_list(identifier_field, flat=True)
+        )
+        for identifier, indexes in supplied.items():
+            if identifier in existing:
+                duplicates, message = indexes, f"{identifier} already exists"
+            else:
+                duplicates, message = indexes[1:], f"{identifier} is repeated in this upload"
+            for index in duplicates:
+                errors[index] = {identifier_field: [message]}
+                del valid[index]
@@ -0,0 +1,268 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.module_loading import import_string
+
+from .models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch
+from .routing import reading_replica
+from .signals import affected_batches
+
+
+DEFAULT_SETTINGS = {
+    'BACKEND': 'agri.cache.LocalLRUCache',
+    'OPTIONS': {'max_entries': 10000, 'timeout': 300},
+}
+
+
+class LocalLRUCache:
+    """
+    In-process LRU cache with a per-entry timeout. Invalidation only reaches
+    the current process, so the timeout bounds staleness in other workers;
+    use DjangoCache with a shared cache alias when running several workers.
+    """
+
+    def __init__(self, max_entries=10000, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Lookups never block, so async views call them directly
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+
+class DjangoCache:
+    """
+    Shared backend storing documents in one of the CACHES aliases (e.g. Redis)
+    """
+
+    def __init__(self, alias='default', timeout=300, key_prefix='agri:trace:'):
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def set(self, key, value):
+        self.cache.set(self.key_prefix + key, value, self.timeout)
+
+    def delete_many(self, keys):
+        self.cache.delete_many([self.key_prefix + key for key in keys])
+
+    def clear(self):
+        self.cache.clear()
+
+    async def aget(self, key):
+        return await self.cache.aget(self.key_prefix + key)
+
+    async def aset(self, key, value):
+        await self.cache.aset(self.key_prefix + key, value, self.timeout)
+
+
+class TraceabilityCache:
+    """
+    Cache of rendered batch traceability documents keyed by batch number, with
+    hit/miss counters. Entries are invalidated from model signals when the
+    batch, one of its sites or a contributing farmer changes. An entry may
+    carry the HTTP validators (digest, last_modified) the document was
+    rendered under, so a conditional GET served from the cache needs no query.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Bumped on every invalidation so a document rendered from data read
+        # before a concurrent write is not stored after the write invalidated it
+        self.generation = 0
+
+    def count(self, document):
+        with self.lock:
+            if document is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return document
+
+    def lookup(self, batch_number):
+        """
+        (document, validators) of the cached entry, (None, None) when absent.
+        Not counted as a hit or miss.
+        """
+        return self.backend.get(batch_number) or (None, None)
+
+    def get(self, batch_number):
+        document, validators = self.lookup(batch_number)
+        return self.count(document)
+
+    def store(self, batch_number, document, validators, generation):
+        # A document rendered on a lagging replica could predate the last
+        # invalidation: only the primary fills the shared cache
+        if document is not None and generation == self.generation and not reading_replica():
+            self.backend.set(batch_number, (document, validators))
+
+    def get_or_render(self, batch_number, render, validators=None, generation=None):
+        """
+        Return the cached document, or call `render()` and cache its result
+        with `validators`. `render` may return None (e.g. not found), which is
+        not cached. Pass the `generation` read before computing `validators`,
+        so validators read before a concurrent write are not stored after it.
+        """
+        if generation is None:
+            generation = self.generation
+        document, cached_validators = self.lookup(batch_number)
+        if document is not None:
+            if cached_validators is None and validators is not None:
+                self.store(batch_number, document, validators, generation)
+            return self.count(document)
+        self.count(None)
+        document = render()
+        self.store(batch_number, document, validators, generation)
+        return document
+
+    async def aget_or_render(self, batch_number, render):
+        """
+        get_or_render() for async views; `render` is a coroutine function
+        """
+        document, validators = await self.backend.aget(batch_number) or (None, None)
+        if self.count(document) is not None:
+            return document
+        generation = self.generation
+        document = await render()
+        if document is not None and generation == self.generation and not reading_replica():
+            await self.backend.aset(batch_number, (document, None))
+        return document
+
+    def invalidate(self, batch_numbers):
+        batch_numbers = [number for number in set(batch_numbers) if number]
+        if not batch_numbers:
+            return
+        with self.lock:
+            self.generation += 1
+            self.invalidations += len(batch_numbers)
+        self.backend.delete_many(batch_numbers)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+    def clear(self):
+        self.backend.clear()
+        with self.lock:
+            self.hits = self.misses = self.invalidations = 0
+
+
+def build_cache():
+    config = {**DEFAULT_SETTINGS, **getattr(settings, 'TRACEABILITY_CACHE', {})}
+    backend_class = import_string(config['BACKEND'])
+    return TraceabilityCache(backend_class(**config.get('OPTIONS', {})))
+
+
+traceability_cache = build_cache()
+
+
+def invalidate(batch_numbers):
+    """
+    Invalidate now and again after commit, so a reader that re-cached data
+    from before the commit cannot leave a stale document behind
+    """
+    batch_numbers = list(batch_numbers)
+    traceability_cache.invalidate(batch_numbers)
+    transaction.on_commit(lambda: traceability_cache.invalidate(batch_numbers))
+
+
+def batch_numbers_for(instance):
+    return list(affected_batches(instance).values_list('batch_number', flat=True))
+
+
+def batch_saved(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    invalidate([instance.batch_number, previous.batch_number if previous else None])
+
+
+def batch_deleted(sender, instance, **kwargs):
+    invalidate([instance.batch_number])
+
+
+def related_saved(sender, instance, created=False, raw=False, **kwargs):
+    # A new farmer or site is not part of any batch yet
+    if raw or created:
+        return
+    invalidate(batch_numbers_for(instance))
+
+
+def farmer_deleted(sender, instance, **kwargs):
+    invalidate(number for pk, number in getattr(instance, '_affected_batches', []))
+
+
+def farmers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate([instance.batch_number])
+    elif action == 'post_clear':
+        # farmer.batches.clear(): `instance` is the farmer
+        invalidate(number for pk, number in getattr(instance, '_affected_batches', []))
+    else:
+        invalidate(Batch.objects.filter(pk__in=pk_set).values_list('batch_number', flat=True))
+
+
+def connect_signals():
+    post_save.connect(batch_saved, sender=Batch, dispatch_uid='agri_cache_batch_saved')
+    post_delete.connect(batch_deleted, sender=Batch, dispatch_uid='agri_cache_batch_deleted')
+    for model in (Farmer, CollectionCenter, ProcessingFacility, PackagingCenter):
+        post_save.connect(related_saved, sender=model, dispatch_uid=f'agri_cache_{model._meta.model_name}_saved')
+    post_delete.connect(farmer_deleted, sender=Farmer, dispatch_uid='agri_cache_farmer_deleted')
+    m2m_changed.connect(
+        farmers_changed, sender=Batch.contributing_farmers.through, dispatch_uid='agri_cache_farmers_changed'
+    )
@@ -0,0 +1,136 @@
+import hashlib
+
+from django.db.models import Count, Max, Subquery
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .fieldsets import selected_relations
+from .models import Tombstone
+from .pagination import AgriPagination
+
+
+def latest_change(model):
+    """
+    Newest updated_at of `model`, read from the end of its (updated_at, id) index
+    """
+    return Subquery(model.objects.order_by('-updated_at').values('updated_at')[:1])
+
+
+def latest_deletion(model):
+    """
+    Newest deletion of a `model` row, read from the end of the tombstone index
+    """
+    return Subquery(
+        Tombstone.objects.filter(model=model._meta.model_name).order_by('-deleted_at').values('deleted_at')[:1]
+    )
+
+
+def validators(queryset, dependencies=()):
+    """
+    Return (digest, last_modified, count) of the rows in `queryset` with one
+    query, or None when it is empty. Besides the row count and newest
+    updated_at, the digest covers the newest deletion of the model and the
+    newest change to each of the `dependencies` (models nested in the
+    representation).
+    """
+    model = queryset.model
+    subqueries = {'deleted': latest_deletion(model)}
+    for dependency in dependencies:
+        subqueries[dependency._meta.model_name] = latest_change(dependency)
+    # Max() over the uncorrelated subqueries lets one aggregate query read them
+    state = queryset.order_by().aggregate(
+        count=Count('pk'), updated=Max('updated_at'),
+        **{name: Max(subquery) for name, subquery in subqueries.items()},
+    )
+    if not state['count']:
+        return None
+    timestamps = [value for name, value in state.items() if name != 'count' and value is not None]
+    digest = hashlib.md5(repr(sorted(state.items())).encode(), usedforsecurity=False).hexdigest()
+    return digest, max(timestamps), state['count']
+
+
+def index_validators(queryset, dependencies=()):
+    """
+    Return (digest, last_modified, None) for `queryset` without scanning its
+    rows, or None when the model has no rows: the digest covers the query
+    itself, the newest change and deletion of the model and the newest change
+    to each of the `dependencies`, all read from the end of their indexes.
+    Any write to the table changes it, filtered in or out.
+    """
+    model = queryset.model
+    subqueries = {'deleted': latest_deletion(model)}
+    for dependency in dependencies:
+        subqueries[dependency._meta.model_name] = latest_change(dependency)
+    state = model.objects.order_by('-updated_at').values('updated_at').annotate(**subqueries).first()
+    if state is None:
+        return None
+    timestamps = [value for value in state.values() if value is not None]
+    # Filters can move without a write, e.g. a window relative to today
+    state['query'] = str(queryset.query)
+    digest = hashlib.md5(repr(sorted(state.items())).encode(), usedforsecurity=False).hexdigest()
+    return digest, max(timestamps), None
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified on list and detail GETs, derived from the count and
+    newest updated_at of the filtered queryset, so revalidating unchanged data
+    answers 304 after one aggregate query and without serializing anything.
+    `validator_dependencies` maps the nested relations of the representation
+    to their models. The count is handed to the page number pagination as
+    `row_count`, so it is not read twice. Keyset pages (?pagination=cursor)
+    read no count: their validators come from index_validators().
+    """
+    validator_dependencies = {}
+    read_validators = staticmethod(validators)
+    row_count = None
+    # (digest, last_modified) of the response being built
+    validator_state = None
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        elif request.query_params.get(AgriPagination.mode_query_param) == AgriPagination.cursor_mode:
+            self.read_validators = index_validators
+        return self.conditional(queryset, super().get, request, *args, **kwargs)
+
+    def get_validator_dependencies(self):
+        """
+        Models of the nested relations this request renders
+        """
+        names = self.validator_dependencies
+        if getattr(self, 'is_sparse', lambda: False)():
+            names, _ = selected_relations(*self.get_fieldset(), self.get_serializer_class().expandable)
+        return [self.validator_dependencies[name] for name in names if name in self.validator_dependencies]
+
+    def conditional(self, queryset, respond, request, *args, **kwargs):
+        state = self.read_validators(queryset, self.get_validator_dependencies())
+        if state is None:
+            return respond(request, *args, **kwargs)
+        digest, last_modified, self.row_count = state
+        return self.conditional_response((digest, last_modified), respond, request, *args, **kwargs)
+
+    def conditional_response(self, state, respond, request, *args, **kwargs):
+        """
+        Answer 304/412 from the (digest, last_modified) `state`, or call `respond`
+        and add the validators to its response
+        """
+        self.validator_state = state
+        digest, last_modified = state
+        # The same rows render differently per query string and media type
+        variant = f"{digest}:{request.get_full_path()}:{request.accepted_media_type}"
+        etag = '"%s"' % hashlib.md5(variant.encode(), usedforsecurity=False).hexdigest()
+        last_modified = int(last_modified.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = respond(request, *args, **kwargs)
+        elif not isinstance(response, HttpResponseNotModified):
+            return response
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
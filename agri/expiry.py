@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import rollups
+from .models import Rollup
+
+
+EXPIRY_WINDOW_DAYS = 30
+MAX_EXPIRY_WINDOW_DAYS = 366
+
+# Histogram grouping -> rollup metric
+EXPIRY_GROUPS = {
+    'packaging_center': 'batches_by_packaging_center_expiry_week',
+    'processing_facility': 'batches_by_facility_expiry_week',
+}
+
+
+def parse_date(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: 'Enter a date as YYYY-MM-DD'})
+
+
+def window(params, today=None):
+    """
+    The (start, end) expiry dates, both included, asked for by `params`:
+    `from` and `to`, or `days` from `from` (default today)
+    """
+    start = parse_date(params, 'from') or today or timezone.localdate()
+    end = parse_date(params, 'to')
+    if end is None:
+        try:
+            days = int(params.get('days', EXPIRY_WINDOW_DAYS))
+        except ValueError:
+            raise ValidationError({'days': 'Enter a whole number of days'})
+        if not 0 <= days <= MAX_EXPIRY_WINDOW_DAYS:
+            raise ValidationError({'days': f'Ask for 0 to {MAX_EXPIRY_WINDOW_DAYS} days'})
+        end = start + timedelta(days=days)
+    if end < start or (end - start).days > MAX_EXPIRY_WINDOW_DAYS:
+        raise ValidationError({'to': f'Ask for a window of 0 to {MAX_EXPIRY_WINDOW_DAYS} days after `from`'})
+    return start, end
+
+
+def histogram(group, start, end):
+    """
+    Batches per site and expiry week for the weeks overlapping `start` to
+    `end`, read from the precomputed rollups with one range scan of their
+    (metric, key) index. Weeks start on Monday and are counted whole.
+    """
+    metric = EXPIRY_GROUPS[group]
+    first_week, after_last_week = rollups.week_start(start), rollups.week_start(end) + timedelta(days=7)
+    buckets = Rollup.objects.filter(
+        metric=metric, key__gte=f'{first_week:%Y-%m-%d}', key__lt=f'{after_last_week:%Y-%m-%d}', count__gt=0,
+    ).values_list('key', 'count')
+
+    sites = {}
+    for key, count in buckets:
+        week, site = key.split(':')
+        site = int(site)
+        if site not in sites:
+            sites[site] = {group: site, 'batches': 0, 'weeks': {}}
+        sites[site]['batches'] += count
+        sites[site]['weeks'][week] = count
+    return {
+        'group': group,
+        'from': start,
+        'to': end,
+        'first_week': first_week,
+        'last_week': after_last_week - timedelta(days=7),
+        'batches': sum(site['batches'] for site in sites.values()),
+        'sites': [
+            {**site, 'weeks': [{'week': week, 'batches': count} for week, count in sorted(site['weeks'].items())]}
+            for _, site in sorted(sites.items())
+        ],
+    }
@@ -0,0 +1,97 @@
+import csv
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class Echo:
+    """
+    File-like object whose write() hands the value back to the csv writer caller
+    """
+
+    def write(self, value):
+        return value
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def csv_lines(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([
+            ';'.join(value) if isinstance(value, list)
+            else value.isoformat() if hasattr(value, 'isoformat')
+            else value
+            for value in (row[column] for column in columns)
+        ])
+
+
+class StreamingExportMixin:
+    """
+    Stream the full filtered queryset of a list view as NDJSON or CSV.
+
+    Rows are read with a chunked server-side cursor and written as they are
+    produced, so memory stays flat regardless of the size of the export. The
+    view's filter backends apply unchanged, so exports accept the same
+    filter/search/ordering parameters as the list endpoint.
+    """
+    http_method_names = ['get', 'head', 'options']
+    export_format_query_param = 'export_format'
+    export_fields = ()
+    export_filename = 'export'
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get(self.export_format_query_param, 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"export_format must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.filter_queryset(self.get_export_queryset())
+        columns = self.get_export_columns()
+        rows = self.export_rows(queryset, columns)
+        if export_format == 'csv':
+            lines = csv_lines(rows, columns)
+        else:
+            lines = ndjson_lines(rows)
+
+        response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="{self.export_filename}.{export_format}"'
+        return response
+
+    def get_export_queryset(self):
+        return self.get_queryset().prefetch_related(None).order_by('pk')
+
+    def get_export_columns(self):
+        return [column for column, _ in self.export_fields]
+
+    def export_rows(self, queryset, columns):
+        lookups = [lookup for _, lookup in self.export_fields]
+        for values in queryset.values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield dict(zip(columns, values))
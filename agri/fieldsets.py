@@ -0,0 +1,138 @@
+from functools import lru_cache
+
+from django.db import models
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+FIELDS_QUERY_PARAM = 'fields'
+EXPAND_QUERY_PARAM = 'expand'
+
+
+@lru_cache(maxsize=None)
+def field_names(serializer_class):
+    return tuple(serializer_class().fields)
+
+
+def parse_names(request, param, allowed):
+    """
+    Read a comma-separated list of names, or None when the parameter is absent
+    """
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValidationError({param: [f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(allowed)}"]})
+    return set(names)
+
+
+def selected_relations(fields, expand, expandable):
+    """
+    Return (expanded, collapsed): the relations rendered as nested objects and
+    those rendered as primary keys
+    """
+    relations = [name for name in expandable if fields is None or name in fields]
+    expanded = [name for name in relations if expand is None or name in expand]
+    collapsed = [name for name in relations if name not in expanded]
+    return expanded, collapsed
+
+
+def plan_queryset(queryset, fields, expand, expandable, keep=()):
+    """
+    Load only the requested columns (and `keep`), join the expanded foreign
+    keys and prefetch a many-to-many relation in full when expanded or as
+    primary keys only when collapsed. Relations outside `fields` are not read
+    at all.
+    """
+    opts = queryset.model._meta
+    expanded, collapsed = selected_relations(fields, expand, expandable)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if fields is not None:
+        concrete = [
+            name for name in {*fields, *keep}
+            if isinstance(opts.get_field(name), models.Field) and opts.get_field(name).concrete
+        ]
+        queryset = queryset.only(opts.pk.name, *sorted(concrete))
+
+    joins, prefetches = [], []
+    for name in expanded + collapsed:
+        field = opts.get_field(name)
+        if field.many_to_many:
+            related = field.related_model.objects.order_by('pk')
+            if name in collapsed:
+                related = related.only('pk')
+            prefetches.append(models.Prefetch(name, queryset=related))
+        elif name in expanded:
+            joins.append(name)
+    if joins:
+        queryset = queryset.select_related(*joins)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+def trim(document, fields, expand, expandable):
+    """
+    Cut a full rendered document (e.g. a stored snapshot) down to a fieldset
+    """
+    expanded, collapsed = selected_relations(fields, expand, expandable)
+    if fields is not None:
+        document = {name: value for name, value in document.items() if name in fields}
+    else:
+        document = dict(document)
+    for name in collapsed:
+        value = document[name]
+        document[name] = [item['id'] for item in value] if isinstance(value, list) else value['id']
+    return document
+
+
+class SparseFieldsetMixin:
+    """
+    `?fields=a,b` limits GET responses to those fields and `?expand=` picks
+    which of the serializer's `expandable` relations are embedded; the others
+    are rendered as primary keys. Without the parameters every field and
+    relation is returned as before. The queryset is planned from the request
+    so relations that are not rendered are not joined or prefetched.
+    """
+
+    def get_fieldset(self):
+        """
+        Return (fields, expand) for this request, None meaning all
+        """
+        if not hasattr(self, '_fieldset'):
+            serializer_class = self.get_serializer_class()
+            self._fieldset = (None, None)
+            if self.request.method in SAFE_METHODS:
+                self._fieldset = (
+                    parse_names(self.request, FIELDS_QUERY_PARAM, field_names(serializer_class)),
+                    parse_names(self.request, EXPAND_QUERY_PARAM, getattr(serializer_class, 'expandable', ())),
+                )
+        return self._fieldset
+
+    def is_sparse(self):
+        return self.get_fieldset() != (None, None)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.is_sparse():
+            return queryset
+        fields, expand = self.get_fieldset()
+        # Keyset cursors read the ordering columns of the page rows
+        keep = [name.lstrip('-') for name in (*getattr(self, 'cursor_ordering', ()), *getattr(self, 'ordering_fields', ()))]
+        return plan_queryset(
+            queryset, fields, expand, getattr(self.get_serializer_class(), 'expandable', ()), keep
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.is_sparse():
+            context['fields'], context['expand'] = self.get_fieldset()
+        return context
+
+    def get_projection(self):
+        projection = super().get_projection()
+        if not self.is_sparse():
+            return projection
+        return projection.sparse(*self.get_fieldset())
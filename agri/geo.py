@@ -0,0 +1,159 @@
+import math
+import re
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Half the circumference: no two points are further apart
+MAX_RADIUS_KM = math.pi * EARTH_RADIUS_KM
+
+DEFAULT_NEAREST = 10
+MAX_NEAREST = 100
+# First radius tried by a k-nearest search, grown fourfold until k sites are in it
+INITIAL_RADIUS_KM = 25
+
+# "5.6037,-0.1870", "5.6037 -0.1870" or "5.6037 N, 0.1870 W", degree signs allowed
+COORDINATES = re.compile(
+    r'^\s*(?P<latitude>[-+]?\d+(?:\.\d+)?)\s*°?\s*(?P<ns>[NSns])?\s*[,;\s]\s*'
+    r'(?P<longitude>[-+]?\d+(?:\.\d+)?)\s*°?\s*(?P<ew>[EWew])?\s*$'
+)
+
+
+def parse_coordinates(text):
+    """
+    Return (latitude, longitude) in decimal degrees parsed from `text`, or
+    raise ValueError
+    """
+    match = COORDINATES.match(text or '')
+    if match is None:
+        raise ValueError("Enter coordinates as 'latitude,longitude' in decimal degrees")
+    latitude, longitude = float(match['latitude']), float(match['longitude'])
+    if match['ns'] and match['ns'] in 'Ss':
+        latitude = -abs(latitude)
+    if match['ew'] and match['ew'] in 'Ww':
+        longitude = -abs(longitude)
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise ValueError("Latitude must be within -90..90 and longitude within -180..180")
+    return latitude, longitude
+
+
+def locate(coordinates):
+    """
+    parse_coordinates() for stored values: (None, None) when blank or unparseable
+    """
+    try:
+        return parse_coordinates(coordinates)
+    except ValueError:
+        return None, None
+
+
+def haversine(latitude1, longitude1, latitude2, longitude2):
+    """
+    Great-circle distance in km
+    """
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Q on the latitude and longitude columns matching a box around the circle
+    of `radius_km`, split in two at the antimeridian and widened to every
+    longitude when it covers a pole
+    """
+    delta = radius_km / KM_PER_DEGREE
+    box = Q(latitude__gte=max(latitude - delta, -90), latitude__lte=min(latitude + delta, 90))
+    if latitude - delta <= -90 or latitude + delta >= 90:
+        return box & Q(longitude__isnull=False)
+    spread = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude))
+    if radius_km / EARTH_RADIUS_KM >= math.pi / 2 or spread >= 1:
+        return box & Q(longitude__isnull=False)
+    delta = math.degrees(math.asin(spread))
+    west, east = longitude - delta, longitude + delta
+    if west < -180:
+        return box & (Q(longitude__gte=west + 360) | Q(longitude__lte=east))
+    if east > 180:
+        return box & (Q(longitude__gte=west) | Q(longitude__lte=east - 360))
+    return box & Q(longitude__gte=west, longitude__lte=east)
+
+
+def within(queryset, latitude, longitude, radius_km):
+    """
+    (distance, pk) of the sites of `queryset` within `radius_km`, nearest
+    first. The (latitude, longitude) index prunes the table to the bounding
+    box; the exact haversine distance ranks what is left.
+    """
+    candidates = queryset.filter(bounding_box(latitude, longitude, radius_km)).values_list(
+        'pk', 'latitude', 'longitude'
+    )
+    distances = [(haversine(latitude, longitude, lat, lon), pk) for pk, lat, lon in candidates]
+    return sorted(item for item in distances if item[0] <= radius_km)
+
+
+def nearest(queryset, latitude, longitude, k=DEFAULT_NEAREST, radius_km=None):
+    """
+    (distance, pk) of the `k` sites nearest to the point, nearest first, and
+    the radius searched. Without `radius_km` the search widens from
+    INITIAL_RADIUS_KM until k sites are found or the whole globe is covered.
+    """
+    if radius_km is not None:
+        return within(queryset, latitude, longitude, radius_km)[:k], radius_km
+    radius_km = INITIAL_RADIUS_KM
+    while True:
+        found = within(queryset, latitude, longitude, radius_km)
+        if len(found) >= k or radius_km >= MAX_RADIUS_KM:
+            return found[:k], radius_km
+        radius_km = min(radius_km * 4, MAX_RADIUS_KM)
+
+
+REQUIRED = object()
+
+
+def number(params, name, minimum, maximum, default=REQUIRED, convert=float):
+    value = params.get(name)
+    if value in (None, ''):
+        if default is REQUIRED:
+            raise ValidationError({name: 'This parameter is required'})
+        return default
+    try:
+        value = convert(value)
+    except ValueError:
+        raise ValidationError({name: 'Enter a number'})
+    if not minimum <= value <= maximum or (convert is float and not math.isfinite(value)):
+        raise ValidationError({name: f'Enter a value from {minimum} to {maximum}'})
+    return value
+
+
+class NearestView(GenericAPIView):
+    """
+    The `k` sites (default 10, at most 100) nearest to `lat`/`lon`, with their
+    distance in km, optionally only those within `radius_km`. Sites without
+    parsed coordinates are left out.
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        latitude = number(params, 'lat', -90, 90)
+        longitude = number(params, 'lon', -180, 180)
+        k = number(params, 'k', 1, MAX_NEAREST, DEFAULT_NEAREST, convert=int)
+        radius_km = number(params, 'radius_km', 0, MAX_RADIUS_KM, None)
+        found, radius_km = nearest(self.get_queryset(), latitude, longitude, k, radius_km)
+        sites = self.get_queryset().in_bulk([pk for distance, pk in found])
+        results = []
+        for distance, pk in found:
+            data = self.get_serializer(sites[pk]).data
+            data['distance_km'] = round(distance, 3)
+            results.append(data)
+        return Response({
+            'latitude': latitude,
+            'longitude': longitude,
+            'radius_km': round(radius_km, 3),
+            'results': results,
+        })
@@ -0,0 +1,147 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from . import rollups, snapshots
+from .bulk import BULK_INSERT_BATCH_SIZE
+from .models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch
+from .sequences import allocate_batch_sequences
+from .serializers import BatchImportSerializer
+
+
+IMPORT_CHUNK_SIZE = 1000
+
+# Row field -> (model, business identifier field)
+REFERENCES = {
+    'collection_center': (CollectionCenter, 'center_id'),
+    'processing_facility': (ProcessingFacility, 'facility_id'),
+    'packaging_center': (PackagingCenter, 'center_id'),
+}
+
+
+def resolve(model, field, identifiers):
+    """
+    Map business identifiers to primary keys with one IN query
+    """
+    return dict(model.objects.filter(**{f'{field}__in': set(identifiers)}).values_list(field, 'pk'))
+
+
+def import_chunk(rows, offset=0):
+    """
+    Validate and insert one chunk of batch rows in a single transaction.
+    References are resolved with one query per model, batches and their
+    farmer links with two bulk inserts. Returns (created, errors) where
+    created maps row index to batch number and errors row index to details.
+    """
+    serializer = BatchImportSerializer()
+    errors = {}
+    valid = {}
+    for index, row in enumerate(rows, start=offset):
+        try:
+            valid[index] = serializer.run_validation(row)
+        except serializers.ValidationError as exc:
+            errors[index] = exc.detail
+
+    pks = {
+        name: resolve(model, field, [data[name] for data in valid.values()])
+        for name, (model, field) in REFERENCES.items()
+    }
+    farmers = resolve(Farmer, 'farmer_id', [f for data in valid.values() for f in data['contributing_farmers']])
+    for index, data in list(valid.items()):
+        row_errors = {}
+        for name, (model, field) in REFERENCES.items():
+            if data[name] not in pks[name]:
+                row_errors[name] = [f"Unknown {field} {data[name]}"]
+        unknown = [farmer_id for farmer_id in data['contributing_farmers'] if farmer_id not in farmers]
+        if unknown:
+            row_errors['contributing_farmers'] = [f"Unknown farmer_id {', '.join(unknown)}"]
+        if row_errors:
+            errors[index] = row_errors
+            del valid[index]
+
+    check_batch_numbers(valid, errors)
+
+    with transaction.atomic():
+        pending = defaultdict(list)
+        for index, data in valid.items():
+            if not data.get('sequence'):
+                pending[(data['doa'], data['year'])].append(index)
+        for (doa, year), indexes in sorted(pending.items()):
+            for index, sequence in zip(indexes, allocate_batch_sequences(doa, year, len(indexes))):
+                valid[index]['sequence'] = sequence
+
+        batches = []
+        for index in sorted(valid):
+            data = valid[index]
+            batches.append(Batch(
+                batch_number=data.get('batch_number') or f"{data['doa']}/{data['year']}/{data['sequence']}",
+                doa=data['doa'],
+                year=data['year'],
+                sequence=data['sequence'],
+                collection_center_id=pks['collection_center'][data['collection_center']],
+                processing_facility_id=pks['processing_facility'][data['processing_facility']],
+                packaging_center_id=pks['packaging_center'][data['packaging_center']],
+                packaging_date=data['packaging_date'],
+                expiry_date=data['expiry_date'],
+                net_weight=data.get('net_weight'),
+                zero_child_labor=data['zero_child_labor'],
+                zero_deforestation=data['zero_deforestation'],
+            ))
+        Batch.objects.bulk_create(batches, batch_size=BULK_INSERT_BATCH_SIZE)
+
+        through = Batch.contributing_farmers.through
+        links = [
+            through(batch_id=batch.pk, farmer_id=farmer_pk)
+            for batch, index in zip(batches, sorted(valid))
+            for farmer_pk in {farmers[farmer_id] for farmer_id in valid[index]['contributing_farmers']}
+        ]
+        through.objects.bulk_create(links, batch_size=BULK_INSERT_BATCH_SIZE)
+        rollups.record_created(batches)
+        snapshots.refresh([batch.pk for batch in batches])
+
+    created = {index: batch.batch_number for index, batch in zip(sorted(valid), batches)}
+    return created, errors
+
+
+def check_batch_numbers(valid, errors):
+    """
+    Reject explicit batch numbers that repeat within the chunk or already exist
+    """
+    supplied = defaultdict(list)
+    for index, data in valid.items():
+        if data.get('sequence'):
+            number = data.get('batch_number') or f"{data['doa']}/{data['year']}/{data['sequence']}"
+            supplied[number].append(index)
+    existing = set(Batch.objects.filter(batch_number__in=supplied).values_list('batch_number', flat=True))
+    for number, indexes in supplied.items():
+        if number in existing:
+            duplicates, message = indexes, f"{number} already exists"
+        else:
+            duplicates, message = indexes[1:], f"{number} is repeated in this upload"
+        for index in duplicates:
+            errors[index] = {'batch_number': [message]}
+            del valid[index]
+
+
+def import_batches(rows, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Import an iterable of batch rows chunk by chunk, calling
+    `progress(processed, created, failed)` after each chunk. Batch numbers
+    repeated across chunks are caught by the existing-number check.
+    """
+    rows = iter(rows)
+    created, errors = {}, {}
+    offset = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        chunk_created, chunk_errors = import_chunk(chunk, offset)
+        created.update(chunk_created)
+        errors.update(chunk_errors)
+        offset += len(chunk)
+        if progress:
+            progress(offset, len(created), len(errors))
+    return created, errors
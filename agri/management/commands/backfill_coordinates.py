@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from agri import cache, snapshots
+from agri.models import Batch, CollectionCenter, ProcessingFacility
+
+
+# Site model -> (label, business identifier, Batch foreign key)
+SITES = {
+    CollectionCenter: ('collection centers', 'center_id', 'collection_center'),
+    ProcessingFacility: ('processing facilities', 'facility_id', 'processing_facility'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Parse the free-text coordinates of existing collection centers and "
+        "processing facilities into latitude/longitude, and rebuild the "
+        "traceability snapshots that embed them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Re-parse every site, not only those without a latitude")
+        parser.add_argument('--chunk-size', type=int, default=snapshots.SNAPSHOT_CHUNK_SIZE,
+                            help="Sites updated per transaction")
+
+    def handle(self, *args, **options):
+        for model, (label, business_key, foreign_key) in SITES.items():
+            sites = model.objects.order_by('pk')
+            if not options['all']:
+                sites = sites.filter(latitude__isnull=True)
+            ids = list(sites.values_list('pk', flat=True))
+            located, unparseable = 0, []
+            for start in range(0, len(ids), options['chunk_size']):
+                # One transaction per chunk keeps locks short on large tables
+                with transaction.atomic():
+                    chunk = list(model.objects.filter(pk__in=ids[start:start + options['chunk_size']]))
+                    now = timezone.now()
+                    for site in chunk:
+                        site.locate()
+                        site.updated_at = now
+                        if site.latitude is not None:
+                            located += 1
+                        elif site.coordinates:
+                            unparseable.append(getattr(site, business_key))
+                    model.objects.bulk_update(chunk, ['latitude', 'longitude', 'updated_at'])
+                    batches = Batch.objects.filter(**{f'{foreign_key}__in': chunk})
+                    snapshots.refresh(batches.values_list('pk', flat=True))
+                    cache.invalidate(batches.values_list('batch_number', flat=True))
+                self.stdout.write(f"{label}: {start + len(chunk)}/{len(ids)}", ending='\r')
+            for identifier in unparseable:
+                self.stdout.write(self.style.WARNING(f"Could not parse the coordinates of {identifier}"))
+            self.stdout.write(self.style.SUCCESS(
+                f"Located {located} of {len(ids)} {label}, {len(unparseable)} unparseable"
+            ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from agri.models import Batch
+from agri.snapshots import SNAPSHOT_CHUNK_SIZE, refresh
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the denormalized traceability snapshot of batches that have none, "
+        "which reads otherwise render on every request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Rebuild every snapshot, not only missing ones")
+        parser.add_argument('--chunk-size', type=int, default=SNAPSHOT_CHUNK_SIZE,
+                            help="Batches rebuilt per transaction")
+
+    def handle(self, *args, **options):
+        batches = Batch.objects.order_by('pk')
+        if not options['all']:
+            batches = batches.filter(traceability__isnull=True)
+        ids = list(batches.values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        written = 0
+        for start in range(0, len(ids), chunk_size):
+            # One transaction per chunk keeps locks short on large tables
+            written += refresh(ids[start:start + chunk_size], chunk_size)
+            self.stdout.write(f"Built {written}/{len(ids)} snapshots", ending='\r')
+        self.stdout.write(self.style.SUCCESS(f"Built {written} traceability snapshots"))
@@ -0,0 +1,66 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from agri.authentication import CachedJWTAuthentication, user_cache
+
+
+AUTHENTICATORS = {
+    'jwt': JWTAuthentication,
+    'cached jwt': CachedJWTAuthentication,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per-request cost of authenticating a bearer token with "
+        "simplejwt's JWTAuthentication (one user query per request) and "
+        "agri.authentication.CachedJWTAuthentication"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=1000, help="Timed authentications per class")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        results = {}
+        # The benchmark user is rolled back with the transaction
+        with transaction.atomic():
+            user = get_user_model().objects.create_user('benchmark-auth', password=None)
+            request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+            user_cache.clear()
+            for label, authentication_class in AUTHENTICATORS.items():
+                results[label] = self.measure(authentication_class(), request, options['iterations'])
+            transaction.set_rollback(True)
+        user_cache.clear()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for label, stats in results.items():
+            self.stdout.write(
+                f"{label:<12} p50 {stats['p50_us']:>8.1f} us  mean {stats['mean_us']:>8.1f} us  "
+                f"{stats['queries']:>6} queries"
+            )
+
+    def measure(self, authenticator, request, iterations):
+        authenticator.authenticate(request)  # warm up
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                authenticator.authenticate(request)
+                timings.append((time.perf_counter() - start) * 1e6)
+        return {
+            'p50_us': round(statistics.median(timings), 1),
+            'mean_us': round(statistics.mean(timings), 1),
+            'queries': len(queries),
+        }
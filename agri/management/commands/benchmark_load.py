@@ -0,0 +1,105 @@
+import asyncio
+import json
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+from agri.models import Batch
+
+
+SCENARIOS = {
+    # name: (method, sync path, async path)
+    'search': ('POST', '/api/batches/search/batch_number', '/api/async/batches/search/batch_number'),
+    'dashboard': ('GET', '/api/dashboard/summary/', '/api/async/dashboard/summary/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the read endpoints of running servers and report sustained "
+        "requests/sec and latency percentiles, e.g. gunicorn main.wsgi on :8000 "
+        "against uvicorn main.asgi:application on :8001"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', help="Base URL of the WSGI server, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--asgi-url', help="Base URL of the ASGI server, e.g. http://127.0.0.1:8001")
+        parser.add_argument('--concurrency', type=int, default=50, help="Concurrent clients")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per scenario")
+        parser.add_argument('--batch-number', help="Batch to look up (default: the latest batch)")
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help="Scenario to run, repeatable (default: all)")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        targets = {
+            mode: url.rstrip('/') for mode, url in
+            (('wsgi', options['wsgi_url']), ('asgi', options['asgi_url'])) if url
+        }
+        if not targets:
+            raise CommandError("Pass --wsgi-url and/or --asgi-url")
+        batch_number = options['batch_number'] or (
+            Batch.objects.order_by('-id').values_list('batch_number', flat=True).first()
+        )
+        if batch_number is None:
+            raise CommandError("No batches to look up; create one or pass --batch-number")
+
+        results = {}
+        for scenario in options['scenario'] or sorted(SCENARIOS):
+            method, sync_path, async_path = SCENARIOS[scenario]
+            for mode, base_url in targets.items():
+                path = async_path if mode == 'asgi' else sync_path
+                results.setdefault(scenario, {})[mode] = asyncio.run(self.run_load(
+                    method, base_url + path, {'batch_number': batch_number},
+                    options['concurrency'], options['duration'],
+                ))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for scenario, modes in results.items():
+            for mode, stats in modes.items():
+                self.stdout.write(
+                    f"{scenario:<10} {mode:<5} {stats['requests_per_sec']:>9.1f} req/s  "
+                    f"p50 {stats['p50_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms  "
+                    f"errors {stats['errors']}"
+                )
+
+    async def run_load(self, method, url, payload, concurrency, duration):
+        timings = []
+        errors = 0
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            deadline = time.perf_counter() + duration
+
+            async def worker():
+                nonlocal errors
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        if method == 'POST':
+                            response = await client.post(url, json=payload)
+                        else:
+                            response = await client.get(url)
+                        failed = response.status_code >= 400
+                    except httpx.HTTPError:
+                        failed = True
+                    if failed:
+                        errors += 1
+                    else:
+                        timings.append((time.perf_counter() - start) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+        timings.sort()
+        if not timings:
+            return {'requests_per_sec': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'errors': errors}
+        return {
+            'requests_per_sec': round(len(timings) / elapsed, 1),
+            'p50_ms': round(timings[len(timings) // 2], 2),
+            'p99_ms': round(timings[min(int(len(timings) * 0.99), len(timings) - 1)], 2),
+            'errors': errors,
+        }
@@ -0,0 +1,109 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from agri.geo import haversine, nearest, within
+from agri.models import CollectionCenter
+
+
+# Roughly Ghana, where the seeded sites are
+LATITUDES = (4.7, 11.1)
+LONGITUDES = (-3.2, 1.2)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the nearest-site and radius lookups of agri.geo against a "
+        "full scan ranked by haversine distance, over synthetic collection "
+        "centers that are rolled back afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sites', type=int, default=100000, help="Synthetic sites to insert (default 100,000)")
+        parser.add_argument('--queries', type=int, default=50, help="Queries per scenario")
+        parser.add_argument('--k', type=int, default=10, help="Sites returned by the nearest lookup")
+        parser.add_argument('--radius-km', type=float, default=25, help="Radius of the radius lookup")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        points = [(rng.uniform(*LATITUDES), rng.uniform(*LONGITUDES)) for _ in range(options['queries'])]
+        k, radius_km = options['k'], options['radius_km']
+        queryset = CollectionCenter.objects.all()
+        with transaction.atomic():
+            self.seed(options['sites'], rng)
+            results = {
+                'sites': queryset.count(),
+                'scenarios': {
+                    f'nearest {k}': {
+                        'indexed': self.measure(lambda lat, lon: nearest(queryset, lat, lon, k)[0], points),
+                        'full scan': self.measure(lambda lat, lon: self.scan(lat, lon)[:k], points),
+                    },
+                    f'within {radius_km:g} km': {
+                        'indexed': self.measure(lambda lat, lon: within(queryset, lat, lon, radius_km), points),
+                        'full scan': self.measure(
+                            lambda lat, lon: [item for item in self.scan(lat, lon) if item[0] <= radius_km], points
+                        ),
+                    },
+                },
+            }
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"Sites: {results['sites']}")
+        for scenario, backends in results['scenarios'].items():
+            for backend, stats in backends.items():
+                self.stdout.write(
+                    f"{scenario:<16} {backend:<10} p50 {stats['p50_ms']:>9.2f} ms  "
+                    f"p95 {stats['p95_ms']:>9.2f} ms  {stats['queries_per_lookup']:>5} queries"
+                )
+
+    def scan(self, latitude, longitude):
+        """
+        What a lookup costs without the index: every site read and ranked
+        """
+        rows = CollectionCenter.objects.filter(latitude__isnull=False).values_list('pk', 'latitude', 'longitude')
+        return sorted((haversine(latitude, longitude, lat, lon), pk) for pk, lat, lon in rows)
+
+    def measure(self, lookup, points):
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for latitude, longitude in points:
+                start = time.perf_counter()
+                lookup(latitude, longitude)
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+            'queries_per_lookup': round(len(queries) / len(points), 1),
+        }
+
+    def seed(self, count, rng):
+        start = (CollectionCenter.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        sites = []
+        for number in range(start, start + count):
+            latitude, longitude = rng.uniform(*LATITUDES), rng.uniform(*LONGITUDES)
+            sites.append(CollectionCenter(
+                center_id=f"BN{number}",
+                name=f"Benchmark site {number}",
+                location='Benchmark',
+                coordinates=f"{latitude:.4f},{longitude:.4f}",
+                latitude=round(latitude, 4),
+                longitude=round(longitude, 4),
+                drying_method='Sun-dried',
+                capacity=10,
+            ))
+            if len(sites) == 10000:
+                CollectionCenter.objects.bulk_create(sites)
+                sites = []
+                self.stdout.write(f"Seeded up to {number}", ending='\r')
+        if sites:
+            CollectionCenter.objects.bulk_create(sites)
@@ -0,0 +1,297 @@
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from agri import urls
+from agri.models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch
+
+
+FARMER_ROW = {'name': 'Benchmark Farmer', 'gender': 'female', 'farm_size': 2.5, 'region': 'Ashanti'}
+COLLECTION_CENTER_ROW = {'name': 'Benchmark', 'location': 'Kumasi', 'drying_method': 'Sun-dried', 'capacity': 10}
+PROCESSING_FACILITY_ROW = {'name': 'Benchmark', 'location': 'Tema', 'capacity': 20, 'certifications': ['HACCP']}
+PACKAGING_CENTER_ROW = {'name': 'Benchmark', 'location': 'Accra', 'capacity': 5}
+
+# Requests issued per route name. `kwargs` maps URL kwargs to fixture names,
+# `write` requests run in a transaction that is rolled back afterwards.
+ROUTES = {
+    'farmer-list-create': [
+        {'method': 'GET'},
+        {'method': 'GET', 'label': 'search', 'query': {'search': 'Kwa'}},
+        {'method': 'GET', 'label': 'cursor', 'query': {'pagination': 'cursor'}},
+        {'method': 'POST', 'data': FARMER_ROW, 'write': True},
+    ],
+    'farmer-bulk-create': [{'method': 'POST', 'data': [FARMER_ROW] * 100, 'write': True}],
+    'farmer-export': [{'method': 'GET', 'query': {'region': 'Ashanti'}}],
+    'farmer-changes': [{'method': 'GET', 'query': {'page_size': 1000}}],
+    'farmer-detail': [{'method': 'GET', 'kwargs': {'farmer_id': 'farmer_id'}}],
+    'farmer-recall': [{'method': 'GET', 'kwargs': {'farmer_id': 'farmer_id'}}],
+    'collection-center-list-create': [
+        {'method': 'GET'},
+        {'method': 'POST', 'data': COLLECTION_CENTER_ROW, 'write': True},
+    ],
+    'collection-center-bulk-create': [{'method': 'POST', 'data': [COLLECTION_CENTER_ROW] * 20, 'write': True}],
+    'collection-center-changes': [{'method': 'GET', 'query': {'page_size': 1000}}],
+    'collection-center-nearest': [
+        {'method': 'GET', 'query': {'lat': '6.69', 'lon': '-1.62'}},
+        {'method': 'GET', 'label': 'radius', 'query': {'lat': '6.69', 'lon': '-1.62', 'radius_km': '100', 'k': '100'}},
+    ],
+    'collection-center-detail': [{'method': 'GET', 'kwargs': {'center_id': 'collection_center_id'}}],
+    'collection-center-recall': [{'method': 'GET', 'kwargs': {'center_id': 'collection_center_id'}}],
+    'processing-facility-list-create': [
+        {'method': 'GET'},
+        {'method': 'POST', 'data': PROCESSING_FACILITY_ROW, 'write': True},
+    ],
+    'processing-facility-bulk-create': [{'method': 'POST', 'data': [PROCESSING_FACILITY_ROW] * 20, 'write': True}],
+    'processing-facility-changes': [{'method': 'GET', 'query': {'page_size': 1000}}],
+    'processing-facility-nearest': [{'method': 'GET', 'query': {'lat': '5.60', 'lon': '-0.19'}}],
+    'processing-facility-detail': [{'method': 'GET', 'kwargs': {'facility_id': 'facility_id'}}],
+    'processing-facility-recall': [{'method': 'GET', 'kwargs': {'facility_id': 'facility_id'}}],
+    'packaging-center-list-create': [
+        {'method': 'GET'},
+        {'method': 'POST', 'data': PACKAGING_CENTER_ROW, 'write': True},
+    ],
+    'packaging-center-bulk-create': [{'method': 'POST', 'data': [PACKAGING_CENTER_ROW] * 20, 'write': True}],
+    'packaging-center-changes': [{'method': 'GET', 'query': {'page_size': 1000}}],
+    'packaging-center-detail': [{'method': 'GET', 'kwargs': {'center_id': 'packaging_center_id'}}],
+    'packaging-center-recall': [{'method': 'GET', 'kwargs': {'center_id': 'packaging_center_id'}}],
+    'batch-list-create': [
+        {'method': 'GET'},
+        {'method': 'GET', 'label': 'cursor', 'query': {'pagination': 'cursor'}},
+        {'method': 'GET', 'label': 'sparse', 'query': {'fields': 'batch_number,packaging_date,expiry_date'}},
+        {'method': 'POST', 'data': 'batch_row', 'write': True},
+    ],
+    'batch-import': [{'method': 'POST', 'data': 'batch_import_rows', 'write': True}],
+    'batch-changes': [{'method': 'GET', 'query': {'page_size': 1000}}],
+    'batch-export': [{'method': 'GET', 'query': {'include_farmers': 'true'}}],
+    'batch-cache-stats': [{'method': 'GET'}],
+    'batch-verify': [
+        {'method': 'GET', 'query': {'batch_numbers': 'verify_numbers'}},
+        {'method': 'POST', 'label': '500', 'data': 'verify_batch_numbers'},
+    ],
+    'batch-expiring': [
+        {'method': 'GET', 'query': {'from': 'expiry_from'}},
+        {'method': 'GET', 'label': 'center', 'query': {'from': 'expiry_from', 'packaging_center': 'packaging_center_pk'}},
+    ],
+    'batch-expiry-histogram': [
+        {'method': 'GET', 'query': {'from': 'expiry_from', 'days': '90'}},
+        {'method': 'GET', 'label': 'facility', 'query': {'from': 'expiry_from', 'days': '90', 'group': 'processing_facility'}},
+    ],
+    'batch-detail': [
+        {'method': 'GET', 'kwargs': {'batch_number': 'batch_number'}},
+        {'method': 'GET', 'label': 'snapshot', 'kwargs': {'batch_number': 'batch_number'},
+         'query': {'snapshot': 'true'}},
+    ],
+    'generate-batch-number': [{'method': 'POST', 'data': {'doa': 'BEN', 'year': '2025', 'count': 10}, 'write': True}],
+    'batch-search': [
+        {'method': 'POST', 'data': {'batch_number': 'batch_number'}},
+        {'method': 'POST', 'label': 'snapshot', 'query': {'snapshot': 'true'}, 'data': {'batch_number': 'batch_number'}},
+    ],
+    'recall-impact': [{'method': 'POST', 'data': 'recall_sources'}],
+    'dashboard-summary': [{'method': 'GET'}],
+    'site-throughput': [
+        {'method': 'GET', 'query': {'from': '2020-01-01', 'to': '2026-12-31', 'period': 'month'}},
+        {'method': 'GET', 'label': 'day', 'query': {'from': '2025-01-01', 'to': '2025-12-31', 'period': 'day',
+                                                   'site': 'packaging_center'}},
+    ],
+    'async-batch-search': [{'method': 'POST', 'data': {'batch_number': 'batch_number'}}],
+    'async-batch-detail': [{'method': 'GET', 'kwargs': {'batch_number': 'batch_number'}}],
+    'async-dashboard-summary': [{'method': 'GET'}],
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every route in agri/urls.py in-process against the current "
+        "database (see seed_data): latency percentiles, query counts and peak "
+        "memory per request, as JSON that can be diffed between releases"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per route")
+        parser.add_argument('--route', action='append', help="Only benchmark these route names")
+        parser.add_argument('--username', help="Authenticate requests as this user")
+        parser.add_argument('--output', help="Write the JSON results to this file")
+        parser.add_argument('--baseline', help="Compare against a previous --output file")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed p50 slowdown against the baseline (default 0.25 = 25%%)")
+
+    def handle(self, *args, **options):
+        fixtures = self.fixtures()
+        client = APIClient()
+        if options['username']:
+            client.force_authenticate(get_user_model().objects.get(username=options['username']))
+
+        names = [pattern.name for pattern in urls.urlpatterns if pattern.name]
+        missing = [name for name in names if name not in ROUTES]
+        if missing:
+            raise CommandError(f"No benchmark request defined for: {', '.join(missing)}")
+        if options['route']:
+            names = [name for name in names if name in options['route']]
+
+        results = {
+            'dataset': {
+                'farmers': Farmer.objects.count(),
+                'collection_centers': CollectionCenter.objects.count(),
+                'processing_facilities': ProcessingFacility.objects.count(),
+                'packaging_centers': PackagingCenter.objects.count(),
+                'batches': Batch.objects.count(),
+                'farmer_links': Batch.contributing_farmers.through.objects.count(),
+            },
+            'iterations': options['iterations'],
+            'routes': {},
+        }
+        for name in names:
+            for spec in ROUTES[name]:
+                label = f"{spec['method']} {name}" + (f" [{spec['label']}]" if 'label' in spec else '')
+                results['routes'][label] = self.benchmark(client, name, spec, fixtures, options['iterations'])
+                self.report(label, results['routes'][label])
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+        else:
+            self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'])
+
+    def fixtures(self):
+        batch = Batch.objects.order_by('-id').first()
+        if batch is None:
+            raise CommandError("The database has no batches; run seed_data first")
+        farmer_ids = list(Farmer.objects.order_by('id').values_list('farmer_id', flat=True)[:25])
+        farmer_pks = list(Farmer.objects.order_by('id').values_list('pk', flat=True)[:800])
+        batch_numbers = list(Batch.objects.order_by('id').values_list('batch_number', flat=True)[:499])
+        import_row = {
+            'doa': 'BEN', 'year': '2025',
+            'collection_center': batch.collection_center.center_id,
+            'processing_facility': batch.processing_facility.facility_id,
+            'packaging_center': batch.packaging_center.center_id,
+            'contributing_farmers': farmer_ids,
+            'packaging_date': '2025-01-01', 'expiry_date': '2026-01-01',
+            'zero_child_labor': True, 'zero_deforestation': True,
+        }
+        return {
+            'farmer_id': farmer_ids[0],
+            'collection_center_id': batch.collection_center.center_id,
+            'facility_id': batch.processing_facility.facility_id,
+            'packaging_center_id': batch.packaging_center.center_id,
+            'batch_number': batch.batch_number,
+            'batch_import_rows': [import_row] * 100,
+            'verify_numbers': ','.join(batch_numbers[:50]),
+            'expiry_from': (batch.expiry_date - timedelta(days=15)).isoformat(),
+            'packaging_center_pk': str(batch.packaging_center_id),
+            'verify_batch_numbers': {'batch_numbers': batch_numbers + ['ASH/1999/MISSING']},
+            'recall_sources': {
+                'farmers': farmer_ids,
+                'collection_centers': [batch.collection_center.center_id],
+                'processing_facilities': [batch.processing_facility.facility_id],
+            },
+            'batch_row': {
+                'batch_number': 'BEN/2025/BENCH', 'doa': 'BEN', 'year': '2025', 'sequence': 'BENCH',
+                'collection_center': batch.collection_center_id,
+                'processing_facility': batch.processing_facility_id,
+                'packaging_center': batch.packaging_center_id,
+                'contributing_farmers': farmer_pks,
+                'packaging_date': '2025-01-01', 'expiry_date': '2026-01-01',
+                'zero_child_labor': True, 'zero_deforestation': True,
+            },
+        }
+
+    def request(self, client, name, spec, fixtures):
+        url = reverse(name, kwargs={key: fixtures[value] for key, value in spec.get('kwargs', {}).items()})
+        data = spec.get('data')
+        if isinstance(data, str):
+            data = fixtures[data]
+        elif isinstance(data, dict):
+            data = {key: fixtures.get(value, value) if isinstance(value, str) else value
+                    for key, value in data.items()}
+        query = {key: fixtures.get(value, value) if isinstance(value, str) else value
+                 for key, value in spec.get('query', {}).items()}
+
+        def send():
+            if spec['method'] == 'GET':
+                response = client.get(url, query)
+            else:
+                target = f"{url}?{'&'.join(f'{k}={v}' for k, v in query.items())}" if query else url
+                response = client.post(target, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+
+        if not spec.get('write'):
+            return send()
+        try:
+            with transaction.atomic():
+                response = send()
+                raise Rollback()
+        except Rollback:
+            return response
+
+    def benchmark(self, client, name, spec, fixtures, iterations):
+        try:
+            response = self.request(client, name, spec, fixtures)  # warm up
+        except Exception as exc:
+            return {'error': f"{type(exc).__name__}: {exc}"}
+
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            self.request(client, name, spec, fixtures)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.request(client, name, spec, fixtures)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 2),
+            'p99_ms': round(timings[min(int(len(timings) * 0.99), len(timings) - 1)], 2),
+            'max_ms': round(timings[-1], 2),
+            'queries': len(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def report(self, label, stats):
+        if 'error' in stats:
+            self.stderr.write(f"{label:<55} {stats['error']}")
+            return
+        self.stderr.write(
+            f"{label:<55} {stats['status']}  p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms  "
+            f"{stats['queries']:>3} queries  {stats['peak_memory_kb']:>9.1f} KiB"
+        )
+
+    def compare(self, results, baseline_path, tolerance):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)['routes']
+        regressions = []
+        for label, stats in results['routes'].items():
+            before = baseline.get(label)
+            if not before or 'error' in before or 'error' in stats:
+                continue
+            if stats['queries'] > before['queries']:
+                regressions.append(f"{label}: {before['queries']} -> {stats['queries']} queries")
+            if stats['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+                regressions.append(f"{label}: p50 {before['p50_ms']} -> {stats['p50_ms']} ms")
+        for regression in regressions:
+            self.stderr.write(self.style.ERROR(regression))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regressions against {baseline_path}")
+        self.stderr.write(self.style.SUCCESS(f"No regressions against {baseline_path}"))
@@ -0,0 +1,123 @@
+import json
+import random
+import statistics
+import time
+from functools import reduce
+from operator import or_
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from agri.models import Farmer
+from agri.search import install_search_indexes, search_queryset
+
+
+FIRST_NAMES = [
+    'Kwame', 'Kofi', 'Kwaku', 'Yaw', 'Kwabena', 'Kojo', 'Kwesi', 'Akosua', 'Adwoa',
+    'Abena', 'Akua', 'Yaa', 'Afua', 'Ama', 'Esi', 'Efua', 'Aminata', 'Ibrahim',
+]
+LAST_NAMES = [
+    'Mensah', 'Boateng', 'Owusu', 'Asante', 'Osei', 'Agyeman', 'Kwarteng', 'Darko',
+    'Appiah', 'Amoah', 'Ofori', 'Addo', 'Serwaa', 'Badu', 'Acheampong', 'Frimpong',
+]
+SURNAME_SYLLABLES = ['ko', 'fi', 'ya', 'ba', 'da', 'ma', 'ne', 'sa', 'to', 'ku', 'wa', 'ri', 'bo', 'te', 'ng', 'du']
+REGIONS = ['Ashanti', 'Eastern', 'Western', 'Central', 'Bono', 'Volta']
+
+
+def typo(word, rng):
+    index = rng.randrange(1, len(word) - 1)
+    return word[:index] + word[index + 1] + word[index] + word[index + 2:]
+
+
+class Command(BaseCommand):
+    help = "Benchmark ranked farmer search against the legacy icontains scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farmers', type=int, default=1000000,
+                            help="Farmer rows to benchmark against (default 1,000,000)")
+        parser.add_argument('--seed', action='store_true',
+                            help="Insert synthetic farmers until --farmers rows exist")
+        parser.add_argument('--queries', type=int, default=50, help="Queries per scenario")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        if options['seed']:
+            self.seed(options['farmers'], rng)
+        install_search_indexes()
+
+        total = Farmer.objects.count()
+        terms = {
+            'prefix': [rng.choice(FIRST_NAMES)[:3] for _ in range(options['queries'])],
+            'typo': [typo(rng.choice(LAST_NAMES), rng) for _ in range(options['queries'])],
+            'farmer_id': [f"F{rng.randrange(1, max(total, 2))}" for _ in range(options['queries'])],
+        }
+        fields = ['name', '^farmer_id']
+        results = {'farmers': total, 'scenarios': {}}
+        for scenario, scenario_terms in terms.items():
+            results['scenarios'][scenario] = {
+                'ranked': self.measure(
+                    lambda term: search_queryset(Farmer.objects.all(), fields, term), scenario_terms
+                ),
+                'icontains': self.measure(
+                    lambda term: Farmer.objects.filter(
+                        reduce(or_, [Q(name__icontains=term), Q(farmer_id__icontains=term)])
+                    ),
+                    scenario_terms,
+                ),
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"Farmers: {total}")
+        for scenario, backends in results['scenarios'].items():
+            for backend, stats in backends.items():
+                self.stdout.write(
+                    f"{scenario:<10} {backend:<10} p50 {stats['p50_ms']:>9.2f} ms  "
+                    f"p95 {stats['p95_ms']:>9.2f} ms  max {stats['max_ms']:>9.2f} ms"
+                )
+
+    def measure(self, build, terms):
+        """
+        Time what the list view does: the first page of 10 plus the total count
+        """
+        timings = []
+        for term in terms:
+            start = time.perf_counter()
+            queryset = build(term)
+            list(queryset[:10])
+            queryset.count()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+            'max_ms': round(timings[-1], 2),
+        }
+
+    def surname(self, rng):
+        # Mix common surnames with generated ones for a realistic spread of names
+        if rng.random() < 0.5:
+            return rng.choice(LAST_NAMES)
+        return ''.join(rng.choice(SURNAME_SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+    def seed(self, target, rng):
+        existing = Farmer.objects.count()
+        start = (Farmer.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        batch = []
+        for number in range(start, start + max(target - existing, 0)):
+            batch.append(Farmer(
+                farmer_id=f"F{str(number).zfill(3)}",
+                name=f"{rng.choice(FIRST_NAMES)} {self.surname(rng)}",
+                gender=rng.choice(['male', 'female']),
+                farm_size=round(rng.uniform(0.5, 20), 2),
+                region=rng.choice(REGIONS),
+                certification=rng.choice(['Organic', 'Fair Trade', 'None']),
+            ))
+            if len(batch) == 10000:
+                Farmer.objects.bulk_create(batch)
+                batch = []
+                self.stdout.write(f"Seeded up to {number}", ending='\r')
+        if batch:
+            Farmer.objects.bulk_create(batch)
@@ -0,0 +1,90 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from agri.models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch
+from agri.projections import (
+    FARMER_PROJECTION, COLLECTION_CENTER_PROJECTION, PROCESSING_FACILITY_PROJECTION,
+    PACKAGING_CENTER_PROJECTION, BATCH_PROJECTION
+)
+from agri.renderers import FastJSONRenderer
+from agri.serializers import (
+    FarmerSerializer, CollectionCenterSerializer, ProcessingFacilitySerializer,
+    PackagingCenterSerializer, BatchSerializer
+)
+
+
+# name -> (queryset, serializer, projection)
+TARGETS = {
+    'farmers': (Farmer.objects.all(), FarmerSerializer, FARMER_PROJECTION),
+    'collection_centers': (CollectionCenter.objects.all(), CollectionCenterSerializer, COLLECTION_CENTER_PROJECTION),
+    'processing_facilities': (
+        ProcessingFacility.objects.all(), ProcessingFacilitySerializer, PROCESSING_FACILITY_PROJECTION
+    ),
+    'packaging_centers': (PackagingCenter.objects.all(), PackagingCenterSerializer, PACKAGING_CENTER_PROJECTION),
+    'batches': (Batch.objects.with_related(), BatchSerializer, BATCH_PROJECTION),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the CPU cost of rendering list pages through the serializers and "
+        "JSONRenderer against the values() projections and FastJSONRenderer, per "
+        "1,000 rows, and check that both produce the same bytes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Rows rendered per run")
+        parser.add_argument('--runs', type=int, default=10, help="Timed runs per path")
+        parser.add_argument('--target', action='append', choices=list(TARGETS), help="Only these models")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        results = {}
+        for name in options['target'] or TARGETS:
+            queryset, serializer_class, projection = TARGETS[name]
+            queryset = queryset.order_by('id')[:options['rows']]
+            rows = queryset.count()
+            if not rows:
+                continue
+
+            def serializer_path():
+                return JSONRenderer().render(serializer_class(list(queryset), many=True).data)
+
+            def projection_path():
+                return FastJSONRenderer().render(projection.rows(projection.values(queryset)))
+
+            if serializer_path() != projection_path():
+                raise CommandError(f"{name}: the projection output differs from the serializer output")
+            serializer = self.measure(serializer_path, options['runs'], rows)
+            projected = self.measure(projection_path, options['runs'], rows)
+            results[name] = {
+                'rows': rows,
+                'serializer_cpu_ms_per_1000': serializer,
+                'projection_cpu_ms_per_1000': projected,
+                'speedup': round(serializer / projected, 1) if projected else None,
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<22} {stats['rows']:>6} rows  serializer {stats['serializer_cpu_ms_per_1000']:>9.2f} ms  "
+                f"projection {stats['projection_cpu_ms_per_1000']:>8.2f} ms  per 1,000 rows  x{stats['speedup']}"
+            )
+
+    def measure(self, render, runs, rows):
+        """
+        Median CPU time of this process (SQL execution in the database server
+        is excluded) per 1,000 rows
+        """
+        timings = []
+        for _ in range(runs):
+            start = time.process_time()
+            render()
+            timings.append((time.process_time() - start) * 1000 * 1000 / rows)
+        return round(statistics.median(timings), 2)
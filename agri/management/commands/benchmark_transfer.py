@@ -0,0 +1,84 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from agri.models import Batch
+
+
+# label -> (url name, kwargs, query)
+REQUESTS = {
+    'farmer list (100)': ('farmer-list-create', {}, {'page_size': 100}),
+    'batch list (100)': ('batch-list-create', {}, {'page_size': 100}),
+    'batch list sparse (100)': ('batch-list-create', {}, {'page_size': 100, 'fields': 'batch_number,expiry_date'}),
+    'batch detail': ('batch-detail', {'batch_number': None}, {}),
+    'batch export (streamed)': ('batch-export', {}, {'include_farmers': 'true'}),
+}
+
+ENCODINGS = ('identity', 'gzip', 'br')
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the bytes and latency saved by response compression (gzip, "
+        "brotli) and by conditional GETs (If-None-Match answered with 304) on "
+        "the list, detail and export endpoints, through the full middleware stack"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help="Timed requests per variant")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        batch_number = Batch.objects.order_by('-id').values_list('batch_number', flat=True).first()
+        if batch_number is None:
+            raise CommandError("The database has no batches; run seed_data first")
+
+        client = Client()
+        results = {}
+        for label, (name, kwargs, query) in REQUESTS.items():
+            url = reverse(name, kwargs={key: batch_number for key in kwargs})
+            variants = {}
+            for encoding in ENCODINGS:
+                variants[encoding] = self.measure(client, url, query, options['iterations'], HTTP_ACCEPT_ENCODING=encoding)
+            etag = self.fetch(client, url, query)[0].get('ETag')
+            if etag:
+                variants['304'] = self.measure(
+                    client, url, query, options['iterations'], HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING='br'
+                )
+            identity = variants['identity']
+            for stats in variants.values():
+                stats['bytes_saved_pct'] = round(100 * (1 - stats['bytes'] / identity['bytes']), 1) \
+                    if identity['bytes'] else 0.0
+            results[label] = variants
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for label, variants in results.items():
+            for variant, stats in variants.items():
+                self.stdout.write(
+                    f"{label:<26} {variant:<9} {stats['status']}  {stats['bytes']:>10} bytes "
+                    f"({stats['bytes_saved_pct']:>5.1f}% saved)  p50 {stats['p50_ms']:>8.2f} ms"
+                )
+
+    def fetch(self, client, url, query, **headers):
+        response = client.get(url, query, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def measure(self, client, url, query, iterations, **headers):
+        response, body = self.fetch(client, url, query, **headers)  # warm up
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            self.fetch(client, url, query, **headers)
+            timings.append((time.perf_counter() - start) * 1000)
+        return {
+            'status': response.status_code,
+            'bytes': len(body),
+            'p50_ms': round(statistics.median(timings), 2),
+        }
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from agri.snapshots import find_stale, refresh
+
+
+class Command(BaseCommand):
+    help = (
+        "Find batches whose traceability snapshot is missing or out of date, "
+        "e.g. after raw SQL or queryset.update() writes. Exits non-zero when "
+        "stale snapshots are found, unless --repair rebuilds them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help="Rebuild the stale snapshots")
+
+    def handle(self, *args, **options):
+        stale = list(find_stale())
+        for pk, batch_number in stale:
+            self.stdout.write(f"Stale snapshot: {batch_number}")
+        if stale and options['repair']:
+            refresh(pk for pk, batch_number in stale)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(stale)} snapshots"))
+        elif stale:
+            raise CommandError(f"{len(stale)} stale traceability snapshots")
+        else:
+            self.stdout.write(self.style.SUCCESS("All traceability snapshots are up to date"))
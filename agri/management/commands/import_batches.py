@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agri.bulk import clean_csv_row, list_fields, read_csv
+from agri.imports import IMPORT_CHUNK_SIZE, import_batches
+from agri.serializers import BatchImportSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Import historical batches from a CSV or JSON file. Sites and farmers are "
+        "referenced by center_id / facility_id / farmer_id; contributing_farmers is "
+        "';'-separated in CSV. Each chunk is committed in its own transaction and "
+        "invalid rows are reported without stopping the import"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON (array of objects) file")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help="Rows per transaction")
+        parser.add_argument('--errors', help="Write per-row errors to this JSON file")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path.endswith('.json'):
+            with open(path) as source:
+                rows = json.load(source)
+            if not isinstance(rows, list):
+                raise CommandError("The JSON file must contain an array of batch objects")
+        else:
+            with open(path, 'rb') as source:
+                fields = list_fields(BatchImportSerializer())
+                rows = [clean_csv_row(row, fields) for row in read_csv(source)]
+
+        def progress(processed, created, failed):
+            self.stdout.write(f"{processed}/{len(rows)} rows: {created} created, {failed} failed", ending='\r')
+
+        created, errors = import_batches(rows, options['chunk_size'], progress)
+        self.stdout.write('')
+        for index in sorted(errors)[:20]:
+            self.stderr.write(f"Row {index}: {json.dumps(errors[index])}")
+        if len(errors) > 20:
+            self.stderr.write(f"... and {len(errors) - 20} more")
+        if options['errors']:
+            with open(options['errors'], 'w') as output:
+                json.dump([{"row": index, "errors": errors[index]} for index in sorted(errors)], output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Imported {len(created)} batches, {len(errors)} rows failed"))
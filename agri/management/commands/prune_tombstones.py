@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from agri.sync import prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete change-feed tombstones older than SYNC_TOMBSTONE_DAYS. Clients "
+        "holding an older cursor are told to sync again from scratch. Schedule "
+        "daily (e.g. cron)"
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} tombstones"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from agri import throughput
+from agri.rollups import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the dashboard rollups and the site throughput from the source "
+        "tables and correct any drift. Schedule periodically (e.g. hourly cron) "
+        "to repair counts changed by raw SQL or queryset.update()"
+    )
+
+    def handle(self, *args, **options):
+        drifted = reconcile()
+        for metric, key in drifted:
+            self.stdout.write(f"Corrected {metric}[{key}]")
+        self.stdout.write(self.style.SUCCESS(f"Rollups reconciled, {len(drifted)} corrected"))
+        drifted = throughput.reconcile()
+        for site, object_id, day in drifted:
+            self.stdout.write(f"Corrected {site} {object_id} throughput on {day}")
+        self.stdout.write(self.style.SUCCESS(f"Throughput reconciled, {len(drifted)} corrected"))
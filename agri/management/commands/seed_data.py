@@ -0,0 +1,197 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from agri import rollups
+from agri.models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch
+from agri.sequences import allocate_batch_sequences, allocate_identifiers
+from agri.snapshots import refresh
+
+from .benchmark_search import FIRST_NAMES, LAST_NAMES, REGIONS
+
+
+# (town, latitude, longitude) of cocoa-growing and port towns in Ghana
+TOWNS = [
+    ('Kumasi', 6.6885, -1.6244), ('Sunyani', 7.3349, -2.3123), ('Koforidua', 6.0940, -0.2591),
+    ('Takoradi', 4.8845, -1.7554), ('Cape Coast', 5.1053, -1.2466), ('Ho', 6.6008, 0.4713),
+    ('Tema', 5.6698, -0.0166), ('Accra', 5.6037, -0.1870), ('Obuasi', 6.2027, -1.6706),
+    ('Tarkwa', 5.3018, -1.9930),
+]
+DRYING_METHODS = [choice for choice, label in CollectionCenter.DRYING_METHOD_CHOICES]
+FACILITY_CERTIFICATIONS = [choice for choice, label in ProcessingFacility.CERTIFICATION_CHOICES]
+FARMER_CERTIFICATIONS = [choice for choice, label in Farmer.CERTIFICATION_CHOICES]
+DOAS = ['ASH', 'BON', 'EST', 'WST', 'CEN', 'VOL']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a realistic, deterministic dataset of farmers, sites and batches for "
+        "load testing. The same --seed against an empty database always produces "
+        "the same rows"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farmers', type=int, default=10000)
+        parser.add_argument('--collection-centers', type=int, default=50)
+        parser.add_argument('--processing-facilities', type=int, default=10)
+        parser.add_argument('--packaging-centers', type=int, default=10)
+        parser.add_argument('--batches', type=int, default=2000)
+        parser.add_argument('--farmers-per-batch', type=int, default=25,
+                            help="Contributing farmers per batch (the M2M fan-out)")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per INSERT")
+
+    def handle(self, *args, **options):
+        if options['batches'] and not all(
+            options[name] for name in ('farmers', 'collection_centers', 'processing_facilities', 'packaging_centers')
+        ):
+            raise CommandError("Batches need at least one farmer and one of each site")
+        if options['farmers_per_batch'] > options['farmers']:
+            raise CommandError("--farmers-per-batch cannot exceed --farmers")
+
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        farmer_ids = self.insert(Farmer, 'farmer_id', 'F', options['farmers'], self.farmer, 'farmers')
+        collection_ids = self.insert(
+            CollectionCenter, 'center_id', 'CC', options['collection_centers'], self.collection_center,
+            'collection centers',
+        )
+        facility_ids = self.insert(
+            ProcessingFacility, 'facility_id', 'PF', options['processing_facilities'], self.processing_facility,
+            'processing facilities',
+        )
+        packaging_ids = self.insert(
+            PackagingCenter, 'center_id', 'PC', options['packaging_centers'], self.packaging_center,
+            'packaging centers',
+        )
+        self.insert_batches(
+            options['batches'], options['farmers_per_batch'],
+            farmer_ids, collection_ids, facility_ids, packaging_ids,
+        )
+
+    def insert(self, model, field, prefix, count, build, label):
+        """
+        Insert `count` rows built by `build(identifier)` in chunks and return
+        their primary keys
+        """
+        pks = []
+        for start in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - start)
+            with transaction.atomic():
+                objs = [build(identifier) for identifier in allocate_identifiers(model, field, prefix, size)]
+                model.objects.bulk_create(objs)
+                rollups.record_created(objs)
+            pks.extend(obj.pk for obj in objs)
+            self.stdout.write(f"{label}: {len(pks)}/{count}", ending='\r')
+        self.stdout.write(f"Seeded {count} {label}")
+        return pks
+
+    def insert_batches(self, count, fan_out, farmer_ids, collection_ids, facility_ids, packaging_ids):
+        through = Batch.contributing_farmers.through
+        years = [str(year) for year in range(2022, 2026)]
+        created = 0
+        for start in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - start)
+            with transaction.atomic():
+                pairs = Counter((self.rng.choice(DOAS), self.rng.choice(years)) for _ in range(size))
+                batches = []
+                for (doa, year), pair_count in sorted(pairs.items()):
+                    for sequence in allocate_batch_sequences(doa, year, pair_count):
+                        batches.append(self.batch(
+                            doa, year, sequence, collection_ids, facility_ids, packaging_ids
+                        ))
+                Batch.objects.bulk_create(batches)
+                through.objects.bulk_create(
+                    [
+                        through(batch_id=batch.pk, farmer_id=farmer_id)
+                        for batch in batches
+                        for farmer_id in self.rng.sample(farmer_ids, fan_out)
+                    ],
+                    batch_size=self.chunk_size,
+                )
+                rollups.record_created(batches)
+                refresh([batch.pk for batch in batches])
+            created += size
+            self.stdout.write(f"batches: {created}/{count}", ending='\r')
+        self.stdout.write(f"Seeded {count} batches with {fan_out} farmers each")
+
+    def batch(self, doa, year, sequence, collection_ids, facility_ids, packaging_ids):
+        packaging_date = date(int(year), 1, 1) + timedelta(days=self.rng.randrange(365))
+        return Batch(
+            batch_number=f"{doa}/{year}/{sequence}",
+            doa=doa,
+            year=year,
+            sequence=sequence,
+            collection_center_id=self.rng.choice(collection_ids),
+            processing_facility_id=self.rng.choice(facility_ids),
+            packaging_center_id=self.rng.choice(packaging_ids),
+            packaging_date=packaging_date,
+            expiry_date=packaging_date + timedelta(days=self.rng.choice([180, 365, 540, 730])),
+            net_weight=round(self.rng.uniform(0.5, 5), 2),
+            zero_child_labor=True,
+            zero_deforestation=True,
+        )
+
+    def person(self):
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+
+    def town(self):
+        town, latitude, longitude = self.rng.choice(TOWNS)
+        coordinates = f"{latitude + self.rng.uniform(-0.2, 0.2):.4f},{longitude + self.rng.uniform(-0.2, 0.2):.4f}"
+        return town, coordinates
+
+    def farmer(self, farmer_id):
+        return Farmer(
+            farmer_id=farmer_id,
+            name=self.person(),
+            gender=self.rng.choice(['male', 'female']),
+            age=self.rng.randint(18, 75),
+            farm_size=round(self.rng.uniform(0.5, 20), 2),
+            years_in_farming=self.rng.randint(0, 40),
+            region=self.rng.choice(REGIONS),
+            certification=self.rng.choice(FARMER_CERTIFICATIONS),
+        )
+
+    def collection_center(self, center_id):
+        town, coordinates = self.town()
+        site = CollectionCenter(
+            center_id=center_id,
+            name=f"{town} Collection Center",
+            location=town,
+            coordinates=coordinates,
+            manager=self.person(),
+            contact=f"+23324{self.rng.randrange(10 ** 7):07d}",
+            drying_method=self.rng.choice(DRYING_METHODS),
+            capacity=round(self.rng.uniform(5, 50), 1),
+        )
+        # bulk_create() skips save(), which fills these in
+        site.locate()
+        return site
+
+    def processing_facility(self, facility_id):
+        town, coordinates = self.town()
+        site = ProcessingFacility(
+            facility_id=facility_id,
+            name=f"{town} Processing",
+            location=town,
+            coordinates=coordinates,
+            manager=self.person(),
+            contact=f"+23320{self.rng.randrange(10 ** 7):07d}",
+            capacity=round(self.rng.uniform(20, 200), 1),
+            certifications=self.rng.sample(FACILITY_CERTIFICATIONS, self.rng.randint(1, 3)),
+        )
+        # bulk_create() skips save(), which fills these in
+        site.locate()
+        return site
+
+    def packaging_center(self, center_id):
+        town, coordinates = self.town()
+        return PackagingCenter(
+            center_id=center_id,
+            name=f"{town} Packaging",
+            location=town,
+            capacity=round(self.rng.uniform(5, 80), 1),
+        )
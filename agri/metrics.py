@@ -0,0 +1,109 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+
+# Upper bounds of the histogram buckets, Prometheus style (`le`)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class RouteMetrics:
+    """
+    Per-process aggregates of request timings by (route, method). Each worker
+    keeps its own registry; Prometheus sums them across scrape targets.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.db_seconds = defaultdict(float)
+        self.serialize_seconds = defaultdict(float)
+        self.render_seconds = defaultdict(float)
+        self.response_bytes = defaultdict(int)
+        self.responses = defaultdict(int)
+        self.reads = defaultdict(int)
+
+    def observe(self, route, method, status, metrics):
+        key = (route, method)
+        with self.lock:
+            self.durations[key].observe(metrics.total)
+            self.queries[key].observe(metrics.queries)
+            self.db_seconds[key] += metrics.db_time
+            self.serialize_seconds[key] += metrics.serialize_time
+            self.render_seconds[key] += metrics.render_time
+            self.response_bytes[key] += max(metrics.response_size, 0)
+            self.responses[key + (status,)] += 1
+            for database in metrics.databases:
+                self.reads[key + (database,)] += 1
+
+    def render(self):
+        """
+        Return the registry in the Prometheus text exposition format
+        """
+        def labels(route, method):
+            route = route.replace('\\', '\\\\').replace('"', '\\"')
+            return f'route="{route}",method="{method}"'
+
+        lines = []
+        with self.lock:
+            lines += [
+                '# HELP agri_request_duration_seconds Time spent handling the request',
+                '# TYPE agri_request_duration_seconds histogram',
+            ]
+            for (route, method), histogram in sorted(self.durations.items()):
+                lines += histogram.lines('agri_request_duration_seconds', labels(route, method))
+            lines += [
+                '# HELP agri_request_db_queries SQL queries executed per request',
+                '# TYPE agri_request_db_queries histogram',
+            ]
+            for (route, method), histogram in sorted(self.queries.items()):
+                lines += histogram.lines('agri_request_db_queries', labels(route, method))
+            for name, help_text, values in (
+                ('agri_request_db_seconds_total', 'Time spent in SQL queries', self.db_seconds),
+                ('agri_request_serialize_seconds_total', 'Time spent in serializers', self.serialize_seconds),
+                ('agri_request_render_seconds_total', 'Time spent rendering responses', self.render_seconds),
+                ('agri_response_bytes_total', 'Response body bytes (non-streaming)', self.response_bytes),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for (route, method), value in sorted(values.items()):
+                    lines.append(f'{name}{{{labels(route, method)}}} {value}')
+            lines += ['# HELP agri_responses_total Responses by status', '# TYPE agri_responses_total counter']
+            for (route, method, status), count in sorted(self.responses.items()):
+                lines.append(f'agri_responses_total{{{labels(route, method)},status="{status}"}} {count}')
+            lines += [
+                '# HELP agri_request_reads_total Requests by database their reads were routed to',
+                '# TYPE agri_request_reads_total counter',
+            ]
+            for (route, method, database), count in sorted(self.reads.items()):
+                lines.append(f'agri_request_reads_total{{{labels(route, method)},database="{database}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = RouteMetrics()
@@ -0,0 +1,332 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from .metrics import registry
+from .routing import PIN_COOKIE, ReadRoute, choose_replica, current_route, pin_seconds
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger('agri.performance')
+
+# Statements kept per request for the slow-request log
+MAX_RECORDED_QUERIES = 200
+SLOW_QUERIES_LOGGED = 5
+
+current_metrics = ContextVar('agri_request_metrics', default=None)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = self.view_end = None
+        self.total = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = []
+        self.response_size = -1
+        self.databases = ()
+        self.serialize_time = 0.0
+        self.serializing = False
+
+    @property
+    def render_time(self):
+        # From the view returning its (unrendered) response to the end of the request
+        if self.view_end is None:
+            return 0.0
+        return max(self.total - (self.view_end - self.start), 0.0)
+
+    @property
+    def app_time(self):
+        # View code minus the time spent waiting on SQL and serializing
+        if self.view_start is None:
+            return 0.0
+        view_time = (self.view_end or self.start + self.total) - self.view_start
+        return max(view_time - self.db_time - self.serialize_time, 0.0)
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.2f}',
+            f'app;dur={self.app_time * 1000:.2f}',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'total;dur={self.total * 1000:.2f}',
+        ])
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        metrics.queries += 1
+        metrics.db_time += duration
+        if len(metrics.statements) < MAX_RECORDED_QUERIES:
+            metrics.statements.append((duration, sql))
+
+
+@contextmanager
+def serializing():
+    """
+    Count the block as serialization time of the current request, less the
+    SQL it runs (lazy relations). Nested blocks are counted once.
+    """
+    metrics = current_metrics.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    start, db_time = time.perf_counter(), metrics.db_time
+    try:
+        yield
+    finally:
+        metrics.serializing = False
+        metrics.serialize_time += max(time.perf_counter() - start - (metrics.db_time - db_time), 0.0)
+
+
+def install_query_recorder(connection, **kwargs):
+    """
+    Time every query on `connection`. Installed on each new connection, so
+    queries the async ORM runs on executor threads are counted too (the
+    request's context variable follows them there).
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid='agri_query_recorder')
+
+
+class PerformanceMiddleware:
+    """
+    Measure each request: SQL query count and time, serializer, view and
+    render time and response size. Adds a Server-Timing header, logs slow requests with their
+    slowest SQL, and feeds the per-route histograms served at /metrics.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', 500)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook returns
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.view_end = time.perf_counter()
+        return response
+
+    def finish(self, request, response, metrics):
+        metrics.total = time.perf_counter() - metrics.start
+        if not response.streaming:
+            metrics.response_size = len(response.content)
+        response['Server-Timing'] = metrics.server_timing()
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match else 'unmatched'
+        registry.observe(route, request.method, response.status_code, metrics)
+
+        if metrics.total * 1000 >= self.slow_request_ms:
+            self.log_slow_request(request, response, metrics)
+        return response
+
+    def log_slow_request(self, request, response, metrics):
+        slowest = sorted(metrics.statements, key=lambda statement: statement[0], reverse=True)
+        details = [f"\n  {duration * 1000:.1f} ms: {sql}" for duration, sql in slowest[:SLOW_QUERIES_LOGGED]]
+        # The same statement run many times is usually an N+1 query
+        repeated = Counter(sql for duration, sql in metrics.statements).most_common(1)
+        if repeated and repeated[0][1] > 1:
+            details.append(f"\n  repeated {repeated[0][1]}x: {repeated[0][0]}")
+        logger.warning(
+            "Slow request %s %s -> %s in %.1f ms (%d queries, %.1f ms SQL, %.1f ms render, %d bytes)%s",
+            request.method, request.get_full_path(), response.status_code, metrics.total * 1000,
+            metrics.queries, metrics.db_time * 1000, metrics.render_time * 1000, metrics.response_size,
+            ''.join(details),
+        )
+
+
+def accepted_encodings(header):
+    """
+    Content codings of an Accept-Encoding header that are not refused with q=0
+    """
+    encodings = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+def brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def brotli_async_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    async for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress API payloads (JSON, NDJSON and CSV, streamed or not) with brotli
+    when the client accepts it and the brotli package is installed, else with
+    gzip. Bodies under `min_length` bytes and other content types, such as the
+    browsable API's HTML with its CSRF token, are sent uncompressed.
+    """
+    min_length = 1024
+    brotli_quality = 4
+    compressible_types = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain')
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in self.compressible_types:
+            return response
+        if not response.streaming and len(response.content) < self.min_length:
+            return response
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is None or 'br' not in accepted or response.has_header('Content-Encoding'):
+            if 'gzip' not in accepted:
+                patch_vary_headers(response, ('Accept-Encoding',))
+                return response
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = brotli_async_sequence(response.streaming_content, self.brotli_quality)
+            else:
+                response.streaming_content = brotli_sequence(response.streaming_content, self.brotli_quality)
+            del response.headers['Content-Length']
+        else:
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of GET, HEAD and OPTIONS requests on agri views to a read
+    replica (agri.routing.ReplicaRouter), except on views setting
+    `read_primary`. Responses to writes set a short-lived cookie that keeps
+    the client on the primary until the replicas have caught up. The databases
+    read from are listed in the X-Read-Database header and counted per route
+    at /metrics.
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        route = ReadRoute()
+        token = current_route.set(route)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_route.reset(token)
+        return self.finish(request, response, route)
+
+    async def __acall__(self, request):
+        route = ReadRoute()
+        token = current_route.set(route)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_route.reset(token)
+        return self.finish(request, response, route)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route = current_route.get()
+        if route is None or request.method not in self.safe_methods or PIN_COOKIE in request.COOKIES:
+            return
+        if getattr(getattr(view_func, 'view_class', None), 'read_primary', False):
+            return
+        if view_func.__module__.split('.')[0] == 'agri':
+            route.start(choose_replica())
+
+    def finish(self, request, response, route):
+        if route.used:
+            response['X-Read-Database'] = ', '.join(sorted(route.used))
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.databases = tuple(route.used)
+        if route.wrote or (request.method not in self.safe_methods and response.status_code < 400):
+            response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds(), httponly=True, samesite='Lax')
+        return response
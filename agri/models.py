@@ -1,6 +1,82 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.contrib.postgres.fields import ArrayField
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class Sequence(models.Model):
+    """
+    Named counter used to hand out business identifiers and batch sequences
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.last_value}"
+
+
+class Rollup(models.Model):
+    """
+    Precomputed dashboard count (and optional sum) for one metric and key,
+    maintained incrementally on save/delete and reconciled periodically
+    """
+    metric = models.CharField(max_length=50)
+    key = models.CharField(max_length=100, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+    total = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'key'], name='unique_rollup_metric_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric}[{self.key}] = {self.count}"
+
+
+class SiteThroughput(models.Model):
+    """
+    Batches packaged through one site on one day and their net weight,
+    maintained incrementally on save/delete (agri.throughput)
+    """
+    site = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    day = models.DateField()
+    batches = models.BigIntegerField(default=0)
+    tons = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['site', 'object_id', 'day'], name='unique_site_throughput_day'),
+        ]
+        indexes = [
+            models.Index(fields=['site', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.site} {self.object_id} on {self.day}: {self.batches} batches"
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted row, served by the change feeds (agri.sync) so offline
+    clients can drop it
+    """
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    key = models.CharField(max_length=20)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'deleted_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.key} deleted {self.deleted_at}"
 
 
 class Farmer(models.Model):
@@ -27,12 +103,37 @@ class Farmer(models.Model):
     status = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.farmer_id} - {self.name}"
 
 
-class CollectionCenter(models.Model):
+class Located:
+    """
+    Keeps `latitude`/`longitude` parsed from the free-text `coordinates`, for
+    the nearest-site lookups in agri.geo
+    """
+
+    def locate(self):
+        from .geo import locate
+
+        self.latitude, self.longitude = locate(self.coordinates)
+
+    def save(self, *args, **kwargs):
+        self.locate()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'coordinates' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'latitude', 'longitude'}
+        super().save(*args, **kwargs)
+
+
+class CollectionCenter(Located, models.Model):
     DRYING_METHOD_CHOICES = (
         ('Sun-dried', 'Sun-dried'),
         ('Mechanical drying', 'Mechanical drying'),
@@ -43,6 +144,8 @@ class CollectionCenter(models.Model):
     name = models.CharField(max_length=100)
     location = models.CharField(max_length=100)
     coordinates = models.CharField(max_length=50, null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
     manager = models.CharField(max_length=100, null=True, blank=True)
     contact = models.CharField(max_length=20, null=True, blank=True)
     drying_method = models.CharField(max_length=30, choices=DRYING_METHOD_CHOICES)
@@ -50,12 +153,19 @@ class CollectionCenter(models.Model):
     status = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
+            models.Index(fields=['latitude', 'longitude']),
+        ]
     
     def __str__(self):
         return f"{self.center_id} - {self.name}"
 
 
-class ProcessingFacility(models.Model):
+class ProcessingFacility(Located, models.Model):
 
     CERTIFICATION_CHOICES = [
         ('HACCP', 'HACCP Certified'),
@@ -68,6 +178,8 @@ class ProcessingFacility(models.Model):
     name = models.CharField(max_length=100)
     location = models.CharField(max_length=100)
     coordinates = models.CharField(max_length=50, null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
     manager = models.CharField(max_length=100, null=True, blank=True)
     contact = models.CharField(max_length=20, null=True, blank=True)
     capacity = models.FloatField(validators=[MinValueValidator(0)], help_text="Capacity in tons/day")
@@ -79,6 +191,13 @@ class ProcessingFacility(models.Model):
     status = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
+            models.Index(fields=['latitude', 'longitude']),
+        ]
     
     def __str__(self):
         return f"{self.facility_id} - {self.name}"
@@ -92,11 +211,31 @@ class PackagingCenter(models.Model):
     status = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.center_id} - {self.name}"
 
 
+class BatchQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """
+        Join the centers and prefetch contributing farmers used by BatchSerializer.
+        The snapshot column, read only by the snapshot endpoints, is deferred.
+        """
+        return self.defer('traceability').select_related(
+            'collection_center', 'processing_facility', 'packaging_center'
+        ).prefetch_related(
+            models.Prefetch('contributing_farmers', queryset=Farmer.objects.order_by('id'))
+        )
+
+
 class Batch(models.Model):
     batch_number = models.CharField(max_length=20, unique=True)
     doa = models.CharField(max_length=4)  # Department of Agriculture
@@ -108,10 +247,28 @@ class Batch(models.Model):
     contributing_farmers = models.ManyToManyField(Farmer, related_name='batches')
     packaging_date = models.DateField()
     expiry_date = models.DateField()
+    net_weight = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(0)], help_text="Net weight in tons"
+    )
     zero_child_labor = models.BooleanField(default=False)
     zero_deforestation = models.BooleanField(default=False)
+    # Denormalized BatchSerializer document, rebuilt by agri.snapshots
+    traceability = models.JSONField(null=True, blank=True, editable=False, encoder=DjangoJSONEncoder)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BatchQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['packaging_date', 'id']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
+            # Expiry windows, overall and per site (agri.expiry)
+            models.Index(fields=['expiry_date', 'id']),
+            models.Index(fields=['packaging_center', 'expiry_date']),
+            models.Index(fields=['processing_facility', 'expiry_date']),
+        ]
     
     def __str__(self):
         return self.batch_number
@@ -0,0 +1,223 @@
+import base64
+import binascii
+import json
+import operator
+from collections import OrderedDict
+from datetime import date
+from functools import reduce
+
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CappedPageNumberPagination(PageNumberPagination):
+    """
+    Page number pagination with a client-chosen page size capped server-side
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    row_count = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.row_count = getattr(view, 'row_count', None)
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, object_list, per_page):
+        # Reuse the row count a view already read (see agri.conditional)
+        paginator = DjangoPaginator(object_list, per_page)
+        if self.row_count is not None:
+            paginator.count = self.row_count
+        return paginator
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a composite ordering such as
+    ('-created_at', '-id').
+
+    The cursor holds the ordering values of the row at the page edge, so every
+    page is a single indexed range scan with no COUNT(*) and no OFFSET. A unique
+    tiebreaker is always appended to the ordering. NULLs sort as the largest
+    value, matching PostgreSQL's default.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [
+            (queryset.model._meta.pk.attname if name.lstrip('-') == 'pk' else name.lstrip('-'),
+             name.startswith('-'))
+            for name in self.ordering
+        ]
+
+        position, reverse = self.decode_cursor(request)
+        ordering = [(name, not desc) if reverse else (name, desc) for name, desc in self.fields]
+        queryset = queryset.order_by(*[
+            F(name).desc(nulls_first=True) if desc else F(name).asc(nulls_last=True)
+            for name, desc in ordering
+        ])
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Use the OrderingFilter ordering when one was requested, falling back to
+        the view's `cursor_ordering`, and make it unique with an id tiebreaker
+        """
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if not ordering:
+            ordering = getattr(view, 'cursor_ordering', self.ordering)
+        ordering = list(ordering)
+        if not any(name.lstrip('-') in ('id', 'pk') for name in ordering):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return tuple(ordering)
+
+    def seek_filter(self, ordering, position):
+        """
+        Build the row-value comparison "(f1, f2, ...) after (v1, v2, ...)"
+        """
+        terms = []
+        for index, (name, desc) in enumerate(ordering):
+            term = self.after(name, desc, position[index])
+            if term is None:
+                continue
+            for (previous_name, _), value in zip(ordering[:index], position):
+                term &= self.equal(previous_name, value)
+            terms.append(term)
+        return reduce(operator.or_, terms, Q(pk__in=[]))
+
+    @staticmethod
+    def after(name, desc, value):
+        if desc:
+            return Q(**{f'{name}__isnull': False}) if value is None else Q(**{f'{name}__lt': value})
+        if value is None:
+            return None
+        return Q(**{f'{name}__gt': value}) | Q(**{f'{name}__isnull': True})
+
+    @staticmethod
+    def equal(name, value):
+        if value is None:
+            return Q(**{f'{name}__isnull': True})
+        return Q(**{name: value})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (binascii.Error, KeyError, TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, instance, reverse):
+        # Pages hold model instances, or `.values()` rows on the fast read path
+        if isinstance(instance, dict):
+            position = [instance[name] for name, _ in self.fields]
+        else:
+            position = [getattr(instance, name) for name, _ in self.fields]
+        position = [value.isoformat() if isinstance(value, date) else value for value in position]
+        encoded = base64.urlsafe_b64encode(
+            json.dumps({'p': position, 'r': int(reverse)}).encode('ascii')
+        ).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class AgriPagination(BasePagination):
+    """
+    Page number pagination by default; clients opt into keyset pagination per
+    request with `?pagination=cursor` (kept in the returned next/previous links)
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.mode_query_param) == self.cursor_mode:
+            self.paginator = KeysetPagination()
+        else:
+            self.paginator = CappedPageNumberPagination()
+        page = self.paginator.paginate_queryset(queryset, request, view)
+        self.display_page_controls = getattr(self.paginator, 'display_page_controls', False)
+        return page
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_paginated_response_schema(self, schema):
+        return CappedPageNumberPagination().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return CappedPageNumberPagination().get_schema_operation_parameters(view)
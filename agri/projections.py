@@ -0,0 +1,246 @@
+import copy
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import Http404
+from django.utils.timezone import get_current_timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .middleware import serializing
+from .models import Batch
+from .renderers import FastJSONRenderer
+from .serializers import (
+    FarmerSerializer, CollectionCenterSerializer, ProcessingFacilitySerializer,
+    PackagingCenterSerializer, BatchSerializer
+)
+
+
+# Serializer fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.ChoiceField, serializers.IntegerField,
+    serializers.FloatField, serializers.BooleanField, serializers.ReadOnlyField,
+    serializers.RelatedField,
+)
+
+
+def iso_format(field, default):
+    output_format = getattr(field, 'format', default)
+    return output_format is not None and output_format.lower() == ISO_8601
+
+
+def representation(field):
+    """
+    Return `convert(value, timezone)` turning a database value into the
+    field's output, or None when the value is output unchanged. Dates and
+    datetimes skip DRF's per-value settings and timezone lookups.
+    """
+    if isinstance(field, serializers.ListField) and isinstance(field.child, PASSTHROUGH_FIELDS):
+        return lambda value, timezone: list(value)
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    if isinstance(field, serializers.DateTimeField) and iso_format(field, api_settings.DATETIME_FORMAT) \
+            and not hasattr(field, 'timezone'):
+        def convert(value, timezone):
+            if timezone is None or value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+    if isinstance(field, serializers.DateField) and iso_format(field, api_settings.DATE_FORMAT):
+        return lambda value, timezone: value.isoformat()
+    return lambda value, timezone: field.to_representation(value)
+
+
+def current_timezone():
+    """
+    The timezone DRF renders datetimes in, looked up once per page
+    """
+    return get_current_timezone() if settings.USE_TZ else None
+
+
+class Projection:
+    """
+    Build a ModelSerializer's representation straight from `.values()` rows.
+
+    The serializer's fields are inspected once, so producing a row costs a
+    dict lookup per column instead of the field objects DRF builds for every
+    instance. `nested` maps a foreign key to the projection of the related
+    serializer, read through the same query with `<name>__` lookups.
+    """
+
+    def __init__(self, serializer_class, prefix='', nested=None):
+        self.prefix = prefix
+        self.nested = nested or {}
+        self.columns = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if name in self.nested:
+                self.columns.append((name, None, self.nested[name]))
+            else:
+                self.columns.append((name, prefix + field.source, representation(field)))
+
+    @property
+    def lookups(self):
+        lookups = []
+        for name, lookup, convert in self.columns:
+            lookups.extend(convert.lookups if lookup is None else [lookup])
+        return lookups
+
+    def values(self, queryset, extra=()):
+        """
+        Read the projected columns, plus `extra` ones needed by the caller
+        (e.g. the pagination's ordering)
+        """
+        lookups = self.lookups
+        return queryset.prefetch_related(None).values(*lookups, *[name for name in extra if name not in lookups])
+
+    def sparse(self, fields, expand):
+        """
+        Copy of the projection limited to `fields`, None meaning all, with the
+        nested relations outside `expand` rendered as their primary key
+        """
+        projection = copy.copy(self)
+        projection.columns = []
+        for name, lookup, convert in self.columns:
+            if fields is not None and name not in fields:
+                continue
+            if lookup is None and expand is not None and name not in expand:
+                lookup, convert = self.prefix + name, None
+            projection.columns.append((name, lookup, convert))
+        return projection
+
+    def project(self, row, timezone):
+        data = {}
+        for name, lookup, convert in self.columns:
+            if lookup is None:
+                data[name] = convert.project(row, timezone)
+                continue
+            value = row[lookup]
+            data[name] = value if value is None or convert is None else convert(value, timezone)
+        return data
+
+    def rows(self, rows):
+        with serializing():
+            timezone = current_timezone()
+            return [self.project(row, timezone) for row in rows]
+
+
+class BatchProjection(Projection):
+    """
+    BatchSerializer representation with nested sites and contributing farmers.
+    The farmers of a page of batches are read with one query, in the order of
+    the `with_related()` prefetch.
+    """
+
+    def __init__(self):
+        self.farmers = Projection(FarmerSerializer, 'farmer__')
+        super().__init__(BatchSerializer, nested={
+            'collection_center': Projection(CollectionCenterSerializer, 'collection_center__'),
+            'processing_facility': Projection(ProcessingFacilitySerializer, 'processing_facility__'),
+            'packaging_center': Projection(PackagingCenterSerializer, 'packaging_center__'),
+        })
+        self.columns = [column for column in self.columns if column[0] != 'contributing_farmers']
+        self.order = list(BatchSerializer().fields)
+
+    def values(self, queryset, extra=()):
+        return super().values(queryset, ('id', *extra))
+
+    def sparse(self, fields, expand):
+        projection = super().sparse(fields, expand)
+        projection.order = [name for name in self.order if fields is None or name in fields]
+        if expand is not None and 'contributing_farmers' not in expand:
+            projection.farmers = None
+        return projection
+
+    def rows(self, rows):
+        with serializing():
+            rows = list(rows)
+            timezone = current_timezone()
+            results = [self.project(row, timezone) for row in rows]
+            if 'contributing_farmers' in self.order:
+                farmers = self.contributing_farmers([row['id'] for row in rows], timezone)
+                for row, data in zip(rows, results):
+                    data['contributing_farmers'] = farmers[row['id']]
+            return [{name: data[name] for name in self.order} for data in results]
+
+    def contributing_farmers(self, batch_ids, timezone):
+        """
+        Map batch ids to their farmers, or farmer primary keys when collapsed
+        """
+        farmers = defaultdict(list)
+        links = Batch.contributing_farmers.through.objects.filter(batch_id__in=batch_ids).order_by('farmer_id')
+        if self.farmers is None:
+            for batch_id, farmer_id in links.values_list('batch_id', 'farmer_id'):
+                farmers[batch_id].append(farmer_id)
+            return farmers
+        for link in links.values('batch_id', *self.farmers.lookups):
+            farmers[link['batch_id']].append(self.farmers.project(link, timezone))
+        return farmers
+
+
+FARMER_PROJECTION = Projection(FarmerSerializer)
+COLLECTION_CENTER_PROJECTION = Projection(CollectionCenterSerializer)
+PROCESSING_FACILITY_PROJECTION = Projection(ProcessingFacilitySerializer)
+PACKAGING_CENTER_PROJECTION = Projection(PackagingCenterSerializer)
+BATCH_PROJECTION = BatchProjection()
+
+
+class ProjectionMixin:
+    """
+    Opt-in fast read path for list and detail views (settings.FAST_READS).
+    Rows are read with `.values()` and projected into the output of the
+    view's serializer without instantiating models or serializer fields.
+    Filtering, ordering and pagination apply unchanged; JSON is rendered
+    with FastJSONRenderer. Writes still go through the serializer.
+    """
+    projection = None
+
+    def use_projection(self):
+        return self.projection is not None and getattr(settings, 'FAST_READS', False)
+
+    def get_projection(self):
+        return self.projection
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not self.use_projection():
+            return renderers
+        return [
+            FastJSONRenderer() if type(renderer) is JSONRenderer else renderer
+            for renderer in renderers
+        ]
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_projection():
+            return super().list(request, *args, **kwargs)
+        projection = self.get_projection()
+        # Keyset cursors are built from the ordering columns of the page rows
+        ordering = [*getattr(self, 'cursor_ordering', ()), *getattr(self, 'ordering_fields', ()), 'id']
+        queryset = projection.values(
+            self.filter_queryset(self.get_queryset()), [name.lstrip('-') for name in ordering]
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(projection.rows(page))
+        return Response(projection.rows(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_projection():
+            return super().retrieve(request, *args, **kwargs)
+        return Response(self.get_projected_object())
+
+    def get_projected_object(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        projection = self.get_projection()
+        rows = projection.rows(projection.values(queryset)[:1])
+        if not rows:
+            raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+        self.check_object_permissions(self.request, rows[0])
+        return rows[0]
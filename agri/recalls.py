@@ -0,0 +1,126 @@
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from .imports import resolve
+from .models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch
+
+
+MAX_RECALL_SOURCES = 1000
+
+# Request key -> (model, business identifier, Batch column). Farmers reach
+# their batches through the contributing_farmers link table.
+RECALL_SOURCES = {
+    'farmers': (Farmer, 'farmer_id', None),
+    'collection_centers': (CollectionCenter, 'center_id', 'collection_center_id'),
+    'processing_facilities': (ProcessingFacility, 'facility_id', 'processing_facility_id'),
+    'packaging_centers': (PackagingCenter, 'center_id', 'packaging_center_id'),
+}
+
+RECALL_COLUMNS = (
+    ('batch_number', 'batch_number'),
+    ('packaging_date', 'packaging_date'),
+    ('expiry_date', 'expiry_date'),
+    ('collection_center', 'collection_center__center_id'),
+    ('processing_facility', 'processing_facility__facility_id'),
+    ('packaging_center', 'packaging_center__center_id'),
+)
+
+
+# SQLSTATE raised when statement_timeout cancels a query
+QUERY_CANCELED = '57014'
+
+
+def source_condition(key, pks):
+    """
+    Batches depending on the `key` entities with primary keys `pks`
+    """
+    model, field, column = RECALL_SOURCES[key]
+    if column is None:
+        through = Batch.contributing_farmers.through
+        return Q(pk__in=through.objects.filter(farmer_id__in=pks).values('batch_id'))
+    return Q(**{f'{column}__in': pks})
+
+
+def limit_statement_time():
+    """
+    Bound the recall queries with a transaction-local statement timeout
+    """
+    timeout = getattr(settings, 'RECALL_TIMEOUT_MS', 10000)
+    if connection.vendor == 'postgresql' and timeout:
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL statement_timeout = %s', [int(timeout)])
+
+
+def timed_out(error):
+    """
+    True when the database `error` is a statement cancelled by the timeout
+    (SQLSTATE 57014, query_canceled) rather than any other operational error
+    """
+    cause = error.__cause__
+    return QUERY_CANCELED in (getattr(cause, 'sqlstate', None), getattr(cause, 'pgcode', None))
+
+
+def impact(sources, in_date_only=False, today=None):
+    """
+    Return every batch depending on any of `sources` ({key: [business ids]})
+    with aggregate counts, using one IN query per source type to resolve the
+    identifiers, one aggregate query and one query for the batch rows.
+    Unknown identifiers are reported under `missing`.
+    """
+    today = today or timezone.localdate()
+    conditions = {}
+    missing = {}
+    for key, identifiers in sources.items():
+        model, field, column = RECALL_SOURCES[key]
+        pks = resolve(model, field, identifiers)
+        unknown = sorted(set(identifiers) - set(pks))
+        if unknown:
+            missing[key] = unknown
+        if pks:
+            conditions[key] = source_condition(key, list(pks.values()))
+
+    result = {
+        'sources': {key: sorted(set(identifiers)) for key, identifiers in sources.items()},
+        'missing': missing,
+        'as_of': today,
+        'summary': {
+            'batches': 0, 'in_date': 0, 'expired': 0,
+            'earliest_expiry': None, 'latest_expiry': None,
+            'by_source': {key: 0 for key in sources},
+        },
+        'batches': [],
+    }
+    if not conditions:
+        return result
+
+    in_date = Q(expiry_date__gte=today)
+    batches = Batch.objects.filter(reduce(operator.or_, conditions.values()))
+    with transaction.atomic():
+        limit_statement_time()
+        summary = batches.aggregate(
+            batches=Count('id'),
+            in_date=Count('id', filter=in_date),
+            earliest_expiry=Min('expiry_date'),
+            latest_expiry=Max('expiry_date'),
+            **{f'source_{key}': Count('id', filter=condition) for key, condition in conditions.items()},
+        )
+        if in_date_only:
+            batches = batches.filter(in_date)
+        rows = batches.order_by('expiry_date', 'id').values_list(*[lookup for _, lookup in RECALL_COLUMNS])
+        names = [name for name, _ in RECALL_COLUMNS]
+        result['batches'] = [dict(zip(names, row), in_date=row[2] >= today) for row in rows]
+
+    result['summary'].update({
+        'batches': summary['batches'],
+        'in_date': summary['in_date'],
+        'expired': summary['batches'] - summary['in_date'],
+        'earliest_expiry': summary['earliest_expiry'],
+        'latest_expiry': summary['latest_expiry'],
+    })
+    result['summary']['by_source'].update({key: summary[f'source_{key}'] for key in conditions})
+    return result
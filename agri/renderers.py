@@ -0,0 +1,51 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def plain_floats(data):
+    """
+    True when every float in `data` is finite and in the range Python prints
+    without an exponent, so orjson writes it exactly as the stock encoder does.
+    """
+    pending = [[data]]
+    while pending:
+        for value in pending.pop():
+            if type(value) is float:
+                if not (1e-4 <= abs(value) < 1e16 or value == 0):
+                    return False
+            elif isinstance(value, dict):
+                pending.append(value.values())
+            elif isinstance(value, (list, tuple)):
+                pending.append(value)
+    return True
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding compact responses with orjson when it is installed.
+    Used by the FAST_READS projection path (agri.projections); the default
+    renderer stays JSONRenderer. Dates and other non-JSON types still go
+    through DRF's encoder, and data holding non-finite or exponent-form floats,
+    indented output and values orjson cannot encode fall back to
+    JSONRenderer, so the output matches it byte for byte.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+            or not plain_floats(data)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Keep the output a strict javascript subset, as JSONRenderer does
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
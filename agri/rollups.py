@@ -0,0 +1,234 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.db.models.signals import post_delete, post_save
+
+from . import throughput
+from .models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch, Rollup, SiteThroughput
+
+
+TOTAL_METRICS = {
+    Farmer: 'farmers',
+    Batch: 'batches',
+    CollectionCenter: 'collection_centers',
+    ProcessingFacility: 'processing_facilities',
+    PackagingCenter: 'packaging_centers',
+}
+
+# Weekly expiry histograms: metric -> site column. Keys are
+# "<Monday of the expiry week>:<site id>", so a date window is a key range.
+EXPIRY_METRICS = {
+    'batches_by_packaging_center_expiry_week': 'packaging_center_id',
+    'batches_by_facility_expiry_week': 'processing_facility_id',
+}
+
+DASHBOARD_METRICS = (
+    *TOTAL_METRICS.values(), 'farmers_by_region', 'farmers_by_certification', 'batches_by_facility_month',
+)
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def contributions(instance):
+    """
+    Return the (metric, key) -> (count, total) amounts a row adds to the rollups
+    """
+    amounts = {(TOTAL_METRICS[type(instance)], ''): (1, 0.0)}
+    if isinstance(instance, Farmer):
+        amounts[('farmers_by_region', instance.region)] = (1, instance.farm_size or 0.0)
+        amounts[('farmers_by_certification', instance.certification)] = (1, 0.0)
+    elif isinstance(instance, Batch) and instance.packaging_date:
+        key = f"{instance.processing_facility_id}:{instance.packaging_date:%Y-%m}"
+        amounts[('batches_by_facility_month', key)] = (1, 0.0)
+    if isinstance(instance, Batch) and instance.expiry_date:
+        for metric, column in EXPIRY_METRICS.items():
+            key = f"{week_start(instance.expiry_date):%Y-%m-%d}:{getattr(instance, column)}"
+            amounts[(metric, key)] = (1, 0.0)
+    return amounts
+
+
+def apply(deltas):
+    """
+    Add `deltas` ((metric, key) -> [count, total]) to the stored rollups
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+    with transaction.atomic():
+        for (metric, key), (count, total) in sorted(deltas.items()):
+            updated = Rollup.objects.filter(metric=metric, key=key).update(
+                count=F('count') + count, total=F('total') + total
+            )
+            if not updated:
+                rollup, created = Rollup.objects.get_or_create(
+                    metric=metric, key=key, defaults={'count': count, 'total': total}
+                )
+                if not created:
+                    Rollup.objects.filter(pk=rollup.pk).update(
+                        count=F('count') + count, total=F('total') + total
+                    )
+
+
+def accumulate(deltas, instance, sign):
+    for key, (count, total) in contributions(instance).items():
+        deltas[key][0] += sign * count
+        deltas[key][1] += sign * total
+
+
+def record_created(objs):
+    """
+    Count rows inserted without model signals, e.g. bulk_create or COPY
+    """
+    deltas = defaultdict(lambda: [0, 0.0])
+    for obj in objs:
+        accumulate(deltas, obj, 1)
+    apply(deltas)
+    throughput.record(added=[obj for obj in objs if isinstance(obj, Batch)])
+
+
+def update_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = defaultdict(lambda: [0, 0.0])
+    accumulate(deltas, instance, 1)
+    previous = getattr(instance, '_previous', None)
+    if previous is not None:
+        accumulate(deltas, previous, -1)
+    apply(deltas)
+    if isinstance(instance, Batch):
+        throughput.record(added=[instance], removed=[previous] if previous is not None else [])
+
+
+def update_on_delete(sender, instance, **kwargs):
+    deltas = defaultdict(lambda: [0, 0.0])
+    accumulate(deltas, instance, -1)
+    apply(deltas)
+    if isinstance(instance, Batch):
+        throughput.record(removed=[instance])
+
+
+def connect_signals():
+    for model in TOTAL_METRICS:
+        uid = f'agri_rollups_{model._meta.model_name}'
+        post_save.connect(update_on_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(update_on_delete, sender=model, dispatch_uid=uid)
+
+
+def compute():
+    """
+    Recompute every rollup from the source tables with GROUP BY queries
+    """
+    expected = {}
+    for model, metric in TOTAL_METRICS.items():
+        expected[(metric, '')] = (model.objects.count(), 0.0)
+    for row in Farmer.objects.values('region').annotate(count=Count('id'), total=Sum('farm_size')):
+        expected[('farmers_by_region', row['region'])] = (row['count'], row['total'] or 0.0)
+    for row in Farmer.objects.values('certification').annotate(count=Count('id')):
+        expected[('farmers_by_certification', row['certification'])] = (row['count'], 0.0)
+    months = (
+        Batch.objects.annotate(month=TruncMonth('packaging_date'))
+        .values('processing_facility_id', 'month').annotate(count=Count('id'))
+    )
+    for row in months:
+        key = f"{row['processing_facility_id']}:{row['month']:%Y-%m}"
+        expected[('batches_by_facility_month', key)] = (row['count'], 0.0)
+    for metric, column in EXPIRY_METRICS.items():
+        weeks = Batch.objects.annotate(week=TruncWeek('expiry_date')).values(column, 'week').annotate(count=Count('id'))
+        for row in weeks:
+            expected[(metric, f"{row['week']:%Y-%m-%d}:{row[column]}")] = (row['count'], 0.0)
+    return expected
+
+
+def reconcile():
+    """
+    Correct drift between the stored rollups and the source tables. Returns
+    the (metric, key) pairs that had to be fixed.
+    """
+    with transaction.atomic():
+        expected = compute()
+        stored = {
+            (rollup.metric, rollup.key): rollup
+            for rollup in Rollup.objects.select_for_update()
+        }
+        drifted = []
+        for key, (count, total) in expected.items():
+            rollup = stored.pop(key, None)
+            if rollup is None:
+                Rollup.objects.create(metric=key[0], key=key[1], count=count, total=total)
+                drifted.append(key)
+            elif rollup.count != count or abs(rollup.total - total) > 1e-6:
+                rollup.count, rollup.total = count, total
+                rollup.save(update_fields=['count', 'total', 'updated_at'])
+                drifted.append(key)
+        for key, rollup in stored.items():
+            if rollup.count or rollup.total:
+                drifted.append(key)
+        Rollup.objects.filter(pk__in=[rollup.pk for rollup in stored.values()]).delete()
+    return drifted
+
+
+def format_summary(rollups):
+    totals = {metric: 0 for metric in TOTAL_METRICS.values()}
+    by_region, by_certification, by_facility_month = [], [], []
+    for rollup in rollups:
+        if rollup.key == '' and rollup.metric in totals:
+            totals[rollup.metric] = rollup.count
+        elif rollup.metric == 'farmers_by_region':
+            by_region.append({
+                "region": rollup.key, "farmers": rollup.count, "farm_size": round(rollup.total, 4)
+            })
+        elif rollup.metric == 'farmers_by_certification':
+            by_certification.append({"certification": rollup.key, "farmers": rollup.count})
+        elif rollup.metric == 'batches_by_facility_month':
+            facility, month = rollup.key.split(':')
+            by_facility_month.append({
+                "processing_facility": int(facility), "month": month, "batches": rollup.count
+            })
+
+    return {
+        "total_batches": totals['batches'],
+        "total_farmers": totals['farmers'],
+        "total_collection_centers": totals['collection_centers'],
+        "total_processing_facilities": totals['processing_facilities'],
+        "total_packaging_centers": totals['packaging_centers'],
+        "farmers_by_region": by_region,
+        "farmers_by_certification": by_certification,
+        "batches_by_facility_month": by_facility_month,
+    }
+
+
+def stored_rollups():
+    return Rollup.objects.filter(metric__in=DASHBOARD_METRICS, count__gt=0).order_by('metric', 'key')
+
+
+def build_missing(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate hook: build the rollups and site throughput from existing
+    data the first time the tables are migrated, so reads never have to
+    """
+    if using != DEFAULT_DB_ALIAS:
+        return
+    if not Rollup.objects.exists():
+        reconcile()
+    if not SiteThroughput.objects.exists():
+        throughput.reconcile()
+
+
+def summary():
+    """
+    Build the dashboard summary from the stored rollups in a single,
+    read-only query
+    """
+    return format_summary(list(stored_rollups()))
+
+
+async def asummary():
+    """
+    summary() for async views, reading the rollups with the async ORM
+    """
+    return format_summary([rollup async for rollup in stored_rollups()])
@@ -0,0 +1,97 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Set on responses to writes; while present the client reads the primary
+PIN_COOKIE = 'agri_primary'
+
+current_route = ContextVar('agri_read_route', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+class ReadRoute:
+    """
+    Where the reads of one request go. `alias` is the replica chosen for the
+    request, None to read the primary. Once the request writes, or while it
+    is inside a transaction opened on the primary, reads go to the primary
+    too. `used` collects the aliases read from.
+    """
+
+    def __init__(self):
+        self.alias = None
+        self.atomic_depth = 0
+        self.wrote = False
+        self.used = set()
+
+    def start(self, alias):
+        self.alias = alias
+        # Transactions already open (a test case's) do not pin the request
+        self.atomic_depth = len(connections[DEFAULT_DB_ALIAS].atomic_blocks)
+
+    def on_replica(self):
+        return not (
+            self.alias is None or self.wrote
+            or len(connections[DEFAULT_DB_ALIAS].atomic_blocks) > self.atomic_depth
+        )
+
+    def db_for_read(self):
+        alias = self.alias if self.on_replica() else DEFAULT_DB_ALIAS
+        self.used.add(alias)
+        return alias
+
+
+def reading_replica():
+    """
+    Whether reads of the current request go to a replica, which may not have
+    replayed writes whose cache invalidations already ran on the primary
+    """
+    route = current_route.get()
+    return route is not None and route.on_replica()
+
+
+def choose_replica():
+    aliases = replicas()
+    return random.choice(aliases) if aliases else None
+
+
+class ReplicaRouter:
+    """
+    Send the reads of routed requests (safe methods on the agri API, see
+    agri.middleware.ReplicaRoutingMiddleware) to settings.DATABASE_REPLICAS,
+    and every write to the primary. Outside such requests (management
+    commands, writes) the router leaves reads on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        route = current_route.get()
+        if route is None:
+            return None
+        return route.db_for_read()
+
+    def db_for_write(self, model, **hints):
+        route = current_route.get()
+        if route is not None:
+            route.wrote = True
+        # Explicitly, or Django would write where a related instance was read
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
@@ -0,0 +1,275 @@
+import re
+from functools import reduce
+from itertools import combinations_with_replacement
+from operator import or_
+
+from django.db import connections
+from django.db.models import BooleanField, Case, F, FloatField, Lookup, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from rest_framework import filters
+
+from .models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter
+
+
+# Columns covered by the search indexes of each model
+SEARCH_INDEXES = {
+    Farmer: ('name', 'farmer_id'),
+    CollectionCenter: ('name', 'center_id', 'location'),
+    ProcessingFacility: ('name', 'facility_id', 'location'),
+    PackagingCenter: ('name', 'center_id', 'location'),
+}
+
+# pg_trgm word similarity needed for a match; low enough for one-letter typos.
+# Terms of three characters or fewer are too short to carry a typo: they
+# match words starting with them.
+WORD_SIMILARITY_THRESHOLD = 0.4
+SHORT_TERM_LENGTH = 3
+PREFIX_BONUS = 1.0
+# Rank of SQLite typo matches, below rows containing the term as typed
+TYPO_RANK = 0.5
+
+
+class ILike(Lookup):
+    """
+    PostgreSQL ILIKE, which the trigram indexes serve; Django's icontains and
+    istartswith compare UPPER() of the column, which they don't
+    """
+    lookup_name = 'ilike'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', [*lhs_params, *rhs_params]
+
+
+def fts_table(model):
+    return f"{model._meta.db_table}_search"
+
+
+def like_escape(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def split_fields(fields):
+    """
+    Split DRF-style search fields into fuzzy fields and '^' prefix-only fields
+    (business identifiers, where a one-character typo is a different entity)
+    """
+    fuzzy = [field for field in fields if not field.startswith('^')]
+    prefix = [field[1:] for field in fields if field.startswith('^')]
+    return fuzzy, prefix
+
+
+def max_edits(term):
+    # Mirrors the pg_trgm thresholds: short terms must match exactly
+    if len(term) <= SHORT_TERM_LENGTH:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def prefix_bonus(fields, term):
+    return Case(
+        When(reduce(or_, (Q(**{f'{field}__istartswith': term}) for field in fields)), then=Value(PREFIX_BONUS)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def postgres_search(queryset, fields, term):
+    """
+    Match with the pg_trgm word similarity operator (word-prefix ILIKE for
+    short terms) and anchored regexes, all served by the GIN trigram indexes,
+    and rank by best word similarity plus a prefix bonus
+    """
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    fuzzy, prefix = split_fields(fields)
+    pattern = like_escape(term) + '%'
+    conditions = [Q(**{f'{field}__iregex': '^' + re.escape(term)}) for field in prefix]
+    if len(term) <= SHORT_TERM_LENGTH:
+        # Every word-prefix match is as similar as the next: skip computing
+        # word_similarity() over what can be a fifth of the table
+        for field in fuzzy:
+            conditions += [ILike(F(field), pattern), ILike(F(field), '% ' + pattern)]
+        similarity = Value(1.0)
+    elif fuzzy:
+        conditions += [Q(**{f'{field}__trigram_word_similar': term}) for field in fuzzy]
+        similarities = [TrigramWordSimilarity(term, field) for field in fuzzy]
+        similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        # The indexed operator reads its threshold from a setting. Set it
+        # transaction-locally from an uncorrelated subquery: PostgreSQL runs
+        # that as a one-time filter before the index scan, and the value ends
+        # with the statement (or the enclosing transaction) instead of
+        # leaking to later queries on a pooled connection.
+        queryset = queryset.filter(RawSQL(
+            "(SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)) IS NOT NULL",
+            [str(WORD_SIMILARITY_THRESHOLD)],
+            output_field=BooleanField(),
+        ))
+    else:
+        similarity = Value(0.0)
+    return queryset.filter(reduce(or_, [Q(condition) for condition in conditions])).annotate(
+        search_rank=similarity + prefix_bonus(fuzzy + prefix, term)
+    ).order_by('-search_rank', 'pk')
+
+
+def fts_phrase(text):
+    return '"%s"' % text.replace('"', '""')
+
+
+def typo_query(text, edits):
+    """
+    FTS5 query for text within `edits` edits of `text`, from its trigrams
+    alone. An edit breaks at most four consecutive trigrams (swapping two
+    letters), so a match keeps every trigram outside `edits` such windows.
+    """
+    grams = [text[i:i + 3] for i in range(len(text) - 2)]
+    kept = set()
+    for windows in combinations_with_replacement(range(-3, len(grams)), edits):
+        broken = {index for start in windows for index in range(start, start + 4)}
+        kept.add(frozenset(gram for index, gram in enumerate(grams) if index not in broken))
+    kept.discard(frozenset())
+    # A clause requiring more trigrams than another adds no matches
+    clauses = sorted(sorted(grams) for grams in kept if not any(other < grams for other in kept))
+    return ' OR '.join('(%s)' % ' AND '.join(map(fts_phrase, grams)) for grams in clauses)
+
+
+def sqlite_search(queryset, fields, term):
+    """
+    Match in the FTS5 trigram shadow table, whose values are indexed with a
+    leading space so that a phrase starting with one matches at the start of
+    a word. Terms match words starting with them; longer terms also match
+    within one or two edits through typo_query(), the way pg_trgm word
+    similarity does. Rows containing the term as typed rank first.
+    """
+    fuzzy, prefix = split_fields(fields)
+    model = queryset.model
+    table = fts_table(model)
+    columns = {field: model._meta.get_field(field).column for field in fuzzy + prefix}
+    text = ' ' + term.lower()
+    words = fts_phrase(text)
+
+    def matching(query):
+        return RawSQL(f'SELECT rowid FROM "{table}" WHERE "{table}" MATCH %s', [query])
+
+    queries, rank = [], Value(1.0)
+    if fuzzy:
+        scope = '{%s} : ' % ' '.join(columns[field] for field in fuzzy)
+        edits = max_edits(term)
+        if edits:
+            queries.append(f'{scope}({words} OR {typo_query(text, edits)})')
+            rank = Case(
+                When(pk__in=matching(scope + words), then=Value(1.0)),
+                default=Value(TYPO_RANK),
+                output_field=FloatField(),
+            )
+        else:
+            queries.append(scope + words)
+    queries += ['{%s} : ^%s' % (columns[field], words) for field in prefix]
+    return queryset.filter(pk__in=matching(' OR '.join(f'({query})' for query in queries))).annotate(
+        search_rank=rank + prefix_bonus(fuzzy + prefix, term)
+    ).order_by('-search_rank', 'pk')
+
+
+def search_queryset(queryset, fields, term):
+    """
+    Ranked, typo-tolerant search of `fields` for `term`, or None when the model
+    or database has no search index
+    """
+    indexed = SEARCH_INDEXES.get(queryset.model, ())
+    if not fields or not {field.lstrip('^') for field in fields} <= set(indexed):
+        return None
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        return postgres_search(queryset, fields, term)
+    if vendor == 'sqlite':
+        return sqlite_search(queryset, fields, term)
+    return None
+
+
+class RankedSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by trigram indexes (PostgreSQL) or FTS5 (SQLite).
+    Results are ranked by relevance unless the client asks for an ordering;
+    unindexed models and databases keep SearchFilter's icontains behaviour.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+        ranked = search_queryset(queryset, list(search_fields), ' '.join(search_terms))
+        if ranked is None:
+            return super().filter_queryset(request, queryset, view)
+        return ranked
+
+
+def install_search_indexes(using='default', **kwargs):
+    """
+    Create the search indexes after migrate: GIN trigram indexes on
+    PostgreSQL, FTS5 shadow tables kept in sync by triggers on SQLite
+    """
+    db = connections[using]
+    existing = set(db.introspection.table_names())
+    with db.cursor() as cursor:
+        if db.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for model, fields in SEARCH_INDEXES.items():
+                table = model._meta.db_table
+                if table not in existing:
+                    continue
+                for field in fields:
+                    column = model._meta.get_field(field).column
+                    cursor.execute(
+                        f'CREATE INDEX IF NOT EXISTS "{table}_{column}_trgm" '
+                        f'ON "{table}" USING gin ("{column}" gin_trgm_ops)'
+                    )
+        elif db.vendor == 'sqlite':
+            for model, fields in SEARCH_INDEXES.items():
+                table = model._meta.db_table
+                if table not in existing:
+                    continue
+                search_table = fts_table(model)
+                columns = [model._meta.get_field(field).column for field in fields]
+                column_list = ', '.join(columns)
+                # Values are indexed with a leading space (see sqlite_search)
+                new_values = ', '.join(f"' ' || new.{column}" for column in columns)
+                old_values = ', '.join(f"' ' || old.{column}" for column in columns)
+                delete_old = (
+                    f"INSERT INTO {search_table}({search_table}, rowid, {column_list}) "
+                    f"VALUES ('delete', old.id, {old_values});"
+                )
+                insert_new = (
+                    f"INSERT INTO {search_table}(rowid, {column_list}) VALUES (new.id, {new_values});"
+                )
+                cursor.execute("SELECT sql FROM sqlite_master WHERE name = %s", [search_table])
+                created = cursor.fetchone()
+                if created and "content=''" not in created[0]:
+                    # Shadow tables of earlier versions index the bare values
+                    for trigger in ('ai', 'ad', 'au'):
+                        cursor.execute(f"DROP TRIGGER IF EXISTS {search_table}_{trigger}")
+                    cursor.execute(f"DROP TABLE {search_table}")
+                    created = None
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5("
+                    f"{column_list}, content='', tokenize='trigram')"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {search_table}_ai AFTER INSERT ON {table} "
+                    f"BEGIN {insert_new} END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {search_table}_ad AFTER DELETE ON {table} "
+                    f"BEGIN {delete_old} END"
+                )
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {search_table}_au AFTER UPDATE ON {table} "
+                    f"BEGIN {delete_old} {insert_new} END"
+                )
+                if not created:
+                    values = ', '.join(f"' ' || {column}" for column in columns)
+                    cursor.execute(
+                        f"INSERT INTO {search_table}(rowid, {column_list}) SELECT id, {values} FROM {table}"
+                    )
@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import Batch, Sequence
+
+
+def reserve(name, count=1, initial=0):
+    """
+    Atomically reserve `count` consecutive values from the named sequence and
+    return them as a range. The counter is advanced with a single UPDATE, which
+    takes the row (PostgreSQL) or database (SQLite) write lock before reading,
+    so concurrent callers always receive disjoint blocks. `initial` (a value or
+    a callable) seeds the counter the first time the sequence is used.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    sequences = Sequence.objects.filter(name=name)
+    with transaction.atomic():
+        advance = {'last_value': F('last_value') + count, 'updated_at': timezone.now()}
+        if not sequences.update(**advance):
+            Sequence.objects.get_or_create(
+                name=name,
+                defaults={'last_value': initial() if callable(initial) else initial},
+            )
+            sequences.update(**advance)
+        last_value = sequences.values_list('last_value', flat=True).get()
+    return range(last_value - count + 1, last_value + 1)
+
+
+def format_identifier(prefix, number):
+    return f"{prefix}{str(number).zfill(3)}"
+
+
+def allocate_identifiers(model, field, prefix, count, taken=()):
+    """
+    Reserve a contiguous block of `count` business identifiers such as F001 for
+    `model.field`. Identifiers already taken by manually entered rows, or in
+    `taken` (supplied by rows about to be inserted), are skipped and replaced
+    from the sequence.
+    """
+    def legacy_start():
+        # Continue from the previous "latest.id + 1" scheme
+        return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+    identifiers = []
+    needed = count
+    while needed:
+        candidates = [format_identifier(prefix, n) for n in reserve(prefix, needed, legacy_start)]
+        used = set(taken).intersection(candidates)
+        used.update(model.objects.filter(**{f'{field}__in': candidates}).values_list(field, flat=True))
+        identifiers.extend(candidate for candidate in candidates if candidate not in used)
+        needed = len(used)
+    return identifiers
+
+
+def allocate_batch_sequences(doa, year, count=1):
+    """
+    Reserve `count` batch sequences for a (doa, year) pair from its own counter.
+    Sequences already used by existing batch numbers are skipped.
+    """
+    def legacy_start():
+        # First use of the pair: continue after the highest numeric sequence
+        sequences = Batch.objects.filter(doa=doa, year=year).values_list('sequence', flat=True)
+        return max((int(sequence) for sequence in sequences if sequence.isdigit()), default=0)
+
+    sequences = []
+    needed = count
+    while needed:
+        candidates = {
+            f"{doa}/{year}/{str(n).zfill(3)}": str(n).zfill(3)
+            for n in reserve(f"batch:{doa}:{year}", needed, legacy_start)
+        }
+        taken = set(
+            Batch.objects.filter(batch_number__in=candidates).values_list('batch_number', flat=True)
+        )
+        sequences.extend(sequence for number, sequence in candidates.items() if number not in taken)
+        needed = len(taken)
+    return sequences
@@ -1,111 +1,271 @@
+from django.db import transaction
+from django.db.models import Q
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from .geo import parse_coordinates
+from .middleware import serializing
 from .models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch
+from .sequences import allocate_identifiers
+from .verification import MAX_VERIFY_BATCH_NUMBERS
 
 
-class FarmerSerializer(serializers.ModelSerializer):
+class SequentialIdentifierMixin:
+    """
+    Auto-generate the business identifier (e.g. F001) from a locked sequence
+    when the client does not provide one
+    """
+    identifier_field = None
+    identifier_prefix = None
+
+    def create(self, validated_data):
+        if not validated_data.get(self.identifier_field):
+            validated_data[self.identifier_field] = allocate_identifiers(
+                self.Meta.model, self.identifier_field, self.identifier_prefix, 1
+            )[0]
+        return super().create(validated_data)
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """
+    ManyRelatedField resolving all submitted keys together
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return self.child_relation.resolve(list(data))
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that, with many=True, resolves every submitted key
+    with one IN query and reports all missing keys at once. With
+    `business_key`, non-numeric strings are looked up by that field instead
+    (e.g. farmer_id), so clients can send either form.
+    """
+
+    def __init__(self, **kwargs):
+        self.business_key = kwargs.pop('business_key', None)
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def split_key(self, key):
+        """
+        Return ('pk', int) or (business_key, str) for a submitted key, None if invalid
+        """
+        if isinstance(key, int) and not isinstance(key, bool):
+            return 'pk', key
+        if isinstance(key, str):
+            if key.strip().isdigit():
+                return 'pk', int(key)
+            if self.business_key and key:
+                return self.business_key, key
+        return None
+
+    def resolve(self, keys):
+        """
+        Return the objects for `keys` in submitted order
+        """
+        parts = [self.split_key(key) for key in keys]
+        invalid = [key for key, part in zip(keys, parts) if part is None]
+        if invalid:
+            self.fail('incorrect_type', data_type=type(invalid[0]).__name__)
+
+        pks = {value for kind, value in parts if kind == 'pk'}
+        names = {value for kind, value in parts if kind != 'pk'}
+        condition = Q(pk__in=pks)
+        if names:
+            condition |= Q(**{f'{self.business_key}__in': names})
+        columns = ['pk'] + ([self.business_key] if self.business_key else [])
+        found = {}
+        for obj in self.get_queryset().filter(condition).only(*columns):
+            found[('pk', obj.pk)] = obj
+            if self.business_key:
+                found[(self.business_key, getattr(obj, self.business_key))] = obj
+
+        missing = [key for key, part in zip(keys, parts) if part not in found]
+        if missing:
+            raise serializers.ValidationError([
+                self.error_messages['does_not_exist'].format(pk_value=key) for key in missing
+            ], code='does_not_exist')
+        return [found[part] for part in parts]
+
+
+class SparseFieldsMixin:
+    """
+    Drop the fields not listed in context['fields'] (see agri.fieldsets)
+    """
+    expandable = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        with serializing():
+            return super().to_representation(instance)
+
+
+class CoordinatesMixin:
+    """
+    Reject `coordinates` the nearest-site lookups could not place
+    """
+
+    def validate_coordinates(self, value):
+        if value:
+            try:
+                parse_coordinates(value)
+            except ValueError as exc:
+                raise serializers.ValidationError(str(exc))
+        return value
+
+
+class FarmerSerializer(SparseFieldsMixin, SequentialIdentifierMixin, serializers.ModelSerializer):
+    identifier_field = 'farmer_id'
+    identifier_prefix = 'F'
+
     class Meta:
         model = Farmer
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
-    
-    def create(self, validated_data):
-        # Auto-generate farmer_id if not provided
-        if 'farmer_id' not in validated_data:
-            latest_farmer = Farmer.objects.order_by('-id').first()
-            farmer_id = f"F{str(latest_farmer.id + 1).zfill(3)}" if latest_farmer else "F001"
-            validated_data['farmer_id'] = farmer_id
-        return super().create(validated_data)
+        extra_kwargs = {'farmer_id': {'required': False}}
 
 
-class CollectionCenterSerializer(serializers.ModelSerializer):
+class CollectionCenterSerializer(SparseFieldsMixin, SequentialIdentifierMixin, CoordinatesMixin, serializers.ModelSerializer):
+    identifier_field = 'center_id'
+    identifier_prefix = 'CC'
+
     class Meta:
         model = CollectionCenter
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
-    
-    def create(self, validated_data):
-        # Auto-generate center_id if not provided
-        if 'center_id' not in validated_data:
-            latest_center = CollectionCenter.objects.order_by('-id').first()
-            center_id = f"CC{str(latest_center.id + 1).zfill(3)}" if latest_center else "CC001"
-            validated_data['center_id'] = center_id
-        return super().create(validated_data)
+        extra_kwargs = {'center_id': {'required': False}}
 
 
-class ProcessingFacilitySerializer(serializers.ModelSerializer):
+class ProcessingFacilitySerializer(SparseFieldsMixin, SequentialIdentifierMixin, CoordinatesMixin, serializers.ModelSerializer):
+    identifier_field = 'facility_id'
+    identifier_prefix = 'PF'
+
     class Meta:
         model = ProcessingFacility
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
-    
-    def create(self, validated_data):
-        # Auto-generate facility_id if not provided
-        if 'facility_id' not in validated_data:
-            latest_facility = ProcessingFacility.objects.order_by('-id').first()
-            facility_id = f"PF{str(latest_facility.id + 1).zfill(3)}" if latest_facility else "PF001"
-            validated_data['facility_id'] = facility_id
-        return super().create(validated_data)
+        extra_kwargs = {'facility_id': {'required': False}}
 
 
-class PackagingCenterSerializer(serializers.ModelSerializer):
+class PackagingCenterSerializer(SparseFieldsMixin, SequentialIdentifierMixin, serializers.ModelSerializer):
+    identifier_field = 'center_id'
+    identifier_prefix = 'PC'
+
     class Meta:
         model = PackagingCenter
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
-    
-    def create(self, validated_data):
-        # Auto-generate center_id if not provided
-        if 'center_id' not in validated_data:
-            latest_center = PackagingCenter.objects.order_by('-id').first()
-            center_id = f"PC{str(latest_center.id + 1).zfill(3)}" if latest_center else "PC001"
-            validated_data['center_id'] = center_id
-        return super().create(validated_data)
+        extra_kwargs = {'center_id': {'required': False}}
+
 
+def validate_compliance(data):
+    """
+    Validate that compliance checkboxes are marked
+    """
+    if not data.get('zero_child_labor'):
+        raise serializers.ValidationError(
+            "Batch must be confirmed to be produced with ZERO child labor"
+        )
+    if not data.get('zero_deforestation'):
+        raise serializers.ValidationError(
+            "Batch must be confirmed to be produced with ZERO deforestation"
+        )
+    return data
 
-class BatchSerializer(serializers.ModelSerializer):
-    contributing_farmers = serializers.PrimaryKeyRelatedField(
+
+class BatchSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable = ('collection_center', 'processing_facility', 'packaging_center', 'contributing_farmers')
+    contributing_farmers = BulkPrimaryKeyRelatedField(
         queryset=Farmer.objects.all(),
-        many=True
+        many=True,
+        business_key='farmer_id'
     )
     
     class Meta:
         model = Batch
-        fields = '__all__'
+        exclude = ('traceability',)
         read_only_fields = ('created_at', 'updated_at')
+
+    @transaction.atomic
+    def create(self, validated_data):
+        # The batch and its farmers are committed together, and the snapshot
+        # is rebuilt once after commit
+        return super().create(validated_data)
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        return super().update(instance, validated_data)
     
     def validate(self, data):
-        """
-        Validate that compliance checkboxes are marked
-        """
-        if not data.get('zero_child_labor'):
-            raise serializers.ValidationError(
-                "Batch must be confirmed to be produced with ZERO child labor"
-            )
-        if not data.get('zero_deforestation'):
-            raise serializers.ValidationError(
-                "Batch must be confirmed to be produced with ZERO deforestation"
-            )
-        return data
+        return validate_compliance(data)
     
     def to_representation(self, instance):
         """
-        Add detailed information about related entities
+        Add detailed information about related entities; with an `expand`
+        context only the listed ones, the others stay primary keys
         """
         representation = super().to_representation(instance)
-        representation['collection_center'] = CollectionCenterSerializer(
-            instance.collection_center
-        ).data
-        representation['processing_facility'] = ProcessingFacilitySerializer(
-            instance.processing_facility
-        ).data
-        representation['packaging_center'] = PackagingCenterSerializer(
-            instance.packaging_center
-        ).data
-        representation['contributing_farmers'] = FarmerSerializer(
-            instance.contributing_farmers.all(), many=True
-        ).data
+        expand = self.context.get('expand')
+        nested = (
+            ('collection_center', lambda: CollectionCenterSerializer(instance.collection_center).data),
+            ('processing_facility', lambda: ProcessingFacilitySerializer(instance.processing_facility).data),
+            ('packaging_center', lambda: PackagingCenterSerializer(instance.packaging_center).data),
+            ('contributing_farmers', lambda: FarmerSerializer(instance.contributing_farmers.all(), many=True).data),
+        )
+        for name, render in nested:
+            if name in representation and (expand is None or name in expand):
+                representation[name] = render()
         return representation
     
 
+class BatchImportSerializer(serializers.Serializer):
+    """
+    One row of a bulk batch import. Sites and farmers are referenced by their
+    business identifiers; the sequence is allocated when omitted.
+    """
+    batch_number = serializers.CharField(max_length=20, required=False)
+    doa = serializers.CharField(max_length=4)
+    year = serializers.CharField(max_length=4)
+    sequence = serializers.CharField(max_length=10, required=False)
+    collection_center = serializers.CharField(max_length=10)
+    processing_facility = serializers.CharField(max_length=10)
+    packaging_center = serializers.CharField(max_length=10)
+    contributing_farmers = serializers.ListField(child=serializers.CharField(max_length=10), default=list)
+    packaging_date = serializers.DateField()
+    expiry_date = serializers.DateField()
+    net_weight = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    zero_child_labor = serializers.BooleanField()
+    zero_deforestation = serializers.BooleanField()
+
+    def validate(self, data):
+        if data.get('batch_number') and not data.get('sequence'):
+            raise serializers.ValidationError("sequence is required when batch_number is given")
+        return validate_compliance(data)
+
+
 class BatchNumberSearchSerializer(serializers.Serializer):
     batch_number = serializers.CharField(max_length=255, required=True)
+
+
+class BatchNumberVerifySerializer(serializers.Serializer):
+    batch_numbers = serializers.ListField(
+        child=serializers.CharField(max_length=255), allow_empty=False, max_length=MAX_VERIFY_BATCH_NUMBERS
+    )
@@ -0,0 +1,66 @@
+from django.db.models.signals import m2m_changed, pre_delete, pre_save
+
+from .models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch
+
+
+TRACKED_MODELS = (Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch)
+
+
+def affected_batches(instance):
+    """
+    Batches whose traceability document includes `instance`
+    """
+    if isinstance(instance, Farmer):
+        return Batch.objects.filter(contributing_farmers=instance)
+    if isinstance(instance, CollectionCenter):
+        return Batch.objects.filter(collection_center=instance)
+    if isinstance(instance, ProcessingFacility):
+        return Batch.objects.filter(processing_facility=instance)
+    if isinstance(instance, PackagingCenter):
+        return Batch.objects.filter(packaging_center=instance)
+    return Batch.objects.filter(pk=instance.pk)
+
+
+def remember_previous(sender, instance, raw=False, **kwargs):
+    """
+    Keep the stored row on `instance._previous` so post_save handlers can undo
+    what the old values contributed (rollups) or invalidate under the old keys
+    """
+    instance._previous = None
+    if raw or instance.pk is None:
+        return
+    queryset = sender.objects.filter(pk=instance.pk)
+    if sender is Batch:
+        queryset = queryset.defer('traceability')
+    instance._previous = queryset.first()
+
+
+def remember_batches(instance):
+    instance._affected_batches = list(affected_batches(instance).values_list('pk', 'batch_number'))
+
+
+def farmer_deleting(sender, instance, **kwargs):
+    # The farmer's through rows are gone by post_delete, so collect them now
+    remember_batches(instance)
+
+
+def farmers_clearing(sender, instance, action, reverse, **kwargs):
+    # Same for farmer.batches.clear(), whose post_clear carries no pk_set
+    if reverse and action == 'pre_clear':
+        remember_batches(instance)
+
+
+def connect_signals():
+    from . import cache, rollups, snapshots, sync
+
+    for model in TRACKED_MODELS:
+        pre_save.connect(remember_previous, sender=model, dispatch_uid=f'agri_previous_{model._meta.model_name}')
+    pre_delete.connect(farmer_deleting, sender=Farmer, dispatch_uid='agri_farmer_deleting')
+    m2m_changed.connect(
+        farmers_clearing, sender=Batch.contributing_farmers.through, dispatch_uid='agri_farmers_clearing'
+    )
+    # sync first: it bumps updated_at, which the snapshots and cache render
+    sync.connect_signals()
+    rollups.connect_signals()
+    snapshots.connect_signals()
+    cache.connect_signals()
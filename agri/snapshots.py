@@ -0,0 +1,174 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch
+from .signals import affected_batches
+
+
+SNAPSHOT_CHUNK_SIZE = 500
+
+
+def build(batch):
+    """
+    Render the traceability document of `batch` exactly as BatchSerializer
+    does, normalised to what the JSON column stores
+    """
+    from .serializers import BatchSerializer
+
+    return json.loads(json.dumps(BatchSerializer(batch).data, cls=DjangoJSONEncoder))
+
+
+def refresh(batch_ids, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Rebuild the snapshots of `batch_ids` with one read and one UPDATE per chunk.
+    Returns the number of snapshots written.
+    """
+    batch_ids = sorted(set(batch_ids))
+    written = 0
+    with transaction.atomic():
+        for start in range(0, len(batch_ids), chunk_size):
+            batches = list(Batch.objects.with_related().filter(pk__in=batch_ids[start:start + chunk_size]))
+            for batch in batches:
+                batch.traceability = build(batch)
+            Batch.objects.bulk_update(batches, ['traceability'])
+            written += len(batches)
+    return written
+
+
+class PendingRefresh:
+    """
+    on_commit callback rebuilding the snapshots cleared in one transaction,
+    one transaction per chunk
+    """
+
+    def __init__(self, chunk_size):
+        self.batch_ids = set()
+        self.chunk_size = chunk_size
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        batch_ids = sorted(self.batch_ids)
+        for start in range(0, len(batch_ids), self.chunk_size):
+            refresh(batch_ids[start:start + self.chunk_size], self.chunk_size)
+
+
+def refresh_later(batch_ids, chunk_size=SNAPSHOT_CHUNK_SIZE, clear=True):
+    """
+    Clear the snapshots of `batch_ids` now and rebuild them after commit, once
+    however many saves touch a batch in the transaction. Saving a farmer or
+    site linked to thousands of batches then costs the caller one UPDATE per
+    chunk; reads render the cleared batches live until their snapshot is
+    back. `clear=False` skips the UPDATE for batches known to have none.
+    """
+    connection = transaction.get_connection()
+    pending = next((
+        func for _, func, _ in connection.run_on_commit if isinstance(func, PendingRefresh) and not func.done
+    ), None)
+    if pending is None:
+        pending = PendingRefresh(chunk_size)
+    batch_ids = sorted(set(batch_ids) - pending.batch_ids)
+    if not batch_ids:
+        return
+    if clear:
+        for start in range(0, len(batch_ids), chunk_size):
+            Batch.objects.filter(pk__in=batch_ids[start:start + chunk_size]).update(traceability=None)
+    registered = bool(pending.batch_ids)
+    pending.batch_ids.update(batch_ids)
+    if not registered:
+        transaction.on_commit(pending)
+
+
+def render(pk):
+    """
+    Render the document of a batch without a snapshot, without persisting it:
+    reads may be routed to a replica. backfill_snapshots stores it.
+    """
+    batch = Batch.objects.with_related().filter(pk=pk).first()
+    return build(batch) if batch else None
+
+
+def snapshot_for(batch_number):
+    """
+    Return the stored snapshot with a single-table read, rendering the batch
+    instead if it has none yet. None if no such batch.
+    """
+    row = Batch.objects.filter(batch_number=batch_number).values_list('pk', 'traceability').first()
+    if row is None:
+        return None
+    pk, snapshot = row
+    if snapshot is None:
+        snapshot = render(pk)
+    return snapshot
+
+
+async def asnapshot_for(batch_number):
+    """
+    snapshot_for() for async views
+    """
+    row = await Batch.objects.filter(batch_number=batch_number).values_list('pk', 'traceability').afirst()
+    if row is None:
+        return None
+    pk, snapshot = row
+    if snapshot is None:
+        snapshot = await sync_to_async(render)(pk)
+    return snapshot
+
+
+def find_stale(chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Yield (pk, batch_number) of batches whose snapshot is missing or differs
+    from a fresh render, e.g. after raw SQL or queryset.update() writes
+    """
+    queryset = Batch.objects.with_related().defer(None).order_by('pk')
+    last_pk = 0
+    while True:
+        batches = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not batches:
+            return
+        for batch in batches:
+            if batch.traceability != build(batch):
+                yield batch.pk, batch.batch_number
+        last_pk = batches[-1].pk
+
+
+def batch_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_later([instance.pk], clear=not created)
+
+
+def related_saved(sender, instance, created=False, raw=False, **kwargs):
+    # A new farmer or site is not part of any batch yet
+    if raw or created:
+        return
+    refresh_later(affected_batches(instance).values_list('pk', flat=True))
+
+
+def farmer_deleted(sender, instance, **kwargs):
+    refresh_later(pk for pk, number in getattr(instance, '_affected_batches', []))
+
+
+def farmers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_later([instance.pk])
+    elif action == 'post_clear':
+        refresh_later(pk for pk, number in getattr(instance, '_affected_batches', []))
+    else:
+        refresh_later(pk_set)
+
+
+def connect_signals():
+    post_save.connect(batch_saved, sender=Batch, dispatch_uid='agri_snapshot_batch_saved')
+    for model in (Farmer, CollectionCenter, ProcessingFacility, PackagingCenter):
+        post_save.connect(related_saved, sender=model, dispatch_uid=f'agri_snapshot_{model._meta.model_name}_saved')
+    post_delete.connect(farmer_deleted, sender=Farmer, dispatch_uid='agri_snapshot_farmer_deleted')
+    m2m_changed.connect(
+        farmers_changed, sender=Batch.contributing_farmers.through, dispatch_uid='agri_snapshot_farmers_changed'
+    )
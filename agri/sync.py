@@ -0,0 +1,201 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+
+from .models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch, Tombstone
+
+
+SYNC_PAGE_SIZE = 500
+MAX_SYNC_PAGE_SIZE = 1000
+
+# Synced model -> business identifier recorded on its tombstones
+SYNC_KEYS = {
+    Farmer: 'farmer_id',
+    CollectionCenter: 'center_id',
+    ProcessingFacility: 'facility_id',
+    PackagingCenter: 'center_id',
+    Batch: 'batch_number',
+}
+
+
+class CursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'The sync cursor is older than the kept deletions; sync again without a cursor'
+    default_code = 'cursor_expired'
+
+
+def settle_seconds():
+    return getattr(settings, 'SYNC_SETTLE_SECONDS', 5)
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 90))
+
+
+def encode_cursor(changed, deleted, horizon):
+    cursor = {'c': changed, 'd': deleted, 'h': horizon.isoformat()}
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(encoded):
+    """
+    Return the (updated_at, id) and (deleted_at, id) positions reached, None
+    meaning the start, and the horizon the cursor was issued at
+    """
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        positions = [
+            None if cursor[name] is None else (datetime.fromisoformat(cursor[name][0]), int(cursor[name][1]))
+            for name in ('c', 'd')
+        ]
+        horizon = datetime.fromisoformat(cursor['h'])
+    except (binascii.Error, KeyError, IndexError, TypeError, ValueError, UnicodeError):
+        raise NotFound('Invalid cursor')
+    return positions[0], positions[1], horizon
+
+
+def after(field, position):
+    """
+    Rows strictly after `position` in (`field`, id) order
+    """
+    if position is None:
+        return Q()
+    value, pk = position
+    return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+
+
+def page(queryset, field, position, horizon, page_size):
+    """
+    Read up to `page_size` rows after `position` and no later than `horizon`
+    in (`field`, id) order with one range scan of the (`field`, id) index.
+    Returns (rows, next position, has_more).
+    """
+    queryset = queryset.filter(after(field, position), **{f'{field}__lte': horizon}).order_by(field, 'id')
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if rows:
+        position = (rows[-1][field], rows[-1]['id'])
+    return rows, position, has_more
+
+
+def feed(model, projection, encoded=None, page_size=SYNC_PAGE_SIZE):
+    """
+    Return the rows of `model` changed and the ones deleted since the cursor
+    `encoded` (None for a first, full sync), at most `page_size` of each, with
+    the cursor to continue from.
+
+    Rows are only read up to a horizon a few seconds in the past
+    (settings.SYNC_SETTLE_SECONDS): updated_at is stamped before the writing
+    transaction commits, so a later commit can carry an earlier timestamp.
+    """
+    now = timezone.now()
+    changed = deleted = None
+    if encoded:
+        changed, deleted, issued = decode_cursor(encoded)
+        if issued < now - tombstone_retention():
+            raise CursorExpired()
+    horizon = now - timedelta(seconds=settle_seconds())
+
+    rows, changed, more_changed = page(
+        projection.values(model.objects.all(), ('updated_at', 'id')), 'updated_at', changed, horizon, page_size
+    )
+    tombstones, deleted, more_deleted = page(
+        Tombstone.objects.filter(model=model._meta.model_name).values('id', 'object_id', 'key', 'deleted_at'),
+        'deleted_at', deleted, horizon, page_size
+    )
+    serialize = lambda position: None if position is None else [position[0].isoformat(), position[1]]
+    return {
+        'changed': projection.rows(rows),
+        'deleted': [
+            {'id': row['object_id'], SYNC_KEYS[model]: row['key'], 'deleted_at': row['deleted_at']}
+            for row in tombstones
+        ],
+        'cursor': encode_cursor(serialize(changed), serialize(deleted), horizon),
+        'has_more': more_changed or more_deleted,
+    }
+
+
+def prune():
+    """
+    Delete tombstones past the retention period. Returns the number deleted.
+    """
+    cutoff = timezone.now() - tombstone_retention()
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+class ChangeFeedView(GenericAPIView):
+    """
+    Change feed of one resource for offline clients. The first request
+    (without `cursor`) pages through the whole register; later ones pass the
+    returned `cursor` and receive only the rows changed and the ones deleted
+    since. Keep requesting while `has_more` is true.
+    """
+    projection = None
+    # The cursor moves past everything committed before the horizon, which a
+    # lagging replica may not have replayed yet
+    read_primary = True
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self):
+        try:
+            page_size = int(self.request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return SYNC_PAGE_SIZE
+        return min(max(page_size, 1), MAX_SYNC_PAGE_SIZE)
+
+    def get(self, request, *args, **kwargs):
+        return Response(feed(
+            self.get_queryset().model, self.projection, request.query_params.get('cursor'), self.get_page_size()
+        ))
+
+
+def record_deletion(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model=sender._meta.model_name, object_id=instance.pk, key=getattr(instance, SYNC_KEYS[sender])
+    )
+
+
+def touch(batch_ids):
+    """
+    Bump updated_at of batches whose contributing farmers changed, which
+    saving the link rows does not do
+    """
+    batch_ids = list(batch_ids)
+    if batch_ids:
+        Batch.objects.filter(pk__in=batch_ids).update(updated_at=timezone.now())
+
+
+def farmer_deleted(sender, instance, **kwargs):
+    touch(pk for pk, number in getattr(instance, '_affected_batches', []))
+
+
+def farmers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        touch([instance.pk])
+    elif action == 'post_clear':
+        touch(pk for pk, number in getattr(instance, '_affected_batches', []))
+    else:
+        touch(pk_set)
+
+
+def connect_signals():
+    for model in SYNC_KEYS:
+        post_delete.connect(record_deletion, sender=model, dispatch_uid=f'agri_sync_{model._meta.model_name}_tombstone')
+    post_delete.connect(farmer_deleted, sender=Farmer, dispatch_uid='agri_sync_farmer_deleted')
+    m2m_changed.connect(
+        farmers_changed, sender=Batch.contributing_farmers.through, dispatch_uid='agri_sync_farmers_changed'
+    )
@@ -1,3 +1,1541 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import brotli
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import build_user_cache, user_cache
+from .cache import traceability_cache
+from .metrics import registry
+from .rollups import build_missing, reconcile
+from . import throughput
+from .geo import bounding_box, parse_coordinates
+from .models import (
+    Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch, Rollup, SiteThroughput, Tombstone,
+)
+from .renderers import FastJSONRenderer
+from .routing import PIN_COOKIE, ReadRoute, ReplicaRouter, current_route
+from .search import search_queryset, typo_query
+from .sequences import allocate_batch_sequences
+from .serializers import BatchSerializer, FarmerSerializer
+
+
+def create_farmers(count, start=1):
+    return [
+        Farmer.objects.create(
+            farmer_id=f"F{str(i).zfill(3)}",
+            name=f"Farmer {i}",
+            gender='female',
+            farm_size=2.5,
+            region='Ashanti',
+            certification='Organic',
+        )
+        for i in range(start, start + count)
+    ]
+
+
+def create_sites(suffix='001'):
+    collection_center = CollectionCenter.objects.create(
+        center_id=f"CC{suffix}", name='Collection', location='Kumasi',
+        drying_method='Sun-dried', capacity=10,
+    )
+    processing_facility = ProcessingFacility.objects.create(
+        facility_id=f"PF{suffix}", name='Processing', location='Tema',
+        capacity=20, certifications=['HACCP'],
+    )
+    packaging_center = PackagingCenter.objects.create(
+        center_id=f"PC{suffix}", name='Packaging', location='Accra', capacity=5,
+    )
+    return collection_center, processing_facility, packaging_center
+
+
+def create_batch(sequence, farmers, sites, doa='DOA', year='2025'):
+    collection_center, processing_facility, packaging_center = sites
+    # Run the after-commit snapshot rebuild, as a committed create would
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        batch = Batch.objects.create(
+            doa=doa,
+            year=year,
+            sequence=sequence,
+            collection_center=collection_center,
+            processing_facility=processing_facility,
+            packaging_center=packaging_center,
+            packaging_date=date(2025, 1, 1),
+            expiry_date=date(2026, 1, 1),
+            zero_child_labor=True,
+            zero_deforestation=True,
+        )
+        batch.contributing_farmers.set(farmers)
+    return batch
+
+
+class BatchQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.sites = create_sites()
+
+    def assertListQueries(self, num):
+        with self.assertNumQueries(num):
+            response = self.client.get(reverse('batch-list-create'))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_query_count_does_not_grow_with_farmers(self):
+        farmers = create_farmers(2)
+        for i in range(1, 4):
+            create_batch(str(i).zfill(3), farmers, self.sites)
+        # count, batches joined with the three centers, prefetched farmers
+        self.assertListQueries(3)
+
+        many_farmers = create_farmers(30, start=3)
+        for i in range(4, 11):
+            create_batch(str(i).zfill(3), many_farmers, self.sites)
+        response = self.assertListQueries(3)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_search_query_count(self):
+        batch = create_batch('001', create_farmers(25), self.sites)
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                reverse('batch-search'), {'batch_number': batch.batch_number}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['contributing_farmers']), 25)
+        self.assertEqual(response.data['processing_facility']['facility_id'], 'PF001')
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def walk(self, url, params):
+        seen = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend(response.data['results'])
+            if not response.data['next']:
+                return seen, response
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_walk_over_tied_packaging_dates(self):
+        sites = create_sites()
+        farmers = create_farmers(1)
+        for i in range(1, 26):
+            create_batch(str(i).zfill(3), farmers, sites)
+
+        seen, last = self.walk(reverse('batch-list-create'), {'pagination': 'cursor', 'page_size': 4})
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(
+            [row['sequence'] for row in seen],
+            [str(i).zfill(3) for i in range(25, 0, -1)],
+        )
+
+        previous = self.client.get(last.data['previous'])
+        self.assertEqual(
+            [row['sequence'] for row in previous.data['results']],
+            ['005', '004', '003', '002'],
+        )
+
+    def test_cursor_respects_ordering_filter_with_nulls(self):
+        farmers = create_farmers(7)
+        for index, farmer in enumerate(farmers):
+            farmer.age = None if index % 3 == 0 else 30 + index % 2
+            farmer.save()
+
+        seen, _ = self.walk(
+            reverse('farmer-list-create'),
+            {'pagination': 'cursor', 'ordering': 'age', 'page_size': 2},
+        )
+        expected = list(
+            Farmer.objects.order_by(F('age').asc(nulls_last=True), 'id').values_list('farmer_id', flat=True)
+        )
+        self.assertEqual([row['farmer_id'] for row in seen], expected)
+
+    def test_page_size_is_capped(self):
+        create_farmers(120)
+        response = self.client.get(reverse('farmer-list-create'), {'page_size': 500})
+        self.assertEqual(len(response.data['results']), 100)
+        self.assertEqual(response.data['count'], 120)
+        response = self.client.get(reverse('farmer-list-create'), {'pagination': 'cursor', 'page_size': 500})
+        self.assertEqual(len(response.data['results']), 100)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('farmer-list-create'), {'pagination': 'cursor', 'cursor': 'junk'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_farmer_ndjson_export_applies_filters(self):
+        farmers = create_farmers(15)
+        Farmer.objects.filter(pk=farmers[0].pk).update(region='Volta')
+        body = self.read(self.client.get(reverse('farmer-export'), {'region': 'Ashanti'}))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 14)
+        self.assertEqual(rows[0]['farmer_id'], 'F002')
+
+        body = self.read(self.client.get(reverse('farmer-export'), {'search': 'F01'}))
+        self.assertEqual(
+            [json.loads(line)['farmer_id'] for line in body.splitlines()],
+            ['F010', 'F011', 'F012', 'F013', 'F014', 'F015'],
+        )
+
+    def test_search_export_streams_every_match(self):
+        Farmer.objects.bulk_create([
+            Farmer(farmer_id=f'M{number:04}', name=f'Esi Mensah {number}', gender='female', farm_size=1, region='Volta')
+            for number in range(600)
+        ])
+        create_farmers(3)
+        body = self.read(self.client.get(reverse('farmer-export'), {'search': 'Mensah'}))
+        farmer_ids = {json.loads(line)['farmer_id'] for line in body.splitlines()}
+        self.assertEqual(farmer_ids, {f'M{number:04}' for number in range(600)})
+
+    def test_batch_csv_export_with_farmers(self):
+        sites = create_sites()
+        farmers = create_farmers(3)
+        create_batch('001', farmers, sites)
+        create_batch('002', farmers[:1], sites)
+
+        body = self.read(self.client.get(
+            reverse('batch-export'), {'export_format': 'csv', 'include_farmers': 'true'}
+        ))
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['batch_number'], 'DOA/2025/001')
+        self.assertEqual(rows[0]['collection_center'], 'CC001')
+        self.assertEqual(rows[0]['contributing_farmers'], 'F001;F002;F003')
+        self.assertEqual(rows[1]['contributing_farmers'], 'F001')
+
+    def test_unknown_export_format(self):
+        response = self.client.get(reverse('farmer-export'), {'export_format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkCreateTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def farmer_row(self, **extra):
+        row = {'name': 'Ama', 'gender': 'female', 'farm_size': 1.5, 'region': 'Volta'}
+        row.update(extra)
+        return row
+
+    def test_bulk_farmers_json_reports_row_errors(self):
+        create_farmers(2)
+        rows = [self.farmer_row() for _ in range(5)]
+        rows[1]['farm_size'] = -1
+        rows[2]['farmer_id'] = 'F002'
+        rows[3]['farmer_id'] = 'F900'
+        rows.append(self.farmer_row(farmer_id='F900'))
+        # The sequence continues from the legacy "latest.id + 1" numbering
+        start = Farmer.objects.order_by('-id').first().id + 1
+
+        response = self.client.post(reverse('farmer-bulk-create'), rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.data['created'],
+            [
+                {'row': 0, 'farmer_id': f"F{str(start).zfill(3)}"},
+                {'row': 3, 'farmer_id': 'F900'},
+                {'row': 4, 'farmer_id': f"F{str(start + 1).zfill(3)}"},
+            ],
+        )
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2, 5])
+        self.assertEqual(Farmer.objects.count(), 5)
+
+        # Single creates continue from the same sequence
+        response = self.client.post(reverse('farmer-list-create'), self.farmer_row(), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['farmer_id'], f"F{str(start + 2).zfill(3)}")
+
+    def test_allocated_identifiers_skip_those_in_the_upload(self):
+        create_farmers(1)
+        start = Farmer.objects.order_by('-id').first().id + 1
+        supplied = f"F{str(start + 1).zfill(3)}"
+        rows = [self.farmer_row(farmer_id=supplied)] + [self.farmer_row() for _ in range(4)]
+        response = self.client.post(reverse('farmer-bulk-create'), rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        identifiers = [row['farmer_id'] for row in response.data['created']]
+        self.assertEqual(len(set(identifiers)), 5)
+        self.assertEqual(identifiers.count(supplied), 1)
+
+    def test_bulk_processing_facilities_csv_upload(self):
+        upload = io.BytesIO(
+            b"name,location,capacity,certifications\n"
+            b"Mill A,Tema,20,HACCP;FAIR TRADE\n"
+            b"Mill B,Takoradi,,ORGANIC\n"
+            b"Mill C,Accra,5,\n"
+        )
+        upload.name = 'facilities.csv'
+        response = self.client.post(
+            reverse('processing-facility-bulk-create'), {'file': upload}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['row'] for row in response.data['created']], [0, 2])
+        self.assertIn('capacity', response.data['errors'][0]['errors'])
+        self.assertEqual(
+            ProcessingFacility.objects.get(name='Mill A').certifications,
+            ['HACCP', 'FAIR TRADE'],
+        )
+        self.assertEqual(ProcessingFacility.objects.get(name='Mill C').certifications, [])
+
+    def test_bulk_rejects_non_list(self):
+        response = self.client.post(reverse('farmer-bulk-create'), self.farmer_row(), format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchImportTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.farmers = create_farmers(3)
+        create_sites()
+        create_batch('001', [], create_sites('002'))
+
+    def batch_row(self, **extra):
+        row = {
+            'doa': 'DOA', 'year': '2025',
+            'collection_center': 'CC001', 'processing_facility': 'PF001', 'packaging_center': 'PC001',
+            'contributing_farmers': ['F001', 'F002'],
+            'packaging_date': '2025-01-01', 'expiry_date': '2026-01-01',
+            'zero_child_labor': True, 'zero_deforestation': True,
+        }
+        row.update(extra)
+        return row
+
+    def test_import_json_reports_row_errors(self):
+        rows = [self.batch_row() for _ in range(3)]
+        rows.append(self.batch_row(contributing_farmers=['F001', 'F404']))
+        rows.append(self.batch_row(packaging_center='PC404'))
+        rows.append(self.batch_row(batch_number='DOA/2025/001', sequence='001'))
+        rows.append(self.batch_row(batch_number='DOA/2025/050', sequence='050'))
+        rows.append(self.batch_row(batch_number='DOA/2025/050', sequence='050'))
+        rows.append(self.batch_row(zero_child_labor=False))
+
+        response = self.client.post(reverse('batch-import'), rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.data['created'],
+            [
+                {'row': 0, 'batch_number': 'DOA/2025/002'},
+                {'row': 1, 'batch_number': 'DOA/2025/003'},
+                {'row': 2, 'batch_number': 'DOA/2025/004'},
+                {'row': 6, 'batch_number': 'DOA/2025/050'},
+            ],
+        )
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4, 5, 7, 8])
+        self.assertIn('F404', str(response.data['errors'][0]['errors']))
+        self.assertIn('packaging_center', response.data['errors'][1]['errors'])
+
+        batch = Batch.objects.get(batch_number='DOA/2025/003')
+        self.assertEqual(sorted(batch.contributing_farmers.values_list('farmer_id', flat=True)), ['F001', 'F002'])
+        self.assertEqual(batch.traceability['batch_number'], 'DOA/2025/003')
+
+    def test_import_query_count_does_not_grow_with_rows(self):
+        # The first import creates the sequence row
+        self.client.post(reverse('batch-import'), [self.batch_row()], format='json')
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(reverse('batch-import'), [self.batch_row()] * 2, format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(reverse('batch-import'), [self.batch_row()] * 50, format='json')
+        self.assertEqual(len(response.data['created']), 50)
+        self.assertEqual(len(large), len(small))
+
+    def test_import_csv_upload_and_command(self):
+        upload = io.BytesIO(
+            b"doa,year,collection_center,processing_facility,packaging_center,contributing_farmers,"
+            b"packaging_date,expiry_date,zero_child_labor,zero_deforestation\n"
+            b"CSV,2025,CC001,PF001,PC001,F001;F003,2025-01-01,2026-01-01,true,true\n"
+            b"CSV,2025,CC001,PF001,PC001,,2025-01-01,2026-01-01,true,true\n"
+        )
+        upload.name = 'batches.csv'
+        response = self.client.post(reverse('batch-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(Batch.objects.get(batch_number='CSV/2025/001').contributing_farmers.values_list('farmer_id', flat=True)),
+            ['F001', 'F003'],
+        )
+        self.assertFalse(Batch.objects.get(batch_number='CSV/2025/002').contributing_farmers.exists())
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as source:
+            json.dump([self.batch_row(doa='CMD')] * 5 + [self.batch_row(doa='CMD', collection_center='CC404')], source)
+            source.flush()
+            output = io.StringIO()
+            call_command('import_batches', source.name, chunk_size=2, stdout=output, stderr=io.StringIO())
+        self.assertIn('Imported 5 batches, 1 rows failed', output.getvalue())
+        self.assertEqual(Batch.objects.filter(doa='CMD').count(), 5)
+
+
+class BatchFarmerResolutionTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.farmers = create_farmers(30)
+        self.sites = create_sites()
+
+    def batch_data(self, farmers):
+        collection_center, processing_facility, packaging_center = self.sites
+        return {
+            'batch_number': 'DOA/2025/001', 'doa': 'DOA', 'year': '2025', 'sequence': '001',
+            'collection_center': collection_center.pk, 'processing_facility': processing_facility.pk,
+            'packaging_center': packaging_center.pk, 'contributing_farmers': farmers,
+            'packaging_date': '2025-01-01', 'expiry_date': '2026-01-01',
+            'zero_child_labor': True, 'zero_deforestation': True,
+        }
+
+    def test_validation_queries_do_not_grow_with_farmers(self):
+        # Batch number uniqueness, one query per site and one for all the farmers
+        for farmers in (self.farmers[:2], self.farmers):
+            serializer = BatchSerializer(data=self.batch_data([farmer.pk for farmer in farmers]))
+            with self.assertNumQueries(5):
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_primary_and_business_keys_with_all_missing_reported(self):
+        farmers = [self.farmers[0].pk, 'F002', str(self.farmers[2].pk)]
+        response = self.client.post(reverse('batch-list-create'), self.batch_data(farmers), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['contributing_farmers'][1]['farmer_id'], 'F002')
+        self.assertEqual(Batch.objects.get().contributing_farmers.count(), 3)
+
+        data = self.batch_data([self.farmers[0].pk, 999999, 'F404'])
+        data['batch_number'] = 'DOA/2025/002'
+        response = self.client.post(reverse('batch-list-create'), data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['contributing_farmers']), 2)
+        self.assertIn('999999', response.data['contributing_farmers'][0])
+        self.assertIn('F404', response.data['contributing_farmers'][1])
+
+
+class GenerateBatchNumberTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def generate(self, **data):
+        return self.client.post(reverse('generate-batch-number'), data, format='json')
+
+    def test_sequence_continues_past_999_and_skips_used_numbers(self):
+        sites = create_sites()
+        create_batch('998', [], sites)
+        create_batch('999', [], sites)
+
+        response = self.generate(doa='DOA', year='2025')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['batch_number'], 'DOA/2025/1000')
+
+        create_batch('1002', [], sites)
+        response = self.generate(doa='DOA', year='2025', count=3)
+        self.assertEqual(
+            response.data['batch_numbers'],
+            ['DOA/2025/1001', 'DOA/2025/1003', 'DOA/2025/1004'],
+        )
+        self.assertEqual(self.generate(doa='DOA', year='2026').data['sequence'], '001')
+
+    def test_invalid_count(self):
+        self.assertEqual(self.generate(doa='DOA', year='2025', count=0).status_code, 400)
+        self.assertEqual(self.generate(doa='DOA', year='2025', count='x').status_code, 400)
+
+
+class ConcurrentSequenceTests(TransactionTestCase):
+
+    def test_parallel_callers_never_share_a_number(self):
+        def worker():
+            try:
+                return [
+                    sequence
+                    for _ in range(10)
+                    for sequence in allocate_batch_sequences('DOA', '2025', 3)
+                ]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(worker) for _ in range(8)]
+            sequences = [sequence for future in futures for sequence in future.result()]
+
+        self.assertEqual(len(sequences), 240)
+        self.assertEqual(sorted(map(int, sequences)), list(range(1, 241)))
+
+
+class RankedSearchTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        for farmer_id, name in [
+            ('F001', 'Kwame Mensah'),
+            ('F002', 'Akosua Kwarteng'),
+            ('F003', 'Yaw Boateng'),
+            ('F004', 'Ama Serwaa'),
+        ]:
+            Farmer.objects.create(
+                farmer_id=farmer_id, name=name, gender='male', farm_size=1, region='Ashanti'
+            )
+
+    def search(self, term, **params):
+        response = self.client.get(reverse('farmer-list-create'), {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data['results']]
+
+    def test_prefix_matches_rank_first(self):
+        self.assertEqual(self.search('kwa')[:2], ['Kwame Mensah', 'Akosua Kwarteng'])
+
+    def test_typo_tolerant_match(self):
+        self.assertEqual(self.search('Kwme')[0], 'Kwame Mensah')
+        self.assertEqual(self.search('Boatemg'), ['Yaw Boateng'])
+        self.assertNotIn('Ama Serwaa', self.search('Boatemg'))
+
+    def test_business_id_and_explicit_ordering(self):
+        self.assertEqual(self.search('F003'), ['Yaw Boateng'])
+        self.assertEqual(self.search('kwa', ordering='name'), ['Akosua Kwarteng', 'Kwame Mensah'])
+
+    def test_large_match_sets_are_counted_in_full(self):
+        Farmer.objects.bulk_create([
+            Farmer(farmer_id=f'M{number:04}', name=f'Esi Mensah {number}', gender='female', farm_size=1, region='Volta')
+            for number in range(600)
+        ])
+        response = self.client.get(reverse('farmer-list-create'), {'search': 'Mensah'})
+        self.assertEqual(response.data['count'], 601)
+
+    def test_sqlite_typo_query(self):
+        # Trigrams left by any one edit of " kwme": a match keeps one of them
+        self.assertEqual(typo_query(' kwme', 1), '(" kw") OR ("wme")')
+        self.assertEqual(
+            typo_query(' boatemg', 1), '(" bo" AND "boa") OR (" bo" AND "emg") OR ("emg" AND "tem")'
+        )
+        self.assertEqual(typo_query(' a"bcd', 1), '(" a""") OR ("bcd")')
+
+
+class SearchThresholdTests(TransactionTestCase):
+
+    def test_threshold_does_not_outlive_the_query(self):
+        Farmer.objects.create(farmer_id='F001', name='Kwame Mensah', gender='male', farm_size=1, region='Ashanti')
+        self.assertEqual(len(search_queryset(Farmer.objects.all(), ['name'], 'Kwme')), 1)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SHOW pg_trgm.word_similarity_threshold")
+                self.assertEqual(cursor.fetchone()[0], '0.6')
+
+
+class DashboardRollupTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def summary(self, queries=1):
+        with self.assertNumQueries(queries):
+            response = self.client.get(reverse('dashboard-summary'))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_rollups_follow_saves_and_deletes(self):
+        farmers = create_farmers(3)
+        sites = create_sites()
+        create_batch('001', farmers, sites)
+        create_batch('002', farmers, sites)
+
+        data = self.summary()
+        self.assertEqual(data['total_farmers'], 3)
+        self.assertEqual(data['total_batches'], 2)
+        self.assertEqual(data['total_processing_facilities'], 1)
+        self.assertEqual(data['farmers_by_region'], [{'region': 'Ashanti', 'farmers': 3, 'farm_size': 7.5}])
+        self.assertEqual(
+            data['batches_by_facility_month'],
+            [{'processing_facility': sites[1].pk, 'month': '2025-01', 'batches': 2}],
+        )
+
+        farmers[0].region = 'Volta'
+        farmers[0].farm_size = 4
+        farmers[0].save()
+        farmers[1].delete()
+        data = self.summary()
+        self.assertEqual(data['total_farmers'], 2)
+        self.assertEqual(
+            data['farmers_by_region'],
+            [
+                {'region': 'Ashanti', 'farmers': 1, 'farm_size': 2.5},
+                {'region': 'Volta', 'farmers': 1, 'farm_size': 4.0},
+            ],
+        )
+
+    def test_bulk_create_and_reconcile(self):
+        rows = [{'name': 'Ama', 'gender': 'female', 'farm_size': 1, 'region': 'Bono'}] * 4
+        self.client.post(reverse('farmer-bulk-create'), rows, format='json')
+        self.assertEqual(self.summary()['total_farmers'], 4)
+
+        # queryset.update() bypasses signals; the reconcile job repairs the drift
+        Farmer.objects.filter(name='Ama').update(region='Volta')
+        self.assertEqual(self.summary()['farmers_by_region'][0]['region'], 'Bono')
+        call_command('reconcile_rollups', stdout=io.StringIO())
+        self.assertEqual(
+            self.summary()['farmers_by_region'],
+            [{'region': 'Volta', 'farmers': 4, 'farm_size': 4.0}],
+        )
+
+    def test_missing_rollups_are_built_after_migrate_not_on_read(self):
+        create_batch('001', create_farmers(2), create_sites())
+        Rollup.objects.all().delete()
+        SiteThroughput.objects.all().delete()
+        self.assertEqual(self.summary()['total_farmers'], 0)
+        self.assertFalse(Rollup.objects.exists())
+        build_missing(using='default')
+        self.assertEqual(self.summary()['total_batches'], 1)
+        self.assertTrue(SiteThroughput.objects.exists())
+
+
+class ExpiryMonitoringTests(TestCase):
+
+    def setUp(self):
+        farmers = create_farmers(2)
+        self.sites = create_sites()
+        self.other_sites = create_sites('002')
+        self.soon = create_batch('001', farmers, self.sites)
+        self.later = create_batch('002', farmers, self.sites)
+        self.later.expiry_date = date(2026, 3, 1)
+        self.later.save()
+        self.other = create_batch('003', farmers, self.other_sites)
+        self.other.expiry_date = date(2026, 1, 5)
+        self.other.save()
+
+    def test_window_lists_soonest_first(self):
+        url = reverse('batch-expiring')
+        response = self.client.get(url, {'from': '2025-12-25', 'days': 30})
+        self.assertEqual([row['batch_number'] for row in response.data['results']], ['DOA/2025/001', 'DOA/2025/003'])
+        response = self.client.get(url, {'from': '2025-12-25', 'to': '2026-03-01', 'packaging_center': self.other_sites[2].pk})
+        self.assertEqual([row['batch_number'] for row in response.data['results']], ['DOA/2025/003'])
+        self.assertEqual(self.client.get(url, {'days': 1000}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': '2026-01-05', 'to': '2026-01-01'}).status_code, 400)
+
+    def test_histogram_reads_precomputed_buckets(self):
+        url = reverse('batch-expiry-histogram')
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'from': '2025-12-29', 'to': '2026-01-11'})
+        self.assertEqual(response.data['batches'], 2)
+        self.assertEqual(response.data['sites'], [
+            {'packaging_center': self.sites[2].pk, 'batches': 1, 'weeks': [{'week': '2025-12-29', 'batches': 1}]},
+            {'packaging_center': self.other_sites[2].pk, 'batches': 1, 'weeks': [{'week': '2026-01-05', 'batches': 1}]},
+        ])
+
+        self.soon.expiry_date = date(2026, 1, 6)
+        self.soon.save()
+        response = self.client.get(url, {'from': '2025-12-29', 'to': '2026-01-11', 'group': 'processing_facility'})
+        self.assertEqual(response.data['sites'][0], {
+            'processing_facility': self.sites[1].pk, 'batches': 1, 'weeks': [{'week': '2026-01-05', 'batches': 1}],
+        })
+        self.assertEqual(reconcile(), [])
+        self.assertEqual(self.client.get(url, {'group': 'farmer'}).status_code, 400)
+
+
+class SiteThroughputTests(TestCase):
+
+    def setUp(self):
+        farmers = create_farmers(1)
+        self.sites = create_sites()
+        self.batches = [create_batch(sequence, farmers, self.sites) for sequence in ('001', '002', '003')]
+        for batch, net_weight in zip(self.batches, (10, 30, 20)):
+            batch.net_weight = net_weight
+        self.batches[2].packaging_date = date(2025, 2, 3)
+        for batch in self.batches:
+            batch.save()
+        self.url = reverse('site-throughput')
+
+    def test_monthly_utilisation_against_capacity(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'from': '2025-01-01', 'to': '2025-02-28', 'period': 'month'})
+        [facility] = response.data['sites']
+        self.assertEqual((facility['facility_id'], facility['batches'], facility['tons']), ('PF001', 3, 60.0))
+        self.assertEqual(facility['utilisation'], round(60 / (20 * 59), 4))
+        self.assertEqual(facility['periods'], [
+            {'start': date(2025, 1, 1), 'batches': 2, 'tons': 40.0, 'utilisation': round(40 / (20 * 31), 4)},
+            {'start': date(2025, 2, 1), 'batches': 1, 'tons': 20.0, 'utilisation': round(20 / (20 * 28), 4)},
+        ])
+
+    def test_rows_follow_saves_and_deletes(self):
+        self.batches[0].net_weight = 15
+        self.batches[0].save()
+        self.batches[1].delete()
+        query = {'from': '2025-01-01', 'to': '2025-01-07', 'period': 'day', 'site': 'packaging_center', 'ids': 'PC001'}
+        [center] = self.client.get(self.url, query).data['sites']
+        self.assertEqual(center['periods'], [{'start': date(2025, 1, 1), 'batches': 1, 'tons': 15.0, 'utilisation': 3.0}])
+        self.assertEqual(self.client.get(self.url, {**query, 'ids': 'PC404'}).data['sites'], [])
+        self.assertEqual(throughput.reconcile(), [])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'period': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'site': 'farmer'}).status_code, 400)
+        response = self.client.get(self.url, {'from': '2020-01-01', 'to': '2025-01-01', 'period': 'day'})
+        self.assertEqual(response.status_code, 400)
+
+
+class NearestSiteTests(TestCase):
+
+    def setUp(self):
+        self.sites = {}
+        for center_id, coordinates in (
+            ('CC001', '6.6885,-1.6244'),   # Kumasi
+            ('CC002', '6.0941 N, 0.2591 W'),   # Koforidua
+            ('CC003', '5.6037 -0.1870'),   # Accra
+            ('CC004', 'near the market'),
+        ):
+            self.sites[center_id] = CollectionCenter.objects.create(
+                center_id=center_id, name=center_id, location='Ghana', coordinates=coordinates,
+                drying_method='Sun-dried', capacity=10,
+            )
+        self.url = reverse('collection-center-nearest')
+
+    def test_parse_coordinates(self):
+        self.assertEqual(parse_coordinates('5.6037 N, 0.1870 W'), (5.6037, -0.187))
+        self.assertEqual(parse_coordinates(' -33.9;18.4 '), (-33.9, 18.4))
+        for text in ('', 'Kumasi', '91,0', '5.6,181'):
+            with self.assertRaises(ValueError):
+                parse_coordinates(text)
+        self.assertEqual((self.sites['CC002'].latitude, self.sites['CC002'].longitude), (6.0941, -0.2591))
+        self.assertIsNone(self.sites['CC004'].latitude)
+
+    def test_nearest_sites_in_order(self):
+        # Koforidua is outside the first 25 km: one widened search, then the sites
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'lat': '5.6', 'lon': '-0.2', 'k': '2'})
+        self.assertEqual([site['center_id'] for site in response.data['results']], ['CC003', 'CC002'])
+        self.assertAlmostEqual(response.data['results'][0]['distance_km'], 1.5, delta=0.1)
+        self.assertEqual(response.data['radius_km'], 100)
+
+        response = self.client.get(self.url, {'lat': '5.6', 'lon': '-0.2', 'radius_km': '80'})
+        self.assertEqual([site['center_id'] for site in response.data['results']], ['CC003', 'CC002'])
+
+    def test_box_wraps_the_antimeridian(self):
+        center = self.sites['CC001']
+        center.coordinates = '-17.7,179.9'
+        center.save(update_fields=['coordinates'])
+        self.assertEqual(CollectionCenter.objects.filter(bounding_box(-17.7, -179.9, 50)).get(), center)
+        response = self.client.get(self.url, {'lat': '-17.7', 'lon': '-179.9', 'radius_km': '50'})
+        self.assertEqual([site['center_id'] for site in response.data['results']], ['CC001'])
+
+    def test_invalid_input(self):
+        self.assertEqual(self.client.get(self.url, {'lat': '5.6'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'lat': '95', 'lon': '0'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'lat': '5', 'lon': '0', 'k': '0'}).status_code, 400)
+        response = self.client.post(reverse('collection-center-list-create'), {
+            'name': 'New', 'location': 'Tamale', 'coordinates': 'north of Tamale',
+            'drying_method': 'Sun-dried', 'capacity': 5,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('coordinates', response.data)
+
+    def test_backfill(self):
+        CollectionCenter.objects.update(latitude=None, longitude=None)
+        out = io.StringIO()
+        call_command('backfill_coordinates', stdout=out)
+        self.assertIn('Located 3 of 4 collection centers, 1 unparseable', out.getvalue())
+        self.assertIn('CC004', out.getvalue())
+        self.assertEqual(CollectionCenter.objects.get(center_id='CC003').longitude, -0.187)
+
+
+class TraceabilityCacheTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        traceability_cache.clear()
+        self.farmers = create_farmers(3)
+        self.sites = create_sites()
+        self.batch = create_batch('001', self.farmers, self.sites)
+
+    def search(self, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.post(
+                reverse('batch-search'), {'batch_number': self.batch.batch_number}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_repeat_search_is_served_from_cache(self):
+        self.search(2)
+        data = self.search(0)
+        self.assertEqual(len(data['contributing_farmers']), 3)
+        stats = self.client.get(reverse('batch-cache-stats')).data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_related_changes_invalidate(self):
+        self.search(2)
+        self.farmers[0].name = 'Renamed'
+        self.farmers[0].save()
+        names = [farmer['name'] for farmer in self.search(2)['contributing_farmers']]
+        self.assertIn('Renamed', names)
+
+        self.sites[1].name = 'New Processing'
+        self.sites[1].save()
+        self.assertEqual(self.search(2)['processing_facility']['name'], 'New Processing')
+
+        self.batch.contributing_farmers.remove(self.farmers[2])
+        self.assertEqual(len(self.search(2)['contributing_farmers']), 2)
+
+        self.farmers[1].batches.clear()
+        self.assertEqual(len(self.search(2)['contributing_farmers']), 1)
+
+        self.farmers[0].delete()
+        self.assertEqual(self.search(2)['contributing_farmers'], [])
+
+    def test_missing_batch_is_not_cached(self):
+        for _ in range(2):
+            response = self.client.post(reverse('batch-search'), {'batch_number': 'X/2025/999'}, format='json')
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(traceability_cache.stats()['hits'], 0)
+
+
+class TraceabilitySnapshotTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.farmers = create_farmers(3)
+        self.sites = create_sites()
+        self.batch = create_batch('001', self.farmers, self.sites)
+
+    def snapshot(self):
+        url = reverse('batch-search') + '?snapshot=true'
+        with self.assertNumQueries(1):
+            response = self.client.post(url, {'batch_number': self.batch.batch_number}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_snapshot_matches_serializer_and_follows_changes(self):
+        live = self.client.post(
+            reverse('batch-search'), {'batch_number': self.batch.batch_number}, format='json'
+        ).data
+        self.assertEqual(self.snapshot(), json.loads(json.dumps(live)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sites[0].name = 'Renamed Collection'
+            self.sites[0].save()
+        self.assertEqual(self.snapshot()['collection_center']['name'], 'Renamed Collection')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.farmers[0].delete()
+            self.farmers[1].batches.clear()
+        self.assertEqual([f['farmer_id'] for f in self.snapshot()['contributing_farmers']], ['F003'])
+
+    def test_related_saves_rebuild_after_commit_and_reads_do_not_write(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.farmers[0].name = 'Renamed Farmer'
+            self.farmers[0].save()
+        self.batch.refresh_from_db()
+        self.assertIsNone(self.batch.traceability)
+
+        url = reverse('batch-search') + '?snapshot=true'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'batch_number': self.batch.batch_number}, format='json')
+        self.assertIn('Renamed Farmer', str(response.data))
+        self.assertFalse([q for q in queries if q['sql'].startswith(('UPDATE', 'INSERT'))])
+        self.batch.refresh_from_db()
+        self.assertIsNone(self.batch.traceability)
+
+        for callback in callbacks:
+            callback()
+        self.assertIn('Renamed Farmer', str(self.snapshot()))
+
+    def test_batch_reads_skip_the_snapshot_column(self):
+        traceability_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('batch-list-create'))
+            self.client.get(reverse('batch-detail', args=[self.batch.batch_number]))
+            self.batch.net_weight = 3
+            self.batch.save()
+        batch_reads = [q['sql'] for q in queries if q['sql'].startswith('SELECT "agri_batch"."id"')]
+        self.assertEqual(len(batch_reads), 3)
+        for sql in batch_reads:
+            self.assertNotIn('traceability', sql)
+
+    def test_saves_in_one_transaction_rebuild_the_snapshot_once(self):
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                self.batch.net_weight = 3
+                self.batch.save()
+                self.batch.contributing_farmers.remove(self.farmers[2])
+                self.batch.contributing_farmers.add(self.farmers[2])
+        writes = [q['sql'] for q in queries if q['sql'].startswith('UPDATE') and 'traceability' in q['sql']]
+        # One clear inside the transaction, one rebuild after commit
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(self.snapshot()['net_weight'], 3)
+
+    def test_check_and_backfill_commands(self):
+        call_command('check_snapshots', stdout=io.StringIO())
+
+        Farmer.objects.filter(pk=self.farmers[0].pk).update(name='Changed by SQL')
+        Batch.objects.filter(pk=self.batch.pk).update(traceability=None)
+        create_batch('002', self.farmers[:1], self.sites)
+        with self.assertRaises(CommandError):
+            call_command('check_snapshots', stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command('backfill_snapshots', stdout=out)
+        self.assertIn('Built 1 traceability snapshots', out.getvalue())
+        self.assertIn('Changed by SQL', str(self.snapshot()))
+        # batch 002 still holds the old farmer name
+        call_command('check_snapshots', '--repair', stdout=io.StringIO())
+        call_command('check_snapshots', stdout=io.StringIO())
+
+
+class AsyncReadPathTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.batch = create_batch('001', create_farmers(2), create_sites())
+
+    async def test_async_views_match_sync_views(self):
+        client = AsyncClient()
+        response = await client.get(reverse('async-batch-detail', args=[self.batch.batch_number]))
+        self.assertEqual(response.status_code, 200)
+        detail = response.json()
+        self.assertEqual(detail['batch_number'], 'DOA/2025/001')
+        self.assertEqual(len(detail['contributing_farmers']), 2)
+
+        response = await client.post(
+            reverse('async-batch-search'), {'batch_number': self.batch.batch_number},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), detail)
+        response = await client.post(
+            reverse('async-batch-search'), {'batch_number': 'X/1/1'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+        summary = (await client.get(reverse('async-dashboard-summary'))).json()
+        self.assertEqual(summary['total_batches'], 1)
+        self.assertEqual(summary['total_farmers'], 2)
+
+    async def test_invalid_token_is_rejected_like_sync_views(self):
+        client, headers = AsyncClient(), {'Authorization': 'Bearer garbage'}
+        sync = await client.get(reverse('dashboard-summary'), headers=headers)
+        self.assertEqual(sync.status_code, 401)
+        for response in (
+            await client.get(reverse('async-batch-detail', args=[self.batch.batch_number]), headers=headers),
+            await client.post(
+                reverse('async-batch-search'), {'batch_number': self.batch.batch_number},
+                content_type='application/json', headers=headers,
+            ),
+            await client.get(reverse('async-dashboard-summary'), headers=headers),
+        ):
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.json(), sync.json())
+            self.assertEqual(response['WWW-Authenticate'], sync['WWW-Authenticate'])
+
+
+class SeedAndBenchmarkCommandTests(TestCase):
+
+    def test_seed_data_is_deterministic_and_benchmark_covers_routes(self):
+        call_command(
+            'seed_data', farmers=40, collection_centers=2, processing_facilities=2,
+            packaging_centers=2, batches=12, farmers_per_batch=5, chunk_size=5, stdout=io.StringIO(),
+        )
+        self.assertEqual(Farmer.objects.count(), 40)
+        self.assertEqual(Batch.contributing_farmers.through.objects.count(), 60)
+        self.assertFalse(Batch.objects.filter(traceability__isnull=True).exists())
+        self.assertEqual(self.client.get(reverse('dashboard-summary')).data['total_batches'], 12)
+        first_run = list(Farmer.objects.order_by('id').values_list('farmer_id', 'name', 'region'))
+        call_command('check_snapshots', stdout=io.StringIO())
+
+        out = io.StringIO()
+        call_command('benchmark_routes', iterations=2, stdout=out, stderr=io.StringIO())
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['dataset']['batches'], 12)
+        self.assertEqual(results['routes']['GET dashboard-summary']['status'], 200)
+        self.assertEqual(results['routes']['GET dashboard-summary']['queries'], 1)
+        self.assertEqual(results['routes']['POST farmer-bulk-create']['status'], 201)
+        # Writes are rolled back
+        self.assertEqual(Farmer.objects.count(), 40)
+
+        Farmer.objects.all().delete()
+        Batch.objects.all().delete()
+        call_command('seed_data', farmers=40, batches=0, stdout=io.StringIO())
+        second_run = Farmer.objects.order_by('id').values_list('name', 'region')
+        self.assertEqual(list(second_run), [(name, region) for farmer_id, name, region in first_run])
+
+
+class FastReadParityTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        farmers = create_farmers(12)
+        Farmer.objects.filter(pk=farmers[0].pk).update(name='Akosua "Nana" Nyamekye\\', age=None)
+        self.sites = create_sites()
+        ProcessingFacility.objects.filter(pk=self.sites[1].pk).update(certifications=['HACCP', 'ORGANIC'])
+        for sequence in range(1, 13):
+            create_batch(str(sequence).zfill(3), farmers[sequence % 4:sequence % 4 + 5], self.sites)
+
+    def assertSameBytes(self, method, url, params=None):
+        responses = []
+        for fast in (False, True):
+            with override_settings(FAST_READS=fast):
+                traceability_cache.clear()
+                responses.append(getattr(self.client, method)(url, params or {}, format='json'))
+        self.assertEqual(responses[0].status_code, responses[1].status_code)
+        self.assertEqual(responses[0].content, responses[1].content)
+        return responses[1]
+
+    def test_list_and_detail_output_is_identical(self):
+        for name in ('farmer-list-create', 'collection-center-list-create',
+                     'processing-facility-list-create', 'packaging-center-list-create'):
+            self.assertSameBytes('get', reverse(name))
+        self.assertSameBytes('get', reverse('farmer-list-create'), {'search': 'Farmer 1', 'page_size': 5})
+        self.assertSameBytes('get', reverse('farmer-list-create'), {'ordering': '-age', 'pagination': 'cursor'})
+        response = self.assertSameBytes('get', reverse('batch-list-create'), {'pagination': 'cursor', 'page_size': 5})
+        self.assertSameBytes('get', response.data['next'])
+        self.assertSameBytes('get', reverse('batch-list-create'), {'ordering': 'expiry_date', 'page': 2})
+
+        self.assertSameBytes('get', reverse('farmer-detail', kwargs={'farmer_id': 'F001'}))
+        self.assertSameBytes('get', reverse('farmer-detail', kwargs={'farmer_id': 'F999'}))
+        self.assertSameBytes('get', reverse('processing-facility-detail', kwargs={'facility_id': 'PF001'}))
+        self.assertSameBytes('get', reverse('batch-detail', kwargs={'batch_number': 'DOA/2025/001'}))
+
+    @override_settings(FAST_READS=True)
+    def test_batch_list_skips_serializer(self):
+        # The count, the page with its sites joined and the farmers of the page
+        with mock.patch.object(BatchSerializer, 'to_representation', side_effect=AssertionError):
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse('batch-list-create'))
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {
+            'text': 'Ọ̀ṣun \u2028 \u2029 "quoted" <tag>',
+            'when': datetime(2025, 1, 2, 3, 4, 5, 6789, tzinfo=dt_timezone.utc),
+            'day': date(2025, 1, 2),
+            'amount': Decimal('1.50'),
+            'values': [1, 2.5, None, True],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    def test_fast_renderer_keeps_stock_float_handling(self):
+        data = {'large': 1e16, 'small': 1e-05, 'plain': [0.1, 12.5]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        for value in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'values': [1.0, value]})
+
+    def test_fast_renderer_is_opt_in(self):
+        response = self.client.get(reverse('farmer-list-create'))
+        self.assertIs(type(response.accepted_renderer), JSONRenderer)
+        with override_settings(FAST_READS=True):
+            response = self.client.get(reverse('farmer-list-create'))
+        self.assertIs(type(response.accepted_renderer), FastJSONRenderer)
+
+
+class SparseFieldsetTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        farmers = create_farmers(6)
+        sites = create_sites()
+        for sequence in range(1, 4):
+            create_batch(str(sequence).zfill(3), farmers[sequence:sequence + 3], sites)
+
+    def get(self, name, params, queries=None, **kwargs):
+        url = reverse(name, kwargs=kwargs)
+        if queries is None:
+            return self.client.get(url, params)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, params)
+        self.assertEqual(len(captured), queries, [query['sql'] for query in captured])
+        self.sql = ' '.join(query['sql'] for query in captured)
+        return response
+
+    def test_batch_fields_skip_unrequested_relations(self):
+        for fast in (False, True):
+            with override_settings(FAST_READS=fast):
+                response = self.get('batch-list-create', {'fields': 'batch_number,packaging_date'}, queries=2)
+                self.assertEqual(list(response.data['results'][0]), ['batch_number', 'packaging_date'])
+                self.assertNotIn('agri_collectioncenter', self.sql)
+                self.assertNotIn('traceability', self.sql)
+
+    def test_expand_controls_nested_relations(self):
+        params = {'fields': 'batch_number,collection_center,contributing_farmers', 'expand': 'collection_center'}
+        contents = []
+        for fast in (False, True):
+            with override_settings(FAST_READS=fast):
+                response = self.get('batch-list-create', params, queries=3)
+                self.assertNotIn('agri_farmer"."name', self.sql)
+                contents.append(response.content)
+        batch = response.data['results'][-1]
+        self.assertEqual(batch['collection_center']['center_id'], 'CC001')
+        self.assertEqual(batch['contributing_farmers'], sorted(
+            Batch.objects.get(batch_number=batch['batch_number']).contributing_farmers.values_list('id', flat=True)
+        ))
+        self.assertEqual(contents[0], contents[1])
+
+        # Without ?fields=, ?expand= alone collapses the other relations
+        response = self.get('batch-list-create', {'expand': ''})
+        self.assertIsInstance(response.data['results'][0]['packaging_center'], int)
+
+    def test_batch_detail_and_snapshot(self):
+        params = {'fields': 'batch_number,processing_facility,contributing_farmers', 'expand': 'processing_facility'}
+        response = self.get('batch-detail', params, batch_number='DOA/2025/001')
+        self.assertEqual(set(response.data), {'batch_number', 'processing_facility', 'contributing_farmers'})
+        snapshot = self.get('batch-detail', {**params, 'snapshot': 'true'}, batch_number='DOA/2025/001')
+        self.assertEqual(json.loads(snapshot.content), json.loads(response.content))
+
+    def test_farmer_fields_and_unknown_names(self):
+        response = self.get('farmer-list-create', {'fields': 'farmer_id,name', 'pagination': 'cursor', 'page_size': 2})
+        self.assertEqual(list(response.data['results'][0]), ['farmer_id', 'name'])
+        self.assertEqual(self.client.get(response.data['next']).status_code, 200)
+        response = self.get('farmer-detail', {'fields': 'name'}, farmer_id='F002')
+        self.assertEqual(response.data, {'name': 'Farmer 2'})
+        self.assertEqual(self.get('farmer-list-create', {'fields': 'name,password'}).status_code, 400)
+        self.assertEqual(self.get('batch-list-create', {'expand': 'doa'}).status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.farmers = create_farmers(30)
+        self.batch = create_batch('001', self.farmers[:2], create_sites())
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_lists_answer_not_modified(self):
+        url = reverse('farmer-list-create')
+        response = self.client.get(url, {'page_size': 5})
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            revalidated = self.revalidate(url, response, page_size=5)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+        # Another page, a change and a deletion all change the validator
+        self.assertEqual(self.revalidate(url, response, page_size=6).status_code, 200)
+        Farmer.objects.get(farmer_id='F030').delete()
+        self.assertEqual(self.revalidate(url, response, page_size=5).status_code, 200)
+        response = self.client.get(url, {'page_size': 5})
+        farmer = Farmer.objects.get(farmer_id='F010')
+        farmer.region = 'Volta'
+        farmer.save()
+        self.assertEqual(self.revalidate(url, response, page_size=5).status_code, 200)
+
+    def test_keyset_pages_revalidate_without_scanning(self):
+        url = reverse('farmer-list-create')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'pagination': 'cursor', 'page_size': 5})
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+        self.assertEqual(self.revalidate(url, response, pagination='cursor', page_size=5).status_code, 304)
+        Farmer.objects.get(farmer_id='F030').delete()
+        self.assertEqual(self.revalidate(url, response, pagination='cursor', page_size=5).status_code, 200)
+        response = self.client.get(url, {'pagination': 'cursor', 'page_size': 5, 'region': 'Ashanti'})
+        farmer = Farmer.objects.get(farmer_id='F010')
+        farmer.region = 'Volta'
+        farmer.save()
+        self.assertEqual(
+            self.revalidate(url, response, pagination='cursor', page_size=5, region='Ashanti').status_code, 200
+        )
+
+    def test_batch_validators_follow_nested_rows(self):
+        url = reverse('batch-detail', kwargs={'batch_number': self.batch.batch_number})
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        site = CollectionCenter.objects.get()
+        site.name = 'Renamed'
+        site.save()
+        response = self.revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['collection_center']['name'], 'Renamed')
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.client.get(reverse('batch-detail', kwargs={'batch_number': 'X/1/1'})).status_code, 404)
+
+    def test_cached_batch_revalidates_without_queries(self):
+        traceability_cache.clear()
+        url = reverse('batch-detail', kwargs={'batch_number': self.batch.batch_number})
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+            revalidated = self.revalidate(url, response)
+        self.assertEqual((cached.status_code, cached['ETag'], cached.data), (200, response['ETag'], response.data))
+        self.assertEqual(revalidated.status_code, 304)
+        self.batch.net_weight = 12.5
+        self.batch.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_json_bodies_are_compressed(self):
+        url = reverse('farmer-list-create')
+        plain = self.client.get(url, {'page_size': 30})
+        for coding in ('br', 'gzip'):
+            response = self.client.get(url, {'page_size': 30}, HTTP_ACCEPT_ENCODING=f'{coding}, identity')
+            self.assertEqual(response['Content-Encoding'], coding)
+            self.assertLess(len(response.content), len(plain.content))
+            self.assertTrue(response['ETag'].startswith('W/'))
+        decoded = brotli.decompress(self.client.get(url, {'page_size': 30}, HTTP_ACCEPT_ENCODING='br').content)
+        self.assertEqual(decoded, plain.content)
+        response = self.client.get(url, {'page_size': 30}, HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        response = self.client.get(reverse('farmer-export'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 30)
+        small = self.client.get(reverse('farmer-detail', kwargs={'farmer_id': 'F001'}), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+
+class BatchVerifyTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        farmers = create_farmers(2)
+        sites = create_sites()
+        create_batch('001', farmers, sites)
+        create_batch('002', farmers, sites, doa='abc')
+        Batch.objects.filter(sequence='002').update(zero_deforestation=False)
+
+    def test_numbers_resolve_in_one_query(self):
+        numbers = [' doa/2025/001 ', 'abc/2025/002', 'DOA / 2025 / 001', 'DOA/2025/404']
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('batch-verify'), {'batch_numbers': numbers}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['found'], response.data['not_found'], response.data['non_compliant']), (3, 1, 1))
+        results = response.data['results']
+        self.assertEqual([result['batch_number'] for result in results], [
+            'DOA/2025/001', 'abc/2025/002', 'DOA/2025/001', 'DOA/2025/404'
+        ])
+        self.assertEqual(results[1]['input'], 'abc/2025/002')
+        self.assertFalse(results[1]['compliant'])
+        self.assertTrue(results[0]['zero_child_labor'])
+        self.assertFalse(results[3]['found'])
+
+    def test_get_is_cacheable_and_bounded(self):
+        response = self.client.get(reverse('batch-verify'), {'batch_numbers': 'DOA/2025/001,DOA/2025/404'})
+        self.assertEqual([result['found'] for result in response.data['results']], [True, False])
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('batch-verify')).status_code, 400)
+        response = self.client.post(reverse('batch-verify'), {'batch_numbers': ['X'] * 1001}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail_route_matches_slashed_numbers(self):
+        response = self.client.get(reverse('batch-detail', kwargs={'batch_number': 'DOA/2025/001'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['batch_number'], 'DOA/2025/001')
+
+
+class RecallImpactTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        farmers = create_farmers(4)
+        sites = create_sites()
+        other_sites = create_sites('002')
+        create_batch('001', farmers[:2], sites)
+        create_batch('002', farmers[1:3], other_sites)
+        create_batch('003', farmers[3:], other_sites)
+        Batch.objects.filter(sequence='002').update(expiry_date=date(2099, 1, 1))
+
+    def test_farmer_recall(self):
+        response = self.client.get(reverse('farmer-recall', kwargs={'farmer_id': 'F002'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['batch_number'] for row in response.data['batches']], ['DOA/2025/001', 'DOA/2025/002'])
+        self.assertEqual(response.data['batches'][0]['collection_center'], 'CC001')
+        self.assertEqual(
+            {key: response.data['summary'][key] for key in ('batches', 'in_date', 'expired')},
+            {'batches': 2, 'in_date': 1, 'expired': 1},
+        )
+        response = self.client.get(reverse('farmer-recall', kwargs={'farmer_id': 'F002'}), {'in_date': 'true'})
+        self.assertEqual([row['batch_number'] for row in response.data['batches']], ['DOA/2025/002'])
+        self.assertEqual(response.data['summary']['batches'], 2)
+        self.assertEqual(self.client.get(reverse('farmer-recall', kwargs={'farmer_id': 'F999'})).status_code, 404)
+
+    def test_combined_sources_use_constant_queries(self):
+        body = {'farmers': ['F001', 'F999'], 'processing_facilities': ['PF002']}
+        # Two lookups, the aggregate and the rows, inside a savepoint with the timeout
+        with self.assertNumQueries(7):
+            response = self.client.post(reverse('recall-impact'), body, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['batches']), 3)
+        self.assertEqual(response.data['summary']['by_source'], {'farmers': 1, 'processing_facilities': 2})
+        self.assertEqual(response.data['missing'], {'farmers': ['F999']})
+        self.assertEqual(response.data['summary']['earliest_expiry'], date(2026, 1, 1))
+
+        self.assertEqual(self.client.post(reverse('recall-impact'), {'batches': ['x']}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(reverse('recall-impact'), {}, format='json').status_code, 400)
+
+    def test_only_statement_timeouts_become_503(self):
+        url = reverse('farmer-recall', kwargs={'farmer_id': 'F002'})
+        for sqlstate, status_code in (('57014', 503), ('08006', None)):
+            error = OperationalError('recall failed')
+            error.__cause__ = type('DatabaseError', (Exception,), {'sqlstate': sqlstate})()
+            with mock.patch('agri.views.impact', side_effect=error):
+                if status_code is None:
+                    with self.assertRaises(OperationalError):
+                        self.client.get(url)
+                else:
+                    self.assertEqual(self.client.get(url).status_code, status_code)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.farmers = create_farmers(5)
+        self.batch = create_batch('001', self.farmers[:2], create_sites())
+
+    def sync(self, name, cursor=None, **params):
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_farmer_feed_pages_changes_and_deletions(self):
+        first = self.sync('farmer-changes', page_size=3)
+        self.assertTrue(first['has_more'])
+        second = self.sync('farmer-changes', first['cursor'], page_size=3)
+        self.assertFalse(second['has_more'])
+        self.assertEqual(
+            [row['farmer_id'] for row in first['changed'] + second['changed']], ['F001', 'F002', 'F003', 'F004', 'F005']
+        )
+        self.assertEqual(first['changed'][0], json.loads(json.dumps(FarmerSerializer(self.farmers[0]).data)))
+        self.assertEqual(self.sync('farmer-changes', second['cursor'])['changed'], [])
+
+        farmer = Farmer.objects.get(farmer_id='F003')
+        farmer.name = 'Renamed'
+        farmer.save()
+        Farmer.objects.get(farmer_id='F005').delete()
+        with self.assertNumQueries(2):
+            delta = self.sync('farmer-changes', second['cursor'])
+        self.assertEqual([row['name'] for row in delta['changed']], ['Renamed'])
+        self.assertEqual([row['farmer_id'] for row in delta['deleted']], ['F005'])
+
+    def test_batch_feed_follows_farmer_links(self):
+        cursor = self.sync('batch-changes')['cursor']
+        self.batch.contributing_farmers.add(self.farmers[4])
+        delta = self.sync('batch-changes', cursor)
+        self.assertEqual(
+            delta['changed'][0]['contributing_farmers'], [self.farmers[0].pk, self.farmers[1].pk, self.farmers[4].pk]
+        )
+        self.assertIsInstance(delta['changed'][0]['collection_center'], int)
+
+        self.farmers[0].delete()
+        delta = self.sync('batch-changes', delta['cursor'])
+        self.assertEqual(delta['changed'][0]['contributing_farmers'], [self.farmers[1].pk, self.farmers[4].pk])
+        CollectionCenter.objects.all().delete()
+        self.assertEqual(self.sync('batch-changes', delta['cursor'])['deleted'][0]['batch_number'], 'DOA/2025/001')
+
+    def test_cursors_expire_with_tombstones(self):
+        cursor = self.sync('packaging-center-changes')['cursor']
+        with override_settings(SYNC_TOMBSTONE_DAYS=0):
+            self.assertEqual(self.client.get(reverse('packaging-center-changes'), {'cursor': cursor}).status_code, 410)
+        self.assertEqual(self.client.get(reverse('packaging-center-changes'), {'cursor': 'bad'}).status_code, 404)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = get_user_model().objects.create_user('inspector', password='secret')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.url = reverse('batch-verify')
+        self.payload = {'batch_numbers': ['DOA/2025/404']}
+
+    def test_user_is_read_once(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.post(self.url, self.payload, format='json').status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.post(self.url, self.payload, format='json').status_code, 200)
+
+    def test_saving_or_deleting_the_user_evicts_it(self):
+        self.client.post(self.url, self.payload, format='json')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.post(self.url, self.payload, format='json').status_code, 401)
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.client.post(self.url, self.payload, format='json').status_code, 200)
+        self.user.delete()
+        self.assertEqual(self.client.post(self.url, self.payload, format='json').status_code, 401)
+
+    def test_invalid_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(self.client.post(self.url, self.payload, format='json').status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE={
+        'BACKEND': 'agri.cache.DjangoCache', 'OPTIONS': {'alias': 'default', 'key_prefix': 'agri:user:'},
+    })
+    def test_shared_backend(self):
+        cache = build_user_cache()
+        cache.set('1', self.user)
+        self.assertEqual(cache.get('1'), self.user)
+        cache.delete_many(['1'])
+        self.assertIsNone(cache.get('1'))
+
+    def test_benchmark_compares_user_queries(self):
+        out = io.StringIO()
+        call_command('benchmark_auth', iterations=3, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual((results['jwt']['queries'], results['cached jwt']['queries']), (3, 0))
+        self.assertFalse(get_user_model().objects.filter(username='benchmark-auth').exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # A second SQLite file stands in for the replica; connected up front,
+        # as the test case only allows connections to its declared databases
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = connections.configure_settings({'default': {}, 'replica': {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'{cls.directory.name}/replica.sqlite3',
+            'CONN_MAX_AGE': None,
+        }})['replica']
+        connections['replica'].connect()
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(Farmer)
+            editor.create_model(Tombstone)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        registry.reset()
+        self.farmer = create_farmers(1)[0]
+        # The replica holds a stale copy of the farmer
+        Farmer.objects.using('replica').bulk_create([Farmer(
+            id=self.farmer.id, farmer_id=self.farmer.farmer_id, name='Stale copy', gender='female',
+            farm_size=2.5, region='Ashanti', certification='Organic', updated_at=self.farmer.updated_at,
+        )])
+        self.addCleanup(self.empty_replica)
+        self.client = APIClient()
+        self.url = reverse('farmer-detail', args=[self.farmer.farmer_id])
+
+    def empty_replica(self):
+        with connections['replica'].cursor() as cursor:
+            cursor.execute('DELETE FROM agri_farmer')
+
+    def test_reads_go_to_the_replica(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['name'], 'Stale copy')
+        self.assertEqual(response['X-Read-Database'], 'replica')
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('agri_request_reads_total{route="api/farmers/<str:farmer_id>/",method="GET",database="replica"} 1', metrics)
+
+    def test_writers_stick_to_the_primary(self):
+        response = self.client.patch(self.url, {'name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['name'], 'Renamed')
+        self.assertEqual(response['X-Read-Database'], 'default')
+        del self.client.cookies[PIN_COOKIE]
+        self.assertEqual(self.client.get(self.url).data['name'], 'Stale copy')
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_change_feeds_read_the_primary(self):
+        response = self.client.get(reverse('farmer-changes'))
+        self.assertEqual([row['name'] for row in response.data['changed']], ['Farmer 1'])
+        self.assertEqual(response['X-Read-Database'], 'default')
+
+    def test_documents_rendered_on_a_replica_are_not_cached(self):
+        traceability_cache.clear()
+        route = ReadRoute()
+        route.start('replica')
+        token = current_route.set(route)
+        try:
+            self.assertEqual(traceability_cache.get_or_render('X/1', lambda: {'name': 'Stale copy'}), {'name': 'Stale copy'})
+        finally:
+            current_route.reset(token)
+        self.assertEqual(traceability_cache.lookup('X/1'), (None, None))
+        traceability_cache.get_or_render('X/1', lambda: {'name': 'Fresh'})
+        self.assertEqual(traceability_cache.lookup('X/1')[0], {'name': 'Fresh'})
+
+    def test_router_outside_requests(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Farmer))
+        self.assertEqual(router.db_for_write(Farmer, instance=self.farmer), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'agri'))
+        self.assertEqual(Farmer.objects.get(pk=self.farmer.pk).name, 'Farmer 1')
+
+
+class PerformanceMiddlewareTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.batch = create_batch('001', create_farmers(2), create_sites())
+
+    def test_server_timing_and_metrics(self):
+        response = APIClient().get(reverse('batch-list-create'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="3 queries"', response['Server-Timing'])
+
+        metrics = APIClient().get(reverse('metrics')).content.decode()
+        labels = 'route="api/batches/",method="GET"'
+        self.assertIn(f'agri_request_db_queries_bucket{{{labels},le="5"}} 1', metrics)
+        self.assertIn(f'agri_request_duration_seconds_count{{{labels}}} 1', metrics)
+        self.assertIn(f'agri_responses_total{{{labels},status="200"}} 1', metrics)
+
+    def test_serializer_time_is_reported_separately(self):
+        traceability_cache.clear()
+        response = APIClient().get(reverse('batch-detail', args=[self.batch.batch_number]))
+        timings = dict(
+            (item.split(';')[0], float(item.split('dur=')[1].split(';')[0]))
+            for item in response['Server-Timing'].split(', ')
+        )
+        self.assertGreater(timings['serialize'], 0)
+        self.assertIn('agri_request_serialize_seconds_total{route="api/batches/<path:batch_number>/",method="GET"}',
+                      APIClient().get(reverse('metrics')).content.decode())
+
+    @override_settings(METRICS_TOKEN='scrape', METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_metrics_require_an_allowed_address_or_the_token(self):
+        url = reverse('metrics')
+        self.assertEqual(APIClient().get(url).status_code, 403)
+        self.assertEqual(APIClient().get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(APIClient().get(url, HTTP_AUTHORIZATION='Bearer scrape').status_code, 200)
+        self.assertEqual(APIClient().get(url, REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_sql(self):
+        with self.assertLogs('agri.performance', 'WARNING') as logs:
+            APIClient().get(reverse('batch-list-create'))
+        self.assertIn('Slow request GET /api/batches/', logs.output[0])
+        self.assertIn('FROM "agri_batch"', logs.output[0])
+
+    async def test_async_views_count_queries(self):
+        traceability_cache.clear()
+        response = await AsyncClient().get(reverse('async-batch-detail', args=[self.batch.batch_number]))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
@@ -0,0 +1,177 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .expiry import parse_date
+from .models import CollectionCenter, ProcessingFacility, PackagingCenter, Batch, SiteThroughput
+
+
+# Site kind -> (model, business identifier); batches pass through all three
+SITES = {
+    'collection_center': (CollectionCenter, 'center_id'),
+    'processing_facility': (ProcessingFacility, 'facility_id'),
+    'packaging_center': (PackagingCenter, 'center_id'),
+}
+
+PERIODS = ('day', 'week', 'month')
+
+THROUGHPUT_WINDOW_DAYS = 90
+
+# Longest window per period, to bound the size of a response
+MAX_WINDOW_DAYS = {'day': 366, 'week': 3 * 366, 'month': 10 * 366}
+
+
+def accumulate(deltas, batch, sign):
+    if not batch.packaging_date:
+        return
+    for site in SITES:
+        delta = deltas[(site, getattr(batch, f'{site}_id'), batch.packaging_date)]
+        delta[0] += sign
+        delta[1] += sign * (batch.net_weight or 0.0)
+
+
+def record(added=(), removed=()):
+    """
+    Add the batches `added` to the stored throughput and take `removed` out
+    """
+    deltas = defaultdict(lambda: [0, 0.0])
+    for batch in added:
+        accumulate(deltas, batch, 1)
+    for batch in removed:
+        accumulate(deltas, batch, -1)
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+    with transaction.atomic():
+        for (site, object_id, day), (batches, tons) in sorted(deltas.items()):
+            lookup = {'site': site, 'object_id': object_id, 'day': day}
+            updated = SiteThroughput.objects.filter(**lookup).update(
+                batches=F('batches') + batches, tons=F('tons') + tons
+            )
+            if not updated:
+                row, created = SiteThroughput.objects.get_or_create(
+                    **lookup, defaults={'batches': batches, 'tons': tons}
+                )
+                if not created:
+                    SiteThroughput.objects.filter(pk=row.pk).update(
+                        batches=F('batches') + batches, tons=F('tons') + tons
+                    )
+
+
+def reconcile():
+    """
+    Recompute the stored throughput from the batches with GROUP BY queries and
+    correct drift. Returns the (site, object_id, day) keys that had to be fixed.
+    """
+    with transaction.atomic():
+        expected = {}
+        for site in SITES:
+            column = f'{site}_id'
+            for row in Batch.objects.values(column, 'packaging_date').annotate(
+                batches=Count('id'), tons=Sum('net_weight')
+            ).order_by():
+                expected[(site, row[column], row['packaging_date'])] = (row['batches'], row['tons'] or 0.0)
+        stored = {
+            (row.site, row.object_id, row.day): row for row in SiteThroughput.objects.select_for_update()
+        }
+        drifted = []
+        for key, (batches, tons) in expected.items():
+            row = stored.pop(key, None)
+            if row is None:
+                SiteThroughput.objects.create(site=key[0], object_id=key[1], day=key[2], batches=batches, tons=tons)
+                drifted.append(key)
+            elif row.batches != batches or abs(row.tons - tons) > 1e-6:
+                row.batches, row.tons = batches, tons
+                row.save(update_fields=['batches', 'tons', 'updated_at'])
+                drifted.append(key)
+        drifted += [key for key, row in stored.items() if row.batches or row.tons]
+        SiteThroughput.objects.filter(pk__in=[row.pk for row in stored.values()]).delete()
+    return drifted
+
+
+def window(params, period, today=None):
+    """
+    The (start, end) packaging dates, both included, asked for by `params`:
+    `from` and `to`, by default the 90 days up to today
+    """
+    end = parse_date(params, 'to') or today or timezone.localdate()
+    start = parse_date(params, 'from') or end - timedelta(days=THROUGHPUT_WINDOW_DAYS - 1)
+    if end < start or (end - start).days >= MAX_WINDOW_DAYS[period]:
+        raise ValidationError({'to': f'Ask for 1 to {MAX_WINDOW_DAYS[period]} days after `from` by {period}'})
+    return start, end
+
+
+def period_days(period, period_start, start, end):
+    """
+    Days of the period starting `period_start` that fall within `start`..`end`
+    """
+    if period == 'day':
+        return 1
+    if period == 'week':
+        period_end = period_start + timedelta(days=6)
+    else:
+        period_end = (period_start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return (min(period_end, end) - max(period_start, start)).days + 1
+
+
+def ratio(tons, capacity, days):
+    if not capacity or not days:
+        return None
+    return round(tons / (capacity * days), 4)
+
+
+def utilisation(site, period, start, end, identifiers=None):
+    """
+    Batches, tons and utilisation of capacity (tons/day) per `site` and
+    `period` from `start` to `end`, both included. Grouped in the database
+    from the daily throughput rows, so the cost follows the number of sites
+    and days, not of batches. Sites without batches in the window are left out.
+    """
+    model, business_key = SITES[site]
+    sites = model.objects.order_by('pk')
+    if identifiers is not None:
+        sites = sites.filter(**{f'{business_key}__in': identifiers})
+    sites = {
+        pk: {'id': pk, business_key: key, 'name': name, 'capacity': capacity}
+        for pk, key, name, capacity in sites.values_list('pk', business_key, 'name', 'capacity')
+    }
+
+    if period == 'day':
+        period_start = F('day')
+    else:
+        period_start = (TruncWeek if period == 'week' else TruncMonth)('day')
+    rows = SiteThroughput.objects.filter(site=site, day__range=(start, end))
+    if identifiers is not None:
+        rows = rows.filter(object_id__in=list(sites))
+    rows = (
+        rows.annotate(period=period_start).values('object_id', 'period')
+        .annotate(batches=Sum('batches'), tons=Sum('tons'))
+        .filter(batches__gt=0).order_by('object_id', 'period')
+    )
+
+    results = {}
+    for row in rows:
+        data = sites.get(row['object_id'])
+        if data is None:
+            continue
+        if row['object_id'] not in results:
+            results[row['object_id']] = {**data, 'batches': 0, 'tons': 0.0, 'periods': []}
+        result = results[row['object_id']]
+        result['batches'] += row['batches']
+        result['tons'] += row['tons']
+        result['periods'].append({
+            'start': row['period'],
+            'batches': row['batches'],
+            'tons': round(row['tons'], 4),
+            'utilisation': ratio(row['tons'], data['capacity'], period_days(period, row['period'], start, end)),
+        })
+    days = (end - start).days + 1
+    for result in results.values():
+        result['utilisation'] = ratio(result['tons'], result['capacity'], days)
+        result['tons'] = round(result['tons'], 4)
+    return {'site': site, 'period': period, 'from': start, 'to': end, 'sites': list(results.values())}
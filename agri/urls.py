@@ -1,29 +1,63 @@
 from django.urls import path
+from .async_views import AsyncBatchDetailView, AsyncBatchDetailsSearchView, AsyncDashboardSummaryView
 from .views import (
-    FarmerListCreateView, FarmerDetailView,
-    CollectionCenterListCreateView, CollectionCenterDetailView,
-    ProcessingFacilityListCreateView, ProcessingFacilityDetailView,
-    PackagingCenterListCreateView, PackagingCenterDetailView,
-    BatchListCreateView, BatchDetailView, GenerateBatchNumberView, 
-    BatchDetailsSearchAPIView, DashboardSummaryView
+    FarmerListCreateView, FarmerBulkCreateView, FarmerChangesView, FarmerExportView, FarmerDetailView,
+    CollectionCenterListCreateView, CollectionCenterBulkCreateView, CollectionCenterChangesView, CollectionCenterNearestView,
+    CollectionCenterDetailView,
+    ProcessingFacilityListCreateView, ProcessingFacilityBulkCreateView, ProcessingFacilityChangesView,
+    ProcessingFacilityNearestView, ProcessingFacilityDetailView,
+    PackagingCenterListCreateView, PackagingCenterBulkCreateView, PackagingCenterChangesView, PackagingCenterDetailView,
+    BatchListCreateView, BatchImportView, BatchChangesView, BatchExportView, BatchDetailView, GenerateBatchNumberView, 
+    BatchDetailsSearchAPIView, BatchVerifyView, BatchExpiringView, BatchExpiryHistogramView, RecallImpactView,
+    TraceabilityCacheStatsView, DashboardSummaryView, SiteThroughputView
 )
 
 urlpatterns = [ 
     path('farmers/', FarmerListCreateView.as_view(), name='farmer-list-create'),
+    path('farmers/bulk/', FarmerBulkCreateView.as_view(), name='farmer-bulk-create'),
+    path('farmers/export/', FarmerExportView.as_view(), name='farmer-export'),
+    path('farmers/changes/', FarmerChangesView.as_view(), name='farmer-changes'),
     path('farmers/<str:farmer_id>/', FarmerDetailView.as_view(), name='farmer-detail'),
+    path('farmers/<str:farmer_id>/recall/', RecallImpactView.as_view(source='farmers', lookup_url_kwarg='farmer_id'), name='farmer-recall'),
  
     path('collection-centers/', CollectionCenterListCreateView.as_view(), name='collection-center-list-create'),
+    path('collection-centers/bulk/', CollectionCenterBulkCreateView.as_view(), name='collection-center-bulk-create'),
+    path('collection-centers/changes/', CollectionCenterChangesView.as_view(), name='collection-center-changes'),
+    path('collection-centers/nearest/', CollectionCenterNearestView.as_view(), name='collection-center-nearest'),
     path('collection-centers/<str:center_id>/', CollectionCenterDetailView.as_view(), name='collection-center-detail'),
+    path('collection-centers/<str:center_id>/recall/', RecallImpactView.as_view(source='collection_centers', lookup_url_kwarg='center_id'), name='collection-center-recall'),
    
     path('processing-facilities/', ProcessingFacilityListCreateView.as_view(), name='processing-facility-list-create'),
+    path('processing-facilities/bulk/', ProcessingFacilityBulkCreateView.as_view(), name='processing-facility-bulk-create'),
+    path('processing-facilities/changes/', ProcessingFacilityChangesView.as_view(), name='processing-facility-changes'),
+    path('processing-facilities/nearest/', ProcessingFacilityNearestView.as_view(), name='processing-facility-nearest'),
     path('processing-facilities/<str:facility_id>/', ProcessingFacilityDetailView.as_view(), name='processing-facility-detail'),
+    path('processing-facilities/<str:facility_id>/recall/', RecallImpactView.as_view(source='processing_facilities', lookup_url_kwarg='facility_id'), name='processing-facility-recall'),
     
     path('packaging-centers/', PackagingCenterListCreateView.as_view(), name='packaging-center-list-create'),
+    path('packaging-centers/bulk/', PackagingCenterBulkCreateView.as_view(), name='packaging-center-bulk-create'),
+    path('packaging-centers/changes/', PackagingCenterChangesView.as_view(), name='packaging-center-changes'),
     path('packaging-centers/<str:center_id>/', PackagingCenterDetailView.as_view(), name='packaging-center-detail'),
+    path('packaging-centers/<str:center_id>/recall/', RecallImpactView.as_view(source='packaging_centers', lookup_url_kwarg='center_id'), name='packaging-center-recall'),
  
     path('batches/', BatchListCreateView.as_view(), name='batch-list-create'),
-    path('batches/<str:batch_number>/', BatchDetailView.as_view(), name='batch-detail'),
+    path('batches/import/', BatchImportView.as_view(), name='batch-import'),
+    path('batches/export/', BatchExportView.as_view(), name='batch-export'),
+    path('batches/changes/', BatchChangesView.as_view(), name='batch-changes'),
+    path('batches/cache-stats/', TraceabilityCacheStatsView.as_view(), name='batch-cache-stats'),
+    path('batches/verify/', BatchVerifyView.as_view(), name='batch-verify'),
+    path('batches/expiring/', BatchExpiringView.as_view(), name='batch-expiring'),
+    path('batches/expiry-histogram/', BatchExpiryHistogramView.as_view(), name='batch-expiry-histogram'),
+    # `path` so numbers such as DOA/2025/001 match; keep after the fixed batches/ routes
+    path('batches/<path:batch_number>/', BatchDetailView.as_view(), name='batch-detail'),
     path('generate-batch-number/', GenerateBatchNumberView.as_view(), name='generate-batch-number'),
     path('batches/search/batch_number', BatchDetailsSearchAPIView.as_view(), name='batch-search'),
+    path('recalls/', RecallImpactView.as_view(), name='recall-impact'),
     path('dashboard/summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
+    path('analytics/throughput/', SiteThroughputView.as_view(), name='site-throughput'),
+
+    # Async read path, for serving under ASGI (see main/asgi.py)
+    path('async/batches/search/batch_number', AsyncBatchDetailsSearchView.as_view(), name='async-batch-search'),
+    path('async/batches/<path:batch_number>/', AsyncBatchDetailView.as_view(), name='async-batch-detail'),
+    path('async/dashboard/summary/', AsyncDashboardSummaryView.as_view(), name='async-dashboard-summary'),
 ]
\ No newline at end of file
@@ -0,0 +1,50 @@
+import re
+
+from .models import Batch
+
+
+MAX_VERIFY_BATCH_NUMBERS = 1000
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(batch_number):
+    """
+    Canonical form of a typed or scanned batch number: no whitespace, upper case
+    """
+    return WHITESPACE.sub('', batch_number).upper()
+
+
+def verify(batch_numbers):
+    """
+    Look up `batch_numbers` with one query on the unique batch_number index,
+    matching each number as given (trimmed) or normalized. Returns one result
+    per number, in the order given, with the compliance flags of found batches.
+    """
+    candidates = {}
+    for value in batch_numbers:
+        candidates[value] = [value.strip(), normalize(value)]
+    lookups = {number for numbers in candidates.values() for number in numbers}
+    found = {
+        row[0]: row for row in Batch.objects.filter(batch_number__in=lookups).values_list(
+            'batch_number', 'zero_child_labor', 'zero_deforestation', 'expiry_date'
+        )
+    }
+
+    results = []
+    for value in batch_numbers:
+        match = next((found[number] for number in candidates[value] if number in found), None)
+        if match is None:
+            results.append({'input': value, 'batch_number': normalize(value), 'found': False})
+            continue
+        batch_number, zero_child_labor, zero_deforestation, expiry_date = match
+        results.append({
+            'input': value,
+            'batch_number': batch_number,
+            'found': True,
+            'zero_child_labor': zero_child_labor,
+            'zero_deforestation': zero_deforestation,
+            'compliant': zero_child_labor and zero_deforestation,
+            'expiry_date': expiry_date,
+        })
+    return results
@@ -1,122 +1,403 @@
+import hmac
+
+from django.db import OperationalError
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from rest_framework import generics, status, filters
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.views import APIView 
 from django_filters.rest_framework import DjangoFilterBackend
+from . import expiry, rollups, snapshots, throughput
+from .cache import traceability_cache
+from .bulk import BulkCreateView, BulkUploadView
+from .conditional import ConditionalGetMixin
+from .exports import EXPORT_CHUNK_SIZE, StreamingExportMixin, chunked
+from .fieldsets import SparseFieldsetMixin, trim
+from .geo import NearestView
+from .imports import import_batches
+from .metrics import registry
 from .models import Farmer, CollectionCenter, ProcessingFacility, PackagingCenter, Batch
+from .projections import (
+    ProjectionMixin, FARMER_PROJECTION, COLLECTION_CENTER_PROJECTION, PROCESSING_FACILITY_PROJECTION,
+    PACKAGING_CENTER_PROJECTION, BATCH_PROJECTION
+)
+from .recalls import MAX_RECALL_SOURCES, RECALL_SOURCES, impact, timed_out
+from .search import RankedSearchFilter
+from .sequences import allocate_batch_sequences
 from .serializers import (
     FarmerSerializer, CollectionCenterSerializer, ProcessingFacilitySerializer,
-    PackagingCenterSerializer, BatchSerializer, BatchNumberSearchSerializer
+    PackagingCenterSerializer, BatchSerializer, BatchImportSerializer, BatchNumberSearchSerializer,
+    BatchNumberVerifySerializer
 )
+from .sync import ChangeFeedView
+from .verification import verify
+
 
+MAX_BATCH_NUMBER_BLOCK = 1000
 
-class FarmerListCreateView(generics.ListCreateAPIView):
+# Relations nested in BatchSerializer output, whose changes alter a batch's representation
+BATCH_DEPENDENCIES = {
+    'contributing_farmers': Farmer,
+    'collection_center': CollectionCenter,
+    'processing_facility': ProcessingFacility,
+    'packaging_center': PackagingCenter,
+}
+
+
+def wants_snapshot(request):
+    """
+    `?snapshot=true` serves the stored traceability snapshot of a batch, read
+    from the batch row alone
+    """
+    return request.query_params.get('snapshot', '').lower() in ('1', 'true', 'yes')
+
+
+class FarmerListCreateView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.ListCreateAPIView):
     """
     API view to retrieve list of farmers or create new farmer
     """
     queryset = Farmer.objects.all()
     serializer_class = FarmerSerializer 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    projection = FARMER_PROJECTION
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['region', 'certification', 'status']
-    search_fields = ['name', 'farmer_id']
+    search_fields = ['name', '^farmer_id']
     ordering_fields = ['name', 'age', 'farm_size', 'years_in_farming']
+    cursor_ordering = ('-created_at', '-id')
+
+
+class FarmerExportView(StreamingExportMixin, FarmerListCreateView):
+    """
+    API view to stream the filtered farmer register as NDJSON or CSV
+    """
+    export_filename = 'farmers'
+    export_fields = (
+        ('id', 'id'),
+        ('farmer_id', 'farmer_id'),
+        ('name', 'name'),
+        ('gender', 'gender'),
+        ('age', 'age'),
+        ('farm_size', 'farm_size'),
+        ('years_in_farming', 'years_in_farming'),
+        ('region', 'region'),
+        ('certification', 'certification'),
+        ('status', 'status'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+
+
+class FarmerBulkCreateView(BulkCreateView):
+    """
+    API view to register many farmers from a JSON array or CSV upload
+    """
+    serializer_class = FarmerSerializer
+
+
+class FarmerChangesView(ChangeFeedView):
+    """
+    API view to sync farmers changed or deleted since a cursor
+    """
+    queryset = Farmer.objects.all()
+    serializer_class = FarmerSerializer
+    projection = FARMER_PROJECTION
 
 
-class FarmerDetailView(generics.RetrieveUpdateDestroyAPIView):
+class FarmerDetailView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update or delete farmer
     """
     queryset = Farmer.objects.all()
     serializer_class = FarmerSerializer 
+    projection = FARMER_PROJECTION
     lookup_field = 'farmer_id'
 
 
-class CollectionCenterListCreateView(generics.ListCreateAPIView):
+class CollectionCenterListCreateView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.ListCreateAPIView):
     """
     API view to retrieve list of collection centers or create new center
     """
     queryset = CollectionCenter.objects.all()
     serializer_class = CollectionCenterSerializer 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    projection = COLLECTION_CENTER_PROJECTION
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['drying_method', 'status']
-    search_fields = ['name', 'center_id', 'location']
+    search_fields = ['name', '^center_id', 'location']
     ordering_fields = ['name', 'capacity']
+    cursor_ordering = ('-created_at', '-id')
+
+
+class CollectionCenterBulkCreateView(BulkCreateView):
+    """
+    API view to register many collection centers from a JSON array or CSV upload
+    """
+    serializer_class = CollectionCenterSerializer
+
+
+class CollectionCenterChangesView(ChangeFeedView):
+    """
+    API view to sync collection centers changed or deleted since a cursor
+    """
+    queryset = CollectionCenter.objects.all()
+    serializer_class = CollectionCenterSerializer
+    projection = COLLECTION_CENTER_PROJECTION
 
 
-class CollectionCenterDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CollectionCenterNearestView(NearestView):
+    """
+    API view to find the collection centers nearest to a point
+    """
+    queryset = CollectionCenter.objects.all()
+    serializer_class = CollectionCenterSerializer
+
+
+class CollectionCenterDetailView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update or delete collection center
     """
     queryset = CollectionCenter.objects.all()
     serializer_class = CollectionCenterSerializer 
+    projection = COLLECTION_CENTER_PROJECTION
     lookup_field = 'center_id'
 
 
-class ProcessingFacilityListCreateView(generics.ListCreateAPIView):
+class ProcessingFacilityListCreateView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.ListCreateAPIView):
     """
     API view to retrieve list of processing facilities or create new facility
     """
     queryset = ProcessingFacility.objects.all()
     serializer_class = ProcessingFacilitySerializer 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    projection = PROCESSING_FACILITY_PROJECTION
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['status']
-    search_fields = ['name', 'facility_id', 'location']
+    search_fields = ['name', '^facility_id', 'location']
     ordering_fields = ['name', 'capacity']
+    cursor_ordering = ('-created_at', '-id')
+
+
+class ProcessingFacilityBulkCreateView(BulkCreateView):
+    """
+    API view to register many processing facilities from a JSON array or CSV upload
+    """
+    serializer_class = ProcessingFacilitySerializer
+
 
+class ProcessingFacilityChangesView(ChangeFeedView):
+    """
+    API view to sync processing facilities changed or deleted since a cursor
+    """
+    queryset = ProcessingFacility.objects.all()
+    serializer_class = ProcessingFacilitySerializer
+    projection = PROCESSING_FACILITY_PROJECTION
 
-class ProcessingFacilityDetailView(generics.RetrieveUpdateDestroyAPIView):
+
+class ProcessingFacilityNearestView(NearestView):
+    """
+    API view to find the processing facilities nearest to a point
+    """
+    queryset = ProcessingFacility.objects.all()
+    serializer_class = ProcessingFacilitySerializer
+
+
+class ProcessingFacilityDetailView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update or delete processing facility
     """
     queryset = ProcessingFacility.objects.all()
     serializer_class = ProcessingFacilitySerializer 
+    projection = PROCESSING_FACILITY_PROJECTION
     lookup_field = 'facility_id'
 
 
-class PackagingCenterListCreateView(generics.ListCreateAPIView):
+class PackagingCenterListCreateView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.ListCreateAPIView):
     """
     API view to retrieve list of packaging centers or create new center
     """
     queryset = PackagingCenter.objects.all()
     serializer_class = PackagingCenterSerializer 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    projection = PACKAGING_CENTER_PROJECTION
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['status']
-    search_fields = ['name', 'center_id', 'location']
+    search_fields = ['name', '^center_id', 'location']
     ordering_fields = ['name', 'capacity']
+    cursor_ordering = ('-created_at', '-id')
+
+
+class PackagingCenterBulkCreateView(BulkCreateView):
+    """
+    API view to register many packaging centers from a JSON array or CSV upload
+    """
+    serializer_class = PackagingCenterSerializer
 
 
-class PackagingCenterDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PackagingCenterChangesView(ChangeFeedView):
+    """
+    API view to sync packaging centers changed or deleted since a cursor
+    """
+    queryset = PackagingCenter.objects.all()
+    serializer_class = PackagingCenterSerializer
+    projection = PACKAGING_CENTER_PROJECTION
+
+
+class PackagingCenterDetailView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update or delete packaging center
     """
     queryset = PackagingCenter.objects.all()
     serializer_class = PackagingCenterSerializer 
+    projection = PACKAGING_CENTER_PROJECTION
     lookup_field = 'center_id'
 
 
-class BatchListCreateView(generics.ListCreateAPIView):
+class BatchListCreateView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.ListCreateAPIView):
     """
     API view to retrieve list of batches or create new batch
     """
-    queryset = Batch.objects.all()
+    queryset = Batch.objects.with_related()
     serializer_class = BatchSerializer 
+    projection = BATCH_PROJECTION
+    validator_dependencies = BATCH_DEPENDENCIES
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['collection_center', 'processing_facility', 'packaging_center', 'year']
     search_fields = ['batch_number']
     ordering_fields = ['packaging_date', 'expiry_date', 'created_at']
+    cursor_ordering = ('-packaging_date', '-id')
 
 
-class BatchDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BatchImportView(BulkUploadView):
     """
-    API view to retrieve, update or delete batch
+    API view to import many batches from a JSON array or CSV upload, with
+    sites and farmers referenced by their business identifiers
+    """
+    serializer_class = BatchImportSerializer
+
+    def post(self, request, *args, **kwargs):
+        rows = self.read_rows(request, self.get_serializer())
+        if isinstance(rows, Response):
+            return rows
+        created, errors = import_batches(rows)
+        return Response(
+            {
+                "created": [
+                    {"row": index, "batch_number": created[index]} for index in sorted(created)
+                ],
+                "errors": [
+                    {"row": index, "errors": errors[index]} for index in sorted(errors)
+                ],
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        )
+
+
+class BatchChangesView(ChangeFeedView):
+    """
+    API view to sync batches changed or deleted since a cursor. Sites and
+    contributing farmers are given by id; clients sync them from their own feeds.
     """
     queryset = Batch.objects.all()
+    serializer_class = BatchSerializer
+    projection = BATCH_PROJECTION.sparse(None, ())
+
+
+class BatchExportView(StreamingExportMixin, BatchListCreateView):
+    """
+    API view to stream the filtered batch register as NDJSON or CSV.
+    Pass `include_farmers=true` to add the contributing farmer IDs to each row
+    """
+    export_filename = 'batches'
+    export_fields = (
+        ('id', 'id'),
+        ('batch_number', 'batch_number'),
+        ('doa', 'doa'),
+        ('year', 'year'),
+        ('sequence', 'sequence'),
+        ('collection_center', 'collection_center__center_id'),
+        ('processing_facility', 'processing_facility__facility_id'),
+        ('packaging_center', 'packaging_center__center_id'),
+        ('packaging_date', 'packaging_date'),
+        ('expiry_date', 'expiry_date'),
+        ('net_weight', 'net_weight'),
+        ('zero_child_labor', 'zero_child_labor'),
+        ('zero_deforestation', 'zero_deforestation'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+
+    def include_farmers(self):
+        return self.request.query_params.get('include_farmers', '').lower() in ('1', 'true', 'yes')
+
+    def get_export_columns(self):
+        columns = super().get_export_columns()
+        if self.include_farmers():
+            columns.append('contributing_farmers')
+        return columns
+
+    def export_rows(self, queryset, columns):
+        rows = super().export_rows(queryset, columns)
+        if not self.include_farmers():
+            yield from rows
+            return
+
+        through = Batch.contributing_farmers.through
+        for chunk in chunked(rows, EXPORT_CHUNK_SIZE):
+            farmers = {row['id']: [] for row in chunk}
+            links = through.objects.filter(batch_id__in=farmers).order_by('batch_id', 'farmer_id')
+            for batch_id, farmer_id in links.values_list('batch_id', 'farmer__farmer_id'):
+                farmers[batch_id].append(farmer_id)
+            for row in chunk:
+                row['contributing_farmers'] = farmers[row['id']]
+                yield row
+
+
+class BatchDetailView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.RetrieveUpdateDestroyAPIView):
+    """
+    API view to retrieve, update or delete batch
+    """
+    queryset = Batch.objects.with_related()
     serializer_class = BatchSerializer 
+    projection = BATCH_PROJECTION
+    validator_dependencies = BATCH_DEPENDENCIES
     lookup_field = 'batch_number'
 
+    def get(self, request, *args, **kwargs):
+        # Read before the validators, see TraceabilityCache.get_or_render()
+        self.cache_generation = traceability_cache.generation
+        if not wants_snapshot(request) and not self.is_sparse():
+            document, state = traceability_cache.lookup(kwargs[self.lookup_field])
+            if state is not None:
+                # Cached with the validators it was rendered under: no query
+                traceability_cache.count(document)
+                respond = lambda *args, **kwargs: Response(document)
+                return self.conditional_response(state, respond, request, *args, **kwargs)
+        return super().get(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if wants_snapshot(request):
+            data = snapshots.snapshot_for(kwargs[self.lookup_field])
+            if data is None:
+                raise NotFound()
+            if self.is_sparse():
+                data = trim(data, *self.get_fieldset(), BatchSerializer.expandable)
+            return Response(data)
+        if self.is_sparse():
+            # Cached documents are complete; a sparse read plans its own query
+            return super().retrieve(request, *args, **kwargs)
+        if self.use_projection():
+            render = self.get_projected_object
+        else:
+            render = lambda: self.get_serializer(self.get_object()).data
+        data = traceability_cache.get_or_render(
+            kwargs[self.lookup_field], render, self.validator_state, self.cache_generation
+        )
+        return Response(data)
+
 
 class GenerateBatchNumberView(APIView):
     """
-    API view to generate a new batch number
+    API view to reserve the next batch number for a DOA and year, or a block
+    of `count` numbers for batch-printing labels
     """ 
     
     def post(self, request):
@@ -128,17 +409,24 @@ class GenerateBatchNumberView(APIView):
                 {"error": "DOA and year are required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if len(str(doa)) > 4 or len(str(year)) > 4:
+            return Response(
+                {"error": "DOA and year must be at most 4 characters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
          
-        latest_batch = Batch.objects.filter(doa=doa, year=year).order_by('-sequence').first()
-        
-        if latest_batch: 
-            try:
-                sequence = str(int(latest_batch.sequence) + 1).zfill(3)
-            except ValueError:
-                sequence = '001'
-        else:
-            sequence = '001'
-        
+        try:
+            count = int(request.data.get('count', 1))
+        except (TypeError, ValueError):
+            count = 0
+        if not 1 <= count <= MAX_BATCH_NUMBER_BLOCK:
+            return Response(
+                {"error": f"count must be between 1 and {MAX_BATCH_NUMBER_BLOCK}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        sequences = allocate_batch_sequences(doa, year, count)
+        sequence = sequences[0]
         batch_number = f"{doa}/{year}/{sequence}"
         
         return Response(
@@ -146,7 +434,8 @@ class GenerateBatchNumberView(APIView):
                 "batch_number": batch_number,
                 "doa": doa,
                 "year": year,
-                "sequence": sequence
+                "sequence": sequence,
+                "batch_numbers": [f"{doa}/{year}/{s}" for s in sequences]
             },
             status=status.HTTP_200_OK
         )
@@ -154,7 +443,7 @@ class GenerateBatchNumberView(APIView):
 
 class BatchDetailsSearchAPIView(generics.GenericAPIView):
     serializer_class = BatchSerializer 
-    queryset = Batch.objects.all()
+    queryset = Batch.objects.with_related()
     
     def post(self, request, *args, **kwargs):
         search_serializer = BatchNumberSearchSerializer(data=request.data)
@@ -165,38 +454,216 @@ class BatchDetailsSearchAPIView(generics.GenericAPIView):
             )
         batch_number = search_serializer.validated_data.get('batch_number')
         
-        try:
-            batch = self.queryset.get(batch_number=batch_number)
-            response_serializer = self.serializer_class(batch)
-            
-            return Response(response_serializer.data, status=status.HTTP_200_OK)
-        except Batch.DoesNotExist:
+        if wants_snapshot(request):
+            data = snapshots.snapshot_for(batch_number)
+            if data is None:
+                return Response(
+                    {"error": f"Batch with number '{batch_number}' not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(data, status=status.HTTP_200_OK)
+
+        def render():
+            batch = self.queryset.filter(batch_number=batch_number).first()
+            return self.serializer_class(batch).data if batch else None
+
+        data = traceability_cache.get_or_render(batch_number, render)
+        if data is None:
             return Response(
                 {"error": f"Batch with number '{batch_number}' not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class RecallImpactView(APIView):
+    """
+    API view to trace every batch depending on a farmer or site, or on sets
+    of them, with aggregate counts and the batches still in date. GET traces
+    the entity in the URL; POST takes lists of business IDs per source, e.g.
+    {"farmers": ["F001"], "collection_centers": ["CC01"]}. Pass
+    `in_date=true` to list only the batches that have not expired.
+    """
+    source = None
+    lookup_url_kwarg = None
+
+    def get(self, request, *args, **kwargs):
+        return self.trace(request, {self.source: [kwargs[self.lookup_url_kwarg]]})
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, dict):
+            return Response({"error": "Expected an object of ID lists"}, status=status.HTTP_400_BAD_REQUEST)
+        unknown = [key for key in request.data if key not in RECALL_SOURCES]
+        if unknown:
+            return Response(
+                {"error": f"Unknown source(s): {', '.join(unknown)}. Choose from: {', '.join(RECALL_SOURCES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        sources = {}
+        for key, identifiers in request.data.items():
+            if not isinstance(identifiers, list) or not all(isinstance(value, str) for value in identifiers):
+                return Response({"error": f"{key} must be a list of IDs"}, status=status.HTTP_400_BAD_REQUEST)
+            sources[key] = identifiers
+        count = sum(len(identifiers) for identifiers in sources.values())
+        if not 1 <= count <= MAX_RECALL_SOURCES:
+            return Response(
+                {"error": f"Between 1 and {MAX_RECALL_SOURCES} IDs are required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self.trace(request, sources)
+
+    def trace(self, request, sources):
+        in_date_only = request.query_params.get('in_date', '').lower() in ('1', 'true', 'yes')
+        try:
+            result = impact(sources, in_date_only)
+        except OperationalError as error:
+            if not timed_out(error):
+                raise
+            return Response(
+                {"error": "The recall query timed out; trace fewer sources at once"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        if self.source is not None and self.source in result['missing']:
+            raise NotFound()
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class BatchVerifyView(APIView):
+    """
+    API view to check many batch numbers at once, e.g. every bag in a
+    container. GET takes `?batch_numbers=A,B,...` and is cacheable; POST takes
+    {"batch_numbers": [...]} for lists too long for a URL. Each number is
+    reported found or not, with the batch's compliance flags.
+    """
+
+    def get(self, request):
+        value = request.query_params.get('batch_numbers', '')
+        response = self.verify([number for number in value.split(',') if number.strip()])
+        if response.status_code == status.HTTP_200_OK:
+            patch_cache_control(response, max_age=getattr(settings, 'BATCH_VERIFY_MAX_AGE', 60))
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def post(self, request):
+        return self.verify(request.data.get('batch_numbers') if isinstance(request.data, dict) else None)
+
+    def verify(self, batch_numbers):
+        serializer = BatchNumberVerifySerializer(data={'batch_numbers': batch_numbers})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = verify(serializer.validated_data['batch_numbers'])
+        found = sum(1 for result in results if result['found'])
+        return Response(
+            {
+                "found": found,
+                "not_found": len(results) - found,
+                "non_compliant": sum(1 for result in results if result['found'] and not result['compliant']),
+                "results": results,
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class BatchExpiringView(ConditionalGetMixin, SparseFieldsetMixin, ProjectionMixin, generics.ListAPIView):
+    """
+    API view to list the batches expiring in a window, soonest first: the
+    next `days` (default 30) from today or `from`, or `from` to `to`.
+    Filter by site with `packaging_center` or `processing_facility`
+    """
+    queryset = Batch.objects.with_related()
+    serializer_class = BatchSerializer
+    projection = BATCH_PROJECTION
+    validator_dependencies = BATCH_DEPENDENCIES
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['collection_center', 'processing_facility', 'packaging_center']
+    ordering_fields = ['expiry_date']
+    ordering = ['expiry_date', 'id']
+    cursor_ordering = ('expiry_date', 'id')
+
+    def get_queryset(self):
+        start, end = expiry.window(self.request.query_params)
+        return super().get_queryset().filter(expiry_date__range=(start, end))
+
+
+class BatchExpiryHistogramView(APIView):
+    """
+    API view to count the batches expiring per week and site over a window
+    (same parameters as the expiring list), grouped by `group`:
+    packaging_center (default) or processing_facility. Served from
+    precomputed rollups, so dashboards can poll it cheaply.
+    """
+
+    def get(self, request):
+        group = request.query_params.get('group', 'packaging_center')
+        if group not in expiry.EXPIRY_GROUPS:
+            return Response(
+                {"group": [f"Choose one of: {', '.join(expiry.EXPIRY_GROUPS)}"]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        start, end = expiry.window(request.query_params)
+        return Response(expiry.histogram(group, start, end), status=status.HTTP_200_OK)
+
+
+class SiteThroughputView(APIView):
+    """
+    API view to compare the batches packaged through each site with its
+    capacity: batches, tons and utilisation per `period` (day, week or month)
+    from `from` to `to`. `site` is collection_center, processing_facility
+    (default) or packaging_center; `ids` limits it to some sites by their
+    business identifiers.
+    """
+
+    def get(self, request):
+        site = request.query_params.get('site', 'processing_facility')
+        period = request.query_params.get('period', 'week')
+        errors = {}
+        if site not in throughput.SITES:
+            errors['site'] = [f"Choose one of: {', '.join(throughput.SITES)}"]
+        if period not in throughput.PERIODS:
+            errors['period'] = [f"Choose one of: {', '.join(throughput.PERIODS)}"]
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        start, end = throughput.window(request.query_params, period)
+        ids = request.query_params.get('ids')
+        identifiers = [value.strip() for value in ids.split(',') if value.strip()] if ids else None
+        return Response(throughput.utilisation(site, period, start, end, identifiers), status=status.HTTP_200_OK)
+
+
+class TraceabilityCacheStatsView(APIView):
+    """
+    API view to get hit/miss counters of the batch traceability cache
+    """
+
+    def get(self, request):
+        return Response(traceability_cache.stats(), status=status.HTTP_200_OK)
 
 
 class DashboardSummaryView(APIView):
     """
-    API view to get summary of batches
+    API view to get summary of batches, farmers and sites with breakdowns,
+    served from the precomputed rollups
     """
     
     def get(self, request):
-        total_batches = Batch.objects.count()
-        total_farmers = Farmer.objects.count()
-        total_collection_centers = CollectionCenter.objects.count()
-        total_processing_facilities = ProcessingFacility.objects.count()
-        total_packaging_centers = PackagingCenter.objects.count()
-        
-        summary = {
-            "total_batches": total_batches,
-            "total_farmers": total_farmers,
-            "total_collection_centers": total_collection_centers,
-            "total_processing_facilities": total_processing_facilities,
-            "total_packaging_centers": total_packaging_centers
-        }
-        
-        return Response(summary, status=status.HTTP_200_OK)
-    
-    
\ No newline at end of file
+        return Response(rollups.summary(), status=status.HTTP_200_OK)
+
+
+def metrics_allowed(request):
+    """
+    Scrapers present settings.METRICS_TOKEN as a bearer token, or connect
+    from one of settings.METRICS_ALLOWED_IPS
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    if token and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip(), token):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+
+
+def metrics(request):
+    """
+    Per-route request histograms of this process in the Prometheus text format
+    """
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -5,6 +5,17 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+ASGI serving mode: set ASGI=1 and the Procfile runs
+
+    uvicorn main.asgi:application --workers $WEB_CONCURRENCY
+
+instead of gunicorn main.wsgi. The async read path (/api/async/...: batch
+detail, batch search, dashboard summary) then waits on the database without
+holding a worker; sync views keep working in a thread pool. ASGI=1 also
+replaces persistent DB connections with a psycopg connection pool of
+DB_POOL_SIZE (default 10) per worker. Compare both modes with
+`manage.py benchmark_load`.
 """
 
 import os
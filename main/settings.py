@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'agri',
     'rest_framework',
     'django_filters',
@@ -96,6 +97,9 @@ SWAGGER_SETTINGS = {
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 MIDDLEWARE = [ 
+    'agri.middleware.PerformanceMiddleware',
+    'agri.middleware.CompressionMiddleware',
+    'agri.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -107,21 +111,72 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+ROOT_URLCONF = 'main.urls'
+
 REST_FRAMEWORK = {
- 
     'DEFAULT_AUTHENTICATION_CLASSES': (
- 
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
- 
+        'agri.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'agri.pagination.AgriPagination',
+    'PAGE_SIZE': 10,
 }
-ROOT_URLCONF = 'main.urls'
 
-REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+# Serve agri list and detail reads from `.values()` projections instead of
+# the serializers (agri.projections), rendered with orjson where it is
+# installed (agri.renderers.FastJSONRenderer). The output is identical; see
+# `manage.py benchmark_serializers` for the CPU saved.
+FAST_READS = os.environ.get('FAST_READS') == '1'
+
+# Requests slower than this are logged to `agri.performance` with their SQL
+PERF_SLOW_REQUEST_MS = int(os.environ.get('PERF_SLOW_REQUEST_MS', 500))
+
+# /metrics exposes per-route latency and query counts: served only to
+# scrapers sending `Authorization: Bearer <METRICS_TOKEN>` or connecting from
+# METRICS_ALLOWED_IPS (comma separated, loopback by default)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [
+    address.strip() for address in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+    if address.strip()
+]
+
+# Statement timeout bounding the recall impact queries (agri.recalls), 0 for none
+RECALL_TIMEOUT_MS = int(os.environ.get('RECALL_TIMEOUT_MS', 10000))
+
+# Change feeds (agri.sync): rows are served once older than the settle window,
+# so transactions still in flight cannot be skipped; deletions are kept this long
+SYNC_SETTLE_SECONDS = int(os.environ.get('SYNC_SETTLE_SECONDS', 5))
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', 90))
+
+# Seconds clients and proxies may cache GET /api/batches/verify/ answers
+BATCH_VERIFY_MAX_AGE = int(os.environ.get('BATCH_VERIFY_MAX_AGE', 60))
+
+# Rendered batch traceability documents. LocalLRUCache is per process; use
+# agri.cache.DjangoCache with a shared CACHES alias when running several workers.
+TRACEABILITY_CACHE = {
+    'BACKEND': 'agri.cache.LocalLRUCache',
+    'OPTIONS': {'max_entries': 10000, 'timeout': 300},
 }
 
+# Users resolved from access tokens (agri.authentication). Saving or deleting
+# a user evicts it, but only from the cache of the process that made the
+# change: with the per-process LocalLRUCache, another gunicorn/uvicorn worker
+# keeps accepting a deactivated user, or a token issued before a password
+# change, until its entry times out. Hence a few seconds by default, which
+# still saves the user query on bursts of requests. Set AUTH_USER_CACHE_ALIAS
+# to a CACHES alias shared by all workers (e.g. Redis) to evict everywhere at
+# once and keep users for a minute.
+AUTH_USER_CACHE_ALIAS = os.environ.get('AUTH_USER_CACHE_ALIAS')
+if AUTH_USER_CACHE_ALIAS:
+    AUTH_USER_CACHE = {
+        'BACKEND': 'agri.cache.DjangoCache',
+        'OPTIONS': {'alias': AUTH_USER_CACHE_ALIAS, 'timeout': 60, 'key_prefix': 'agri:user:'},
+    }
+else:
+    AUTH_USER_CACHE = {
+        'BACKEND': 'agri.cache.LocalLRUCache',
+        'OPTIONS': {'max_entries': 10000, 'timeout': int(os.environ.get('AUTH_USER_CACHE_SECONDS', 5))},
+    }
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -160,6 +215,29 @@ if 'DATABASE_URL' in os.environ:
         conn_max_age=500,
         conn_health_checks=True,
     )
+    if os.environ.get('ASGI') == '1':
+        # Under ASGI every request runs its queries on a fresh executor thread,
+        # so persistent connections would be opened per request; share a
+        # psycopg connection pool instead
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': 2,
+            'max_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        }
+
+# Read replicas (agri.routing): comma separated database URLs. GET requests on
+# the agri API read from a random replica; clients that wrote in the last
+# REPLICA_PIN_SECONDS read the primary.
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    alias = f'replica{index}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=500, conn_health_checks=True)
+    # Tests read the primary's test database through the replica aliases
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['agri.routing.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
 
 
 # Password validation
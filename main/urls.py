@@ -24,6 +24,7 @@ from rest_framework_simplejwt.views import (
 
 
 from rest_framework import permissions
+from agri.views import metrics
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
@@ -49,6 +50,7 @@ urlpatterns = [
     path('api/', include('agri.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics, name='metrics'),
     path('swagger/', schema_view.with_ui('swagger',
                                          cache_timeout=0), name='schema-swagger-ui'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)